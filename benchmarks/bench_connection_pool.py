@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark for pooled SQLite connections in CursorDBManager.
+
+Compares per-call latency of the old connect-per-call pattern against the pooled,
+read-only connections used by CursorDBManager.execute_query and get_composer_data.
+
+Usage:
+    python benchmarks/bench_connection_pool.py [--projects N] [--calls N] [--threads N]
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from common import load_server_module
+from synthetic_cursor import generate_cursor_dir
+
+
+def unpooled_get_by_key(db_path, key):
+    """The connect-per-call pattern CursorDBManager used before pooling"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT key, value FROM ItemTable WHERE key = ?", (key,))
+    results = [{"key": k, "value": json.loads(v)} for k, v in cursor.fetchall()]
+    conn.close()
+    return results
+
+
+def time_calls(fn, calls, threads):
+    """Run fn(i) `calls` times across `threads` threads and return per-call latencies in microseconds"""
+    def timed(i):
+        start = time.perf_counter()
+        fn(i)
+        return (time.perf_counter() - start) * 1e6
+
+    if threads == 1:
+        return [timed(i) for i in range(calls)]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(timed, range(calls)))
+
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<38} mean {statistics.mean(latencies):8.1f} us   "
+          f"p50 {statistics.median(latencies):8.1f} us   p95 {p95:8.1f} us")
+    return statistics.mean(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs. per-call SQLite connections")
+    parser.add_argument("--projects", type=int, default=24, help="Number of synthetic workspaces")
+    parser.add_argument("--keys", type=int, default=500, help="Filler ItemTable rows per workspace")
+    parser.add_argument("--calls", type=int, default=2000, help="Calls per measurement")
+    parser.add_argument("--threads", type=int, default=4, help="Threads for the concurrent measurement")
+    args = parser.parse_args()
+
+    server = load_server_module()
+    logging.getLogger("cursor-mcp").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "User"
+        generate_cursor_dir(root, projects=args.projects, composers=args.projects, composer_kb=4,
+                            settings_per_project=args.keys)
+        manager = server.CursorDBManager(cursor_path=root, cache_dir=Path(tmp) / "cache")
+        projects = sorted(manager.db_paths)
+        keys = {
+            project: [row["key"] for row in manager.execute_query(project, "ItemTable", "search_keys",
+                                                                  "workbench.setting.", limit=args.keys)]
+            for project in projects
+        }
+
+        def pick(i):
+            project = projects[i % len(projects)]
+            return project, keys[project][i % len(keys[project])]
+
+        def before(i):
+            project, key = pick(i)
+            unpooled_get_by_key(manager.db_paths[project], key)
+
+        def after(i):
+            project, key = pick(i)
+            manager.execute_query(project, "ItemTable", "get_by_key", key)
+
+        print(f"{len(projects)} workspaces, {args.keys} filler keys each, {args.calls} calls per run\n")
+        for threads in sorted({1, args.threads}):
+            print(f"threads={threads}")
+            old = report("  before: connect per call", time_calls(before, args.calls, threads))
+            new = report("  after:  pooled read-only connections", time_calls(after, args.calls, threads))
+            print(f"  speedup: {old / new:.2f}x\n")
+
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
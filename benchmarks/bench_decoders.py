@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the JSON decoding backends and the typed composer views.
+
+Decodes large synthetic composerData:<id> blobs and a large composer.composerData
+index with the stdlib json module, with orjson (when installed), and into the
+slotted ComposerConversation / ComposerIndex views on top of either backend.
+Reports decode latency and how much memory the decoded result keeps alive.
+
+Usage:
+    python benchmarks/bench_decoders.py [--sizes-kb 256 2048 8192] [--index-entries N] [--repeat N]
+"""
+
+import argparse
+import json
+import logging
+import random
+import statistics
+import time
+import tracemalloc
+
+from common import load_server_module
+from synthetic_cursor import make_composer
+
+
+def make_composer_index(rng, entries):
+    """A composer.composerData value listing `entries` composers"""
+    return {
+        "allComposers": [
+            {
+                "composerId": f"composer-{i:06d}",
+                "name": f"Composer {i}",
+                "createdAt": 1_700_000_000_000 + i,
+                "lastUpdatedAt": 1_700_000_500_000 + i,
+                "unifiedMode": rng.choice(["agent", "chat", "edit"]),
+                "type": "head",
+                "hasUnreadMessages": False,
+                "contextUsagePercent": rng.random() * 100,
+            }
+            for i in range(entries)
+        ],
+        "selectedComposerId": "composer-000000",
+    }
+
+
+def time_decoder(decode, raw, repeat):
+    """Return (mean ms, retained bytes) of decoding raw `repeat` times"""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(raw)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = decode(raw)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return statistics.mean(latencies), retained
+
+
+def decoders(server, typed):
+    """The decoders to compare: name -> function of the raw JSON text"""
+    backends = {"json": json.loads}
+    if server.orjson is not None:
+        backends["orjson"] = server.orjson.loads
+    result = {}
+    for name, loads in backends.items():
+        result[f"{name}.loads -> dict"] = loads
+        result[f"{name}.loads -> {typed.__name__}"] = lambda raw, loads=loads: typed.from_dict(loads(raw))
+    return result
+
+
+def report(label, raw, server, typed, repeat):
+    print(f"{label} ({len(raw) / 1024:,.0f} KB)")
+    baseline = None
+    for name, decode in decoders(server, typed).items():
+        mean_ms, retained = time_decoder(decode, raw, repeat)
+        baseline = baseline or mean_ms
+        print(f"  {name:<40} {mean_ms:9.2f} ms  ({baseline / mean_ms:5.2f}x)   retains {retained / 1024:10,.0f} KB")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON decoding backends and typed composer views")
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[256, 2048, 8192],
+                        help="Sizes of the synthetic composer conversations")
+    parser.add_argument("--index-entries", type=int, default=20000, help="Entries in the synthetic composer index")
+    parser.add_argument("--repeat", type=int, default=5, help="Decodes per measurement")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    server = load_server_module()
+    logging.getLogger("cursor-mcp").setLevel(logging.WARNING)
+    rng = random.Random(args.seed)
+
+    print(f"Fast backend: {server.JSON_BACKEND}\n")
+    for size_kb in args.sizes_kb:
+        raw = json.dumps(make_composer(rng, f"composer-{size_kb}", size_kb * 1024, 1_700_000_000_000))
+        report("composerData blob", raw, server, server.ComposerConversation, args.repeat)
+
+    raw = json.dumps(make_composer_index(rng, args.index_entries))
+    report(f"composer.composerData with {args.index_entries} composers", raw, server, server.ComposerIndex, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark suite for CursorDBManager and the MCP tools and resources.
+
+Generates a synthetic Cursor directory (see synthetic_cursor.py), then measures
+latency (mean/p50/p95), throughput and peak Python memory of every manager method
+and every MCP handler. Cold runs clear the decoded value cache before each call.
+
+Results can be saved as JSON and compared against a previous run to catch regressions:
+
+    python benchmarks/bench_suite.py --output before.json
+    python benchmarks/bench_suite.py --baseline before.json --threshold 1.25
+
+The comparison exits with status 1 if any benchmark got slower than threshold x baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from common import load_server_module
+from synthetic_cursor import generate_cursor_dir
+
+
+def measure(fn, iterations, setup=None):
+    """Time `iterations` calls of fn, then trace one more call for peak memory"""
+    latencies = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000,
+        "ops_per_s": iterations / total if total else float("inf"),
+        "peak_kb": peak / 1024,
+    }
+
+
+def build_benchmarks(server, manager, summary):
+    """Return a list of (name, fn, setup) benchmarks"""
+    project = sorted(manager.db_paths)[0]
+    busiest = max(manager.projects_info.values(),
+                  key=lambda info: len(summary["projects"][info["workspace_id"]]["composer_ids"]))
+    busiest_key = next(k for k, v in manager.projects_info.items() if v is busiest)
+    composer_ids = summary["projects"][busiest["workspace_id"]]["composer_ids"]
+    composer_id = composer_ids[0]
+    cold = manager.value_cache.invalidate
+    loop = asyncio.new_event_loop()
+
+    def tool(name, arguments):
+        return lambda: loop.run_until_complete(server.mcp.call_tool(name, arguments))
+
+    def resource(uri):
+        return lambda: loop.run_until_complete(server.mcp.read_resource(uri))
+
+    def refresh_search_index():
+        manager.get_search_index().update(manager)
+
+    return [
+        ("manager.refresh_db_paths", manager.refresh_db_paths, None),
+        ("manager.execute_query get_all", lambda: manager.execute_query(project, "ItemTable", "get_all", limit=100), None),
+        ("manager.execute_query get_by_key", lambda: manager.execute_query(project, "ItemTable", "get_by_key", "composer.composerData"), None),
+        ("manager.execute_query search_keys", lambda: manager.execute_query(project, "ItemTable", "search_keys", "setting", limit=50), None),
+        ("manager.execute_query_page", lambda: manager.execute_query_page(project, "ItemTable", "get_all", limit=50), None),
+        ("manager.execute_query fields", lambda: manager.execute_query(project, "ItemTable", "get_by_key", "composer.composerData", fields=["allComposers[*].composerId"]), None),
+        ("manager.get_chat_data cold", lambda: manager.get_chat_data(project), cold),
+        ("manager.get_chat_data warm", lambda: manager.get_chat_data(project), None),
+        ("manager.get_composer_ids cold", lambda: manager.get_composer_ids(busiest_key), cold),
+        ("manager.get_composer_ids warm", lambda: manager.get_composer_ids(busiest_key), None),
+        ("manager.get_composer_data cold", lambda: manager.get_composer_data(composer_id), cold),
+        ("manager.get_composer_data warm", lambda: manager.get_composer_data(composer_id), None),
+        ("manager.get_composers_batch cold", lambda: manager.get_composers_batch(composer_ids), cold),
+        ("manager.search_all_databases keys", lambda: manager.search_all_databases("composer", "keys", "ItemTable"), None),
+        ("manager.search_all_databases content", lambda: manager.search_all_databases("refactor", "content", "cursorDiskKV"), None),
+        ("manager.search_conversations", lambda: manager.search_conversations("cache database"), refresh_search_index),
+        ("tool query_table", tool("query_table", {"project_name": project, "table_name": "ItemTable", "query_type": "get_all", "limit": 100}), None),
+        ("tool query_table paginate", tool("query_table", {"project_name": project, "table_name": "ItemTable", "query_type": "get_all", "limit": 100, "paginate": True}), None),
+        ("tool search_conversations", tool("search_conversations", {"query": "index cache"}), None),
+        ("tool search_all_projects", tool("search_all_projects", {"term": "composer", "table_name": "ItemTable"}), None),
+        ("tool get_composers", tool("get_composers", {"composer_ids": composer_ids}), None),
+        ("tool refresh_databases", tool("refresh_databases", {}), None),
+        ("resource cursor://projects", resource("cursor://projects"), None),
+        ("resource cursor://projects/detailed", resource("cursor://projects/detailed"), None),
+        ("resource chat", resource(f"cursor://projects/{project}/chat"), None),
+        ("resource composers", resource(f"cursor://projects/{busiest_key}/composers"), None),
+        ("resource composers fields", resource(f"cursor://projects/{busiest_key}/composers/fields/allComposers[*].name"), None),
+        ("resource composer", resource(f"cursor://composers/{composer_id}"), None),
+        ("resource composer fields", resource(f"cursor://composers/{composer_id}/fields/name,createdAt"), None),
+    ]
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison with a baseline run and return the names of regressed benchmarks"""
+    regressions = []
+    print(f"\n{'benchmark':<42} {'baseline ms':>12} {'now ms':>10} {'ratio':>7}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["mean_ms"] / baseline[name]["mean_ms"] if baseline[name]["mean_ms"] else 1.0
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{name:<42} {baseline[name]['mean_ms']:>12.3f} {result['mean_ms']:>10.3f} {ratio:>6.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CursorDBManager and the MCP handlers")
+    parser.add_argument("--projects", type=int, default=20, help="Number of synthetic workspaces")
+    parser.add_argument("--composers", type=int, default=200, help="Number of synthetic composers")
+    parser.add_argument("--composer-kb", type=int, default=64, help="Approximate size of each composer blob in KB")
+    parser.add_argument("--iterations", type=int, default=30, help="Timed calls per benchmark")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+
+    server = load_server_module()
+    logging.getLogger("cursor-mcp").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "User"
+        print(f"Generating {args.projects} workspaces and {args.composers} composers of ~{args.composer_kb} KB...")
+        summary = generate_cursor_dir(root, projects=args.projects, composers=args.composers,
+                                      composer_kb=args.composer_kb)
+        manager = server.CursorDBManager(cursor_path=root, cache_dir=Path(tmp) / "cache")
+        server.db_manager = manager
+
+        results = {}
+        print(f"\n{'benchmark':<42} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'ops/s':>10} {'peak KB':>10}")
+        for name, fn, setup in build_benchmarks(server, manager, summary):
+            if args.filter and args.filter not in name:
+                continue
+            fn()  # warm up connections and lazily created state
+            result = measure(fn, args.iterations, setup)
+            results[name] = result
+            print(f"{name:<42} {result['mean_ms']:>9.3f} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} "
+                  f"{result['ops_per_s']:>10.1f} {result['peak_kb']:>10.1f}")
+        manager.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold}x")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""Helpers shared by the benchmark scripts"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+SERVER_PATH = Path(__file__).resolve().parent.parent / "cursor-db-mcp-server.py"
+
+
+def load_server_module():
+    """Import cursor-db-mcp-server.py as a module (its file name isn't importable directly)"""
+    if "cursor_db_mcp_server" in sys.modules:
+        return sys.modules["cursor_db_mcp_server"]
+    spec = importlib.util.spec_from_file_location("cursor_db_mcp_server", SERVER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the MCP server.
+
+Generates a synthetic Cursor directory (see synthetic_cursor.py), then opens
+--sessions client sessions with the mcp SDK's ClientSession. Over stdio, each
+session starts its own server process, like a desktop client does; with
+--transport streamable-http, all sessions share one server process. Every session
+keeps --concurrency requests in flight for --duration seconds, drawn from a
+weighted mix of query_table calls, refresh_databases calls and resource reads.
+
+Reports throughput and p50/p95/p99 latency per request kind, and the servers'
+resident memory over time, sampled through their cursor://metrics resource.
+
+Usage:
+    python benchmarks/load_test.py --sessions 8 --concurrency 4 --duration 30
+    python benchmarks/load_test.py --transport streamable-http --sessions 32 --mix query_table=8,resource=2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamable_http_client
+
+from common import SERVER_PATH, load_server_module
+from synthetic_cursor import generate_cursor_dir
+
+REQUEST_KINDS = ("query_table", "refresh_databases", "resource")
+
+
+def parse_mix(text):
+    """Parse "query_table=6,resource=3" into {kind: weight}"""
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in REQUEST_KINDS:
+            raise argparse.ArgumentTypeError(f"Unknown request kind '{kind}', expected one of {', '.join(REQUEST_KINDS)}")
+        try:
+            mix[kind] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight in '{part}'")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("At least one request kind needs a positive weight")
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))]
+
+
+def make_request(rng, kind, projects, composer_ids):
+    """Return (label, coroutine function of a session) for one request of the given kind"""
+    project = rng.choice(projects)
+    if kind == "query_table":
+        arguments = rng.choice([
+            {"query_type": "get_all", "limit": 50},
+            {"query_type": "get_by_key", "key": "composer.composerData"},
+            {"query_type": "search_keys", "key": "workbench.setting.", "match": "prefix", "limit": 50},
+        ])
+        arguments = {"project_name": project, "table_name": "ItemTable", **arguments}
+        return f"query_table {arguments['query_type']}", lambda session: session.call_tool("query_table", arguments)
+    if kind == "refresh_databases":
+        return "refresh_databases", lambda session: session.call_tool("refresh_databases", {})
+    label, uri = rng.choice([
+        ("resource projects", "cursor://projects"),
+        ("resource chat", f"cursor://projects/{project}/chat"),
+        ("resource composers", f"cursor://projects/{project}/composers"),
+        ("resource composer", f"cursor://composers/{rng.choice(composer_ids)}"),
+    ])
+    return label, lambda session: session.read_resource(uri)
+
+
+def failed(result):
+    """Return whether a tool result or resource read reports an error"""
+    if getattr(result, "isError", False):
+        return True
+    contents = getattr(result, "content", None) or getattr(result, "contents", None) or []
+    text = getattr(contents[0], "text", "") if contents else ""
+    return text.startswith('{\n  "error"') or text.startswith('{"error"') or text.startswith('[{"error"')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LoadTest:
+    """Runs the sessions and collects latencies and memory samples"""
+
+    def __init__(self, args, cursor_dir, cache_dir, projects, composer_ids):
+        self.args = args
+        self.cursor_dir = cursor_dir
+        self.cache_dir = cache_dir
+        self.projects = projects
+        self.composer_ids = composer_ids
+        self.latencies = {}
+        self.errors = {}
+        self.rss_samples = []
+        self.url = None
+        self.ready = 0
+        self.all_ready = asyncio.Event()
+        self.started_at = None
+        self.stop_at = None
+
+    def server_args(self):
+        return [str(SERVER_PATH), "--cursor-path", str(self.cursor_dir), "--watch-interval", "0"]
+
+    @asynccontextmanager
+    async def connect(self):
+        """Open one client session over the configured transport"""
+        if self.url:
+            async with streamable_http_client(self.url) as (read, write, _):
+                async with ClientSession(read, write) as session:
+                    yield session
+            return
+        params = StdioServerParameters(
+            command=sys.executable, args=self.server_args(),
+            env={**os.environ, "CURSOR_DB_MCP_CACHE_DIR": str(self.cache_dir)},
+        )
+        with open(os.devnull, "w") as devnull:
+            async with stdio_client(params, errlog=devnull) as (read, write):
+                async with ClientSession(read, write) as session:
+                    yield session
+
+    async def run_session(self, index):
+        rng = random.Random(self.args.seed + index)
+        kinds = [kind for kind, weight in self.args.mix.items() if weight > 0]
+        weights = [self.args.mix[kind] for kind in kinds]
+        async with self.connect() as session:
+            await session.initialize()
+            # Wait for the server's project discovery so it isn't counted as request latency
+            await session.read_resource("cursor://projects")
+            self.ready += 1
+            if self.ready == self.args.sessions:
+                self.started_at = time.perf_counter()
+                self.stop_at = self.started_at + self.args.duration
+                self.all_ready.set()
+            await self.all_ready.wait()
+
+            async def worker():
+                while time.perf_counter() < self.stop_at:
+                    label, request = make_request(rng, rng.choices(kinds, weights)[0], self.projects,
+                                                  self.composer_ids)
+                    start = time.perf_counter()
+                    try:
+                        error = failed(await request(session))
+                    except Exception:
+                        error = True
+                    self.latencies.setdefault(label, []).append(time.perf_counter() - start)
+                    if error:
+                        self.errors[label] = self.errors.get(label, 0) + 1
+
+            async def monitor():
+                # One sampler per server process: every stdio session has its own, HTTP sessions share one
+                while True:
+                    result = await session.read_resource("cursor://metrics")
+                    rss = json.loads(result.contents[0].text)["process_rss_bytes"]
+                    self.rss_samples.append((time.perf_counter() - self.started_at, index, rss))
+                    if time.perf_counter() >= self.stop_at:
+                        break
+                    await asyncio.sleep(self.args.sample_interval)
+
+            tasks = [worker() for _ in range(self.args.concurrency)]
+            if self.url is None or index == 0:
+                tasks.append(monitor())
+            await asyncio.gather(*tasks)
+
+    async def run(self):
+        server = None
+        if self.args.transport == "streamable-http":
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, *self.server_args(), "--transport", "streamable-http", "--port", str(port),
+                 "--client-concurrency", str(self.args.concurrency)],
+                env={**os.environ, "CURSOR_DB_MCP_CACHE_DIR": str(self.cache_dir)},
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            for _ in range(300):
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                    break
+                except OSError:
+                    await asyncio.sleep(0.1)
+            self.url = f"http://127.0.0.1:{port}/mcp"
+        try:
+            await asyncio.gather(*(self.run_session(i) for i in range(self.args.sessions)))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(10)
+        return time.perf_counter() - self.started_at
+
+    def report(self, elapsed):
+        """Print the results and return them as a dict"""
+        results = {"elapsed_s": elapsed, "requests": {}, "rss": []}
+        total = sum(len(values) for values in self.latencies.values())
+        all_latencies = sorted(value for values in self.latencies.values() for value in values)
+        rows = sorted(self.latencies.items()) + [("all", all_latencies)]
+        print(f"\n{'request':<28} {'count':>7} {'errors':>7} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+              f"{'p99 ms':>9} {'max ms':>9}")
+        for label, values in rows:
+            values = sorted(values)
+            errors = sum(self.errors.values()) if label == "all" else self.errors.get(label, 0)
+            result = {
+                "count": len(values),
+                "errors": errors,
+                "ops_per_s": len(values) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+                "max_ms": (values[-1] if values else 0.0) * 1000,
+            }
+            results["requests"][label] = result
+            print(f"{label:<28} {result['count']:>7} {errors:>7} {result['ops_per_s']:>9.1f} {result['p50_ms']:>9.2f} "
+                  f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['max_ms']:>9.2f}")
+        print(f"\n{total} requests in {elapsed:.1f}s over {self.args.sessions} sessions "
+              f"x {self.args.concurrency} in flight")
+
+        # Group samples into rounds of --sample-interval so every server has one value per row
+        rounds = {}
+        for at, server, rss in self.rss_samples:
+            rounds.setdefault(int(at // self.args.sample_interval), {})[server] = rss
+        print(f"\n{'time s':>7} {'servers':>8} {'total RSS MB':>13} {'max RSS MB':>11}")
+        for number, by_server in sorted(rounds.items()):
+            values = list(by_server.values())
+            sample = {"time_s": number * self.args.sample_interval, "servers": len(values),
+                      "total_rss_mb": sum(values) / 2 ** 20, "max_rss_mb": max(values) / 2 ** 20}
+            results["rss"].append(sample)
+            print(f"{sample['time_s']:>7.1f} {sample['servers']:>8} {sample['total_rss_mb']:>13.1f} "
+                  f"{sample['max_rss_mb']:>11.1f}")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the MCP server with many concurrent client sessions")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent client sessions")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight per session")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to generate load for")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("query_table=6,resource=3,refresh_databases=1"),
+                        help="Weighted request mix, e.g. query_table=6,resource=3,refresh_databases=1")
+    parser.add_argument("--transport", choices=["stdio", "streamable-http"], default="stdio",
+                        help="One server process per session (stdio) or one shared server (streamable-http)")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between server RSS samples")
+    parser.add_argument("--cursor-path", help="Existing Cursor User directory to use instead of a synthetic one")
+    parser.add_argument("--projects", type=int, default=20, help="Number of synthetic workspaces")
+    parser.add_argument("--composers", type=int, default=200, help="Number of synthetic composers")
+    parser.add_argument("--composer-kb", type=int, default=32, help="Approximate size of each composer blob in KB")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.cursor_path:
+            cursor_dir = Path(args.cursor_path).expanduser()
+            logging.getLogger("cursor-mcp").setLevel(logging.WARNING)
+            manager = load_server_module().CursorDBManager(cursor_path=cursor_dir, cache_dir=Path(tmp) / "cache")
+            projects = sorted(manager.db_paths)
+            composer_ids = [c for p in projects for c in manager.get_composer_ids(p).get("composer_ids", [])]
+            manager.close()
+        else:
+            cursor_dir = Path(tmp) / "User"
+            print(f"Generating {args.projects} workspaces and {args.composers} composers of ~{args.composer_kb} KB...")
+            summary = generate_cursor_dir(cursor_dir, projects=args.projects, composers=args.composers,
+                                          composer_kb=args.composer_kb, seed=args.seed)
+            # Workspaces sharing a folder name are listed as name@workspace_id; the workspace ID always works
+            projects = sorted(summary["projects"])
+            composer_ids = summary["composer_ids"]
+        if not projects:
+            parser.error("No projects found")
+
+        print(f"Running {args.sessions} {args.transport} sessions x {args.concurrency} in flight "
+              f"for {args.duration:g}s, mix {args.mix}...")
+        load_test = LoadTest(args, cursor_dir, Path(tmp) / "cache", projects, composer_ids)
+        elapsed = asyncio.run(load_test.run())
+        results = load_test.report(elapsed)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
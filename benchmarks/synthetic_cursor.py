@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Generator for realistic fake Cursor user directories.
+
+Creates a Cursor `User` directory with N workspaces under workspaceStorage, each with
+a state.vscdb holding aichat chat data, a composer index and filler settings, plus a
+globalStorage/state.vscdb whose cursorDiskKV holds M composerData:* blobs of a
+configurable size. A share of the composers use the newer layout that stores each
+message under its own bubbleId:<composerId>:<bubbleId> key.
+
+Usage:
+    python benchmarks/synthetic_cursor.py OUTPUT_DIR [--projects N] [--composers M] [--composer-kb K]
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sqlite3
+import uuid
+from pathlib import Path
+
+WORDS = (
+    "function class import return async await query index cache database error fix test "
+    "refactor component state props render hook effect memo callback reducer context api "
+    "request response handler middleware schema migration model field value key type "
+    "interface generic module package build deploy config lint format python typescript"
+).split()
+
+LANGUAGES = ["python", "typescript", "javascript", "rust", "go", "sql"]
+
+MODELS = ["claude-3.5-sonnet", "gpt-4o", "claude-3-opus", "cursor-small"]
+
+TABLE_SCHEMA = "CREATE TABLE {} (key TEXT UNIQUE ON CONFLICT REPLACE, value BLOB)"
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def paragraph(rng, approx_chars):
+    parts = []
+    size = 0
+    while size < approx_chars:
+        part = sentence(rng, rng.randint(6, 18))
+        parts.append(part)
+        size += len(part) + 1
+    return " ".join(parts)
+
+
+def code_block(rng, approx_chars):
+    lines = []
+    size = 0
+    while size < approx_chars:
+        line = f"    {rng.choice(WORDS)}_{rng.randint(0, 99)} = {rng.choice(WORDS)}({rng.choice(WORDS)})"
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def make_message(rng, message_type, approx_chars, timestamp):
+    """One composer message; assistant messages carry code blocks"""
+    message = {
+        "type": message_type,
+        "bubbleId": str(uuid.UUID(int=rng.getrandbits(128))),
+        "text": paragraph(rng, approx_chars * (0.4 if message_type == 2 else 1)),
+        "richText": "",
+        "codeBlocks": [],
+        "context": {"fileSelections": [], "selections": [], "folderSelections": []},
+        "timingInfo": {"clientStartTime": timestamp},
+    }
+    if message_type == 2:
+        message["modelType"] = rng.choice(MODELS)
+        for _ in range(rng.randint(1, 3)):
+            message["codeBlocks"].append({
+                "uri": {"path": f"/code/src/{rng.choice(WORDS)}.py"},
+                "languageId": rng.choice(LANGUAGES),
+                "content": code_block(rng, approx_chars * 0.2),
+            })
+    return message
+
+
+def make_composer(rng, composer_id, approx_bytes, created_at):
+    """A composerData blob of roughly approx_bytes encoded bytes"""
+    messages = []
+    size = 0
+    timestamp = created_at
+    message_chars = max(200, approx_bytes // 24)
+    while size < approx_bytes:
+        message = make_message(rng, 1 if len(messages) % 2 == 0 else 2, message_chars, timestamp)
+        messages.append(message)
+        size += len(json.dumps(message))
+        timestamp += rng.randint(5_000, 600_000)
+    return {
+        "composerId": composer_id,
+        "name": sentence(rng, 4)[:-1],
+        "createdAt": created_at,
+        "lastUpdatedAt": timestamp,
+        "unifiedMode": rng.choice(["agent", "chat", "edit"]),
+        "status": "completed",
+        "text": "",
+        "richText": "",
+        "conversation": messages,
+    }
+
+
+def make_chat_data(rng, tabs, bubbles_per_tab, start_time):
+    chat_tabs = []
+    for _ in range(tabs):
+        bubbles = []
+        timestamp = start_time + rng.randint(0, 90) * 86_400_000
+        for i in range(bubbles_per_tab):
+            bubble = {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "type": "user" if i % 2 == 0 else "ai",
+                "text": paragraph(rng, rng.randint(80, 600)),
+            }
+            if bubble["type"] == "ai":
+                bubble["rawText"] = bubble.pop("text")
+                bubble["modelType"] = rng.choice(MODELS)
+                bubble["codeBlocks"] = [{"languageId": rng.choice(LANGUAGES), "code": code_block(rng, 200)}]
+            bubbles.append(bubble)
+            timestamp += rng.randint(5_000, 300_000)
+        chat_tabs.append({
+            "tabId": str(uuid.UUID(int=rng.getrandbits(128))),
+            "chatTitle": sentence(rng, 4)[:-1],
+            "lastSendTime": timestamp,
+            "bubbles": bubbles,
+        })
+    return {"tabs": chat_tabs}
+
+
+def create_state_db(db_path, item_table=(), disk_kv=()):
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute(TABLE_SCHEMA.format("ItemTable"))
+    conn.execute(TABLE_SCHEMA.format("cursorDiskKV"))
+    conn.executemany("INSERT INTO ItemTable VALUES (?, ?)", item_table)
+    conn.executemany("INSERT INTO cursorDiskKV VALUES (?, ?)", disk_kv)
+    conn.commit()
+    conn.close()
+
+
+def generate_cursor_dir(root, projects=20, composers=200, composer_kb=32, tabs_per_project=4,
+                        bubbles_per_tab=12, settings_per_project=200, bubble_key_share=0.25,
+                        duplicate_name_share=0.1, seed=0):
+    """
+    Generate a fake Cursor User directory.
+
+    Args:
+        root (Path): Directory to create (it's the equivalent of ~/.config/Cursor/User)
+        projects (int): Number of workspaces
+        composers (int): Number of composers in global storage, spread over the workspaces
+        composer_kb (int): Approximate encoded size of each composerData blob, in KB
+        tabs_per_project (int): aichat tabs per workspace
+        bubbles_per_tab (int): Messages per aichat tab
+        settings_per_project (int): Filler ItemTable rows per workspace
+        bubble_key_share (float): Share of composers stored in the bubbleId:* layout
+        duplicate_name_share (float): Share of workspaces reusing another workspace's folder name
+        seed (int): Random seed, so runs are reproducible
+
+    Returns:
+        dict: Summary with the composer IDs of every project
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    start_time = 1_700_000_000_000
+    composer_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(composers)]
+    owners = [rng.randrange(projects) for _ in composer_ids] if projects else []
+
+    names = []
+    for i in range(projects):
+        if names and rng.random() < duplicate_name_share:
+            names.append(rng.choice(names))
+        else:
+            names.append(f"{rng.choice(WORDS)}-{rng.choice(WORDS)}-{i}")
+
+    disk_kv = []
+    created = {}
+    for composer_id in composer_ids:
+        created_at = start_time + rng.randint(0, 180) * 86_400_000
+        composer = make_composer(rng, composer_id, composer_kb * 1024, created_at)
+        created[composer_id] = (created_at, composer["lastUpdatedAt"], composer["name"])
+        if rng.random() < bubble_key_share:
+            # Newer layout: headers in composerData, message bodies under their own keys
+            messages = composer.pop("conversation")
+            composer["fullConversationHeadersOnly"] = [
+                {"bubbleId": m["bubbleId"], "type": m["type"]} for m in messages
+            ]
+            disk_kv.extend(
+                (f"bubbleId:{composer_id}:{m['bubbleId']}", json.dumps(m)) for m in messages
+            )
+        disk_kv.append((f"composerData:{composer_id}", json.dumps(composer)))
+    create_state_db(root / "globalStorage" / "state.vscdb", disk_kv=disk_kv)
+
+    summary = {"root": str(root), "projects": {}}
+    for i, name in enumerate(names):
+        folder_uri = f"file:///Users/dev/code/{name}"
+        workspace_id = hashlib.md5(f"{folder_uri}-{i}".encode()).hexdigest()
+        workspace_dir = root / "workspaceStorage" / workspace_id
+        owned = [cid for cid, owner in zip(composer_ids, owners) if owner == i]
+        items = [
+            ("workbench.panel.aichat.view.aichat.chatdata",
+             json.dumps(make_chat_data(rng, tabs_per_project, bubbles_per_tab, start_time))),
+            ("composer.composerData", json.dumps({
+                "allComposers": [
+                    {
+                        "composerId": cid,
+                        "name": created[cid][2],
+                        "createdAt": created[cid][0],
+                        "lastUpdatedAt": created[cid][1],
+                        "unifiedMode": "agent",
+                        "type": "head",
+                    }
+                    for cid in owned
+                ],
+                "selectedComposerId": owned[0] if owned else None,
+            })),
+        ]
+        items.extend(
+            (f"workbench.setting.{rng.choice(WORDS)}.{k}", json.dumps({"value": rng.random(), "enabled": True}))
+            for k in range(settings_per_project)
+        )
+        create_state_db(workspace_dir / "state.vscdb", item_table=items)
+        (workspace_dir / "workspace.json").write_text(json.dumps({"folder": folder_uri}))
+        summary["projects"][workspace_id] = {"name": name, "composer_ids": owned}
+
+    summary["composer_ids"] = composer_ids
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a fake Cursor User directory")
+    parser.add_argument("output", help="Directory to create")
+    parser.add_argument("--projects", type=int, default=20, help="Number of workspaces")
+    parser.add_argument("--composers", type=int, default=200, help="Number of composers in global storage")
+    parser.add_argument("--composer-kb", type=int, default=32, help="Approximate size of each composer blob in KB")
+    parser.add_argument("--tabs", type=int, default=4, help="aichat tabs per workspace")
+    parser.add_argument("--bubbles", type=int, default=12, help="Messages per aichat tab")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    if output.exists() and any(output.iterdir()):
+        parser.error(f"{output} already exists and is not empty")
+    summary = generate_cursor_dir(
+        output, projects=args.projects, composers=args.composers, composer_kb=args.composer_kb,
+        tabs_per_project=args.tabs, bubbles_per_tab=args.bubbles, seed=args.seed,
+    )
+    print(f"Generated {len(summary['projects'])} workspaces and {len(summary['composer_ids'])} composers in {output}")
+    print(f"Use it with: --cursor-path {output.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,42 @@
 import os
 import json
+import base64
+import bisect
 import sqlite3
 import platform
 import re
 from pathlib import Path
+from datetime import datetime, timezone
 import argparse
 import logging
+import threading
+import time
+import asyncio
+import contextvars
+import cProfile
+import fnmatch
+import functools
+import hashlib
+import heapq
+import pstats
+import queue
+import random
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any, Union, AsyncIterator
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 import sys
+import tempfile
+import tracemalloc
+import weakref
+
+# The regex parser, used to refuse key search patterns that could backtrack catastrophically
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    # Python < 3.11
+    import sre_parse
+    import sre_constants
 
 # Configure logging
 logging.basicConfig(
@@ -28,346 +56,4329 @@ except ImportError as e:
     logger.error(f"Failed to import MCP libraries: {str(e)}. Make sure they are installed.")
     sys.exit(1)
 
+# Optional: file system notifications (inotify, FSEvents, ...) for change detection.
+# Without it the database watcher falls back to polling.
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# Optional: zstd compression of exports
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Optional: faster JSON parsing. Without it values are decoded with the stdlib json module.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Global DB manager instance
 db_manager = None
 
-class CursorDBManager:
-    def __init__(self, cursor_path=None, project_dirs=None):
+# Thread pool for the blocking work of MCP handlers
+worker_pool = None
+
+# Bump when the layout of the persisted discovery manifest changes
+MANIFEST_VERSION = 1
+
+# Well-known keys in Cursor's state.vscdb files
+CHAT_DATA_KEY = "workbench.panel.aichat.view.aichat.chatdata"
+COMPOSER_DATA_KEY = "composer.composerData"
+COMPOSER_KEY_PREFIX = "composerData:"
+BUBBLE_KEY_PREFIX = "bubbleId:"
+
+# Name under which the global storage database appears in cross-database results
+GLOBAL_DB_NAME = "(global)"
+
+# Default budget of encoded message JSON per page of the conversation readers
+DEFAULT_PAGE_BYTES = 256 * 1024
+
+def get_default_cache_dir():
+    """Return the directory for the server's persisted caches and sidecar indexes"""
+    if os.environ.get("CURSOR_DB_MCP_CACHE_DIR"):
+        return Path(os.environ["CURSOR_DB_MCP_CACHE_DIR"]).expanduser()
+    system = platform.system()
+    home = Path.home()
+    if system == "Darwin":
+        return home / "Library/Caches/cursor-db-mcp"
+    elif system == "Windows":
+        return Path(os.environ.get("LOCALAPPDATA", home / "AppData/Local")) / "cursor-db-mcp"
+    return Path(os.environ.get("XDG_CACHE_HOME", home / ".cache")) / "cursor-db-mcp"
+
+class SQLiteConnectionPool:
+    """
+    Thread-safe pool of read-only connections to a single SQLite database file.
+
+    Connections are opened in read-only URI mode (``mode=ro``) and kept open between
+    calls so the schema and page cache stay warm. If the file on disk is replaced
+    (different device/inode), all pooled connections are discarded and reopened.
+    """
+
+    def __init__(self, db_path, max_idle=4, timeout=5.0):
         """
-        Initialize the CursorDBManager with a Cursor main directory and/or list of project directories.
-        
         Args:
-            cursor_path (str): Path to main Cursor directory (e.g. ~/Library/Application Support/Cursor/User/)
-            project_dirs (list): List of paths to Cursor project directories containing state.vscdb files
+            db_path (str): Path to the SQLite database file
+            max_idle (int): Maximum number of idle connections kept open
+            timeout (float): Seconds SQLite waits on a locked database before failing
         """
-        if cursor_path:
-            self.cursor_path = Path(cursor_path).expanduser().resolve()
+        self.db_path = str(db_path)
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._file_id = None
+        self._generation = 0
+
+    def _stat_file_id(self):
+        """Return a (device, inode) pair identifying the file currently at db_path"""
+        try:
+            st = os.stat(self.db_path)
+        except OSError as e:
+            raise sqlite3.OperationalError(f"unable to open database file: {self.db_path} ({e})")
+        return (st.st_dev, st.st_ino)
+
+    def _open(self):
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        return sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False)
+
+    def _acquire(self):
+        file_id = self._stat_file_id()
+        with self._lock:
+            if file_id != self._file_id:
+                if self._file_id is not None:
+                    logger.info(f"Database file replaced, recycling connections: {self.db_path}")
+                stale, self._idle = self._idle, []
+                self._file_id = file_id
+                self._generation += 1
+            else:
+                stale = []
+            generation = self._generation
+            conn = self._idle.pop() if self._idle else None
+        for old in stale:
+            old.close()
+        if conn is None:
+            conn = self._open()
+        return conn, generation
+
+    def _release(self, conn, generation):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if generation == self._generation and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection from the pool for the duration of a with-block"""
+        conn, generation = self._acquire()
+        try:
+            yield conn
+        except sqlite3.Error:
+            # Don't return a connection in an unknown state to the pool
+            conn.close()
+            raise
+        except BaseException:
+            self._release(conn, generation)
+            raise
         else:
-            # Try to get the default cursor path
-            self.cursor_path = self.get_default_cursor_path()
-            
-        self.project_dirs = project_dirs or []
-        self.db_paths = {}
-        self.projects_info = {}
-        self.global_db_path = None
-        self.refresh_db_paths()
+            self._release(conn, generation)
+
+    def close(self):
+        """Close all idle connections; connections currently in use are closed on release"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._generation += 1
+            self._file_id = None
+        for conn in idle:
+            conn.close()
+
+def database_signature(db_path):
+    """
+    Return a cheap fingerprint of a SQLite database's on-disk state.
+
+    The fingerprint combines inode, mtime and size of the database file and of its
+    write-ahead log, so it changes whenever SQLite commits to the database (WAL
+    writes, checkpoints) or the file is replaced.
+    """
+    signature = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            st = os.stat(path)
+            signature.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+if orjson is not None:
+    JSON_BACKEND = "orjson"
+
+    def json_loads(value):
+        """Parse JSON with orjson, deferring to the stdlib for input orjson rejects"""
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than the stdlib (NaN, integers beyond 64 bits, non-str input)
+            return json.loads(value)
+else:
+    JSON_BACKEND = "json"
+    json_loads = json.loads
+
+def decode_value(value):
+    """Decode a stored value as JSON, returning it unchanged if it isn't valid JSON"""
+    try:
+        decoded = json_loads(value)
+    except (json.JSONDecodeError, TypeError, UnicodeDecodeError):
+        return value
+    metrics.count("bytes_decoded", len(value))
+    return decoded
+
+def encode_page_token(query, last_key):
+    """Encode an opaque continuation token that resumes `query` after `last_key`"""
+    payload = json.dumps({"query": query, "after": last_key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_page_token(token, query):
+    """Decode a continuation token, checking that it was issued for the same query"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        after_key = payload["after"]
+        issued_for = payload["query"]
+    except (ValueError, TypeError, KeyError, UnicodeError):
+        raise ValueError("Invalid page token")
+    if issued_for != query:
+        raise ValueError("Page token was issued for a different query")
+    return after_key
+
+class JSONProjection:
+    """
+    Projection of stored JSON values onto a list of JSON paths, evaluated inside SQLite.
+
+    Paths use SQLite's JSON path syntax, with or without the leading `$.`
+    (e.g. `name`, `conversation[0].text`). One `[*]` wildcard per path is
+    supported and is expanded with json_each, so `allComposers[*].composerId`
+    returns an array of every composer's ID. Only the extracted fragments leave
+    the database; the full value is never decoded in Python.
+
+    select_sql refers to the value column as `t.value`, so the table must be
+    aliased as `t` in the query it's used in.
+    """
+
+    def __init__(self, fields):
+        """
+        Args:
+            fields (list): JSON paths to extract
+        """
+        if isinstance(fields, str):
+            fields = [f.strip() for f in fields.split(",") if f.strip()]
+        if not fields:
+            raise ValueError("At least one field must be given")
+        self.fields = list(fields)
+        expressions = []
+        self.params = []
+        for field in self.fields:
+            path = field if field.startswith("$") else ("$" if field.startswith("[") else "$.") + field
+            if path.count("[*]") > 1:
+                raise ValueError(f"Only one [*] wildcard is supported per field: {field}")
+            if "[*]" in path:
+                array_path, element_path = path.split("[*]", 1)
+                expressions.append(
+                    "(SELECT json_group_array(json_extract(j.value, ?)) FROM json_each(t.value, ?) AS j)"
+                )
+                self.params.extend(["$" + element_path, array_path])
+            else:
+                expressions.append("json_quote(json_extract(t.value, ?))")
+                self.params.append(path)
+        # Non-JSON values (plain strings in ItemTable) project to nulls instead of failing the query
+        self.select_sql = ", ".join(f"CASE WHEN json_valid(t.value) THEN {expr} END" for expr in expressions)
+
+    def decode(self, columns):
+        """Turn the projected columns of a row into a {field: value} dict"""
+        metrics.count("bytes_decoded", sum(value_size(column) for column in columns))
+        return {
+            field: json_loads(column) if column is not None else None
+            for field, column in zip(self.fields, columns)
+        }
+
+class _ReverseKey:
+    """Wraps a key so larger scores but smaller keys sort first in a max-ordered heap"""
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+def key_prefix_range(prefix):
+    """Return (lower, upper) bounds so that `key >= lower AND key < upper` matches keys starting with prefix"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def parse_timestamp(value):
+    """
+    Convert a time to epoch milliseconds, the unit Cursor stores timestamps in
     
-    def get_default_cursor_path(self):
-        """Return the default Cursor path based on the operating system"""
-        system = platform.system()
-        home = Path.home()
+    Accepts epoch milliseconds or an ISO 8601 string (e.g. "2025-03-01" or
+    "2025-03-01T12:00:00+01:00"; times without a zone are taken as UTC).
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid timestamp '{value}', expected epoch milliseconds or an ISO 8601 date")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+KEY_MATCH_MODES = ("substring", "prefix", "glob", "regex")
+
+# Limits on client-supplied key regexes. Python's re can't be interrupted in the middle
+# of a match, so patterns that can backtrack catastrophically are refused up front
+MAX_REGEX_LENGTH = 256
+# Keys are matched on at most their first this many characters
+MAX_REGEX_KEY_LENGTH = 512
+# With k unbounded repeats a failing search of an n-character key takes up to ~n^(k+1) steps
+MAX_REGEX_UNBOUNDED_REPEATS = 1
+# Bound on the backtracking steps of a failing search of a MAX_REGEX_KEY_LENGTH key:
+# n times the number of ways each repeat can vary (n for unbounded ones), multiplied
+MAX_REGEX_STEPS = 1 << 22
+
+def literal_key_prefix(pattern, match):
+    """
+    Return the literal text that every key matched by a glob or regex pattern starts with
+    
+    Globs match whole keys, so their prefix is everything before the first wildcard.
+    Regexes are searched anywhere in the key, so only a pattern anchored with ^ has a
+    prefix. An empty string means the pattern can match keys starting with anything.
+    """
+    if match == "glob":
+        special = "*?["
+    elif pattern.startswith("^") and "|" not in pattern:
+        pattern = pattern[1:]
+        special = ".^$*+?{}[]()\\"
+    else:
+        return ""
+    end = 0
+    while end < len(pattern) and pattern[end] not in special:
+        end += 1
+    if match == "regex" and pattern[end:end + 1] in ("*", "?", "{"):
+        # A quantifier makes the last literal character optional
+        end -= 1
+    return pattern[:max(end, 0)]
+
+def check_regex_complexity(pattern):
+    """
+    Refuse a regex whose matching time could explode on a single key
+    
+    Rejects nested repeats such as (a+)+, repeated alternations such as (a|aa)*,
+    backreferences and conditionals, more than MAX_REGEX_UNBOUNDED_REPEATS unbounded
+    repeats, sequences of repeats such as a{0,64}a{0,64} that could take more than
+    MAX_REGEX_STEPS steps, and patterns longer than MAX_REGEX_LENGTH.
+    
+    Raises:
+        ValueError: If the pattern is refused or invalid
+    """
+    if len(pattern) > MAX_REGEX_LENGTH:
+        raise ValueError(f"Regex patterns are limited to {MAX_REGEX_LENGTH} characters")
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error as e:
+        raise ValueError(f"Invalid regex pattern: {e}")
+    unbounded = 0
+    steps = MAX_REGEX_KEY_LENGTH
+    
+    def walk(items, repeated):
+        nonlocal unbounded, steps
+        for op, arg in items:
+            name = str(op)
+            if name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+                low, high, subpattern = arg
+                if high > 1 and repeated:
+                    raise ValueError("Nested repeats such as (a+)* can take exponential time; "
+                                     "use a single repeat or a character class")
+                if high == sre_constants.MAXREPEAT or high - low >= MAX_REGEX_KEY_LENGTH:
+                    unbounded += 1
+                    steps *= MAX_REGEX_KEY_LENGTH
+                else:
+                    steps *= high - low + 1
+                walk(subpattern, repeated or high > 1)
+            elif name == "BRANCH":
+                if repeated:
+                    raise ValueError("Repeated alternations such as (a|ab)* can take exponential time; "
+                                     "use a character class instead")
+                for branch in arg[1]:
+                    walk(branch, repeated)
+            elif name == "SUBPATTERN":
+                walk(arg[-1], repeated)
+            elif name in ("ASSERT", "ASSERT_NOT"):
+                walk(arg[1], repeated)
+            elif name in ("GROUPREF", "GROUPREF_EXISTS"):
+                raise ValueError("Backreferences and conditionals are not supported in key regexes")
+    
+    walk(parsed, False)
+    if unbounded > MAX_REGEX_UNBOUNDED_REPEATS:
+        raise ValueError(f"Regex patterns may contain at most {MAX_REGEX_UNBOUNDED_REPEATS} unbounded repeats "
+                         f"(*, +, {{n,}})")
+    if steps > MAX_REGEX_STEPS:
+        raise ValueError("Regex pattern has too many variable-length repeats to match quickly; "
+                         "use fewer or narrower ones, e.g. {2} instead of {0,8}")
+
+def compile_key_matcher(pattern, match):
+    """Return a function of a key that tests it against a glob (whole key) or regex (anywhere in the key) pattern"""
+    if match == "regex":
+        check_regex_complexity(pattern)
+    try:
+        if match == "glob":
+            # fnmatch translates wildcards without nested repeats, so globs can't backtrack catastrophically
+            return re.compile(fnmatch.translate(pattern)).match
+        search = re.compile(pattern).search
+    except re.error as e:
+        raise ValueError(f"Invalid {match} pattern: {e}")
+    # Matching time grows with the key's length, so very long keys are cut
+    return lambda key: search(key[:MAX_REGEX_KEY_LENGTH])
+
+class KeyIndex:
+    """
+    In-memory sorted list of the keys of each database table, for glob and regex key search.
+
+    Entries are keyed by (db_path, table) and tagged with the database_signature they
+    were read at. A lookup rebuilds only the entries whose database has changed, so
+    after Cursor writes to one database the keys of all the others are reused. Matching
+    bisects to the pattern's literal prefix and tests only the keys in that range.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def keys(self, manager, db_path, table_name):
+        """Return the sorted keys of a table, reading them again if the database has changed"""
+        signature = database_signature(db_path)
+        with self._lock:
+            entry = self._entries.get((db_path, table_name))
+        if entry is not None and entry[0] == signature:
+            metrics.count("cache_hits")
+            return entry[1]
+        metrics.count("cache_misses")
+        with manager.connect(db_path) as conn:
+            # Covered by the key column's unique index, so no values are read
+            keys = [row[0] for row in conn.execute(f"SELECT key FROM {table_name} WHERE key IS NOT NULL ORDER BY key")]
+        metrics.count("rows_scanned", len(keys))
+        with self._lock:
+            self._entries[(db_path, table_name)] = (signature, keys)
+        logger.info(f"Indexed {len(keys)} keys of {table_name} in {db_path}")
+        return keys
+
+    def match(self, manager, db_path, table_name, pattern, match, after_key=None, limit=None):
+        """
+        Return the keys of a table that match a glob or regex pattern, in key order
         
-        default_path = None
-        if system == "Darwin":  # macOS
-            default_path = home / "Library/Application Support/Cursor/User"
-        elif system == "Windows":
-            default_path = home / "AppData/Roaming/Cursor/User"
-        elif system == "Linux":
-            default_path = home / ".config/Cursor/User"
-        else:
-            logger.warning(f"Unknown operating system: {system}. Cannot determine default Cursor path.")
+        Args:
+            manager (CursorDBManager): Manager to read keys through
+            db_path (str): Path to a state.vscdb file
+            table_name (str): Either 'ItemTable' or 'cursorDiskKV'
+            pattern (str): Glob or regular expression
+            match (str): 'glob' or 'regex'
+            after_key (str, optional): Only return keys after this one
+            limit (int, optional): Maximum number of keys to return
+            
+        Returns:
+            list: Matching keys
+        """
+        test = compile_key_matcher(pattern, match)
+        prefix = literal_key_prefix(pattern, match)
+        keys = self.keys(manager, db_path, table_name)
+        start = bisect.bisect_left(keys, prefix) if prefix else 0
+        if after_key is not None:
+            start = max(start, bisect.bisect_right(keys, after_key))
+        token = current_cancel_token.get()
+        matched = []
+        for i in range(start, len(keys)):
+            key = keys[i]
+            if prefix and not key.startswith(prefix):
+                break
+            # A single match is bounded by check_regex_complexity, so checking between keys
+            # keeps cancellation and the deadline responsive
+            if token is not None:
+                token.check()
+            if test(key):
+                matched.append(key)
+                if limit is not None and len(matched) >= limit:
+                    break
+        return matched
+
+    def invalidate(self, db_path=None):
+        """Drop all entries, or only the entries for one database"""
+        with self._lock:
+            for entry_key in [k for k in self._entries if db_path is None or k[0] == db_path]:
+                del self._entries[entry_key]
+
+    def stats(self):
+        """Return the number of indexed tables and keys"""
+        with self._lock:
+            return {
+                "tables": len(self._entries),
+                "keys": sum(len(keys) for _, keys in self._entries.values()),
+            }
+
+def message_text(message):
+    """Return the text of a chat bubble or composer message"""
+    if not isinstance(message, dict):
+        return ""
+    return message.get("text") or message.get("rawText") or ""
+
+def iter_chat_tabs(chat_data):
+    """Yield the tabs of a project's aichat chat data"""
+    tabs = chat_data.get("tabs") if isinstance(chat_data, dict) else None
+    for tab in tabs or []:
+        if isinstance(tab, dict):
+            yield tab
+
+def composer_fingerprints(conn):
+    """
+    Return composer ID -> "size:lastUpdatedAt" for every composer in a global storage database
+
+    The fingerprints are computed by SQLite, so no composer is decoded in Python.
+    """
+    lower, upper = key_prefix_range(COMPOSER_KEY_PREFIX)
+    rows = conn.execute(
+        """
+        SELECT key, length(value),
+               CASE WHEN json_valid(value) THEN json_extract(value, '$.lastUpdatedAt') END
+        FROM cursorDiskKV WHERE key >= ? AND key < ?
+        """,
+        (lower, upper)
+    ).fetchall()
+    metrics.count("rows_scanned", len(rows))
+    return {key[len(COMPOSER_KEY_PREFIX):]: f"{size}:{updated_at}" for key, size, updated_at in rows}
+
+def load_composer_bubbles(conn, composer_id):
+    """Read the separately stored bubbles of a composer from the global cursorDiskKV"""
+    lower, upper = key_prefix_range(f"{BUBBLE_KEY_PREFIX}{composer_id}:")
+    bubbles = {}
+    bytes_read = 0
+    for key, value in conn.execute(
+        "SELECT key, value FROM cursorDiskKV WHERE key >= ? AND key < ?", (lower, upper)
+    ):
+        bytes_read += value_size(value)
+        bubbles[key[len(lower):]] = decode_value(value)
+    metrics.count("rows_scanned", len(bubbles))
+    metrics.count("bytes_read", bytes_read)
+    return bubbles
+
+class ComposerSummary:
+    """One entry of a project's composer.composerData `allComposers` list, without the fields we don't use"""
+    __slots__ = ("composer_id", "name", "created_at", "last_updated_at")
+
+    def __init__(self, composer_id, name=None, created_at=None, last_updated_at=None):
+        self.composer_id = composer_id
+        self.name = name
+        self.created_at = created_at
+        self.last_updated_at = last_updated_at
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("composerId"), data.get("name"), data.get("createdAt"), data.get("lastUpdatedAt"))
+
+    def to_dict(self):
+        return {
+            "composerId": self.composer_id,
+            "name": self.name,
+            "createdAt": self.created_at,
+            "lastUpdatedAt": self.last_updated_at,
+        }
+
+class ComposerIndex:
+    """Typed view of a project's composer.composerData value"""
+    __slots__ = ("composers", "selected_composer_id")
+
+    def __init__(self, composers, selected_composer_id=None):
+        self.composers = composers
+        self.selected_composer_id = selected_composer_id
+
+    @property
+    def composer_ids(self):
+        return [composer.composer_id for composer in self.composers if composer.composer_id]
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            return None
+        return cls(
+            [ComposerSummary.from_dict(c) for c in data.get("allComposers") or [] if isinstance(c, dict)],
+            data.get("selectedComposerId")
+        )
+
+    @classmethod
+    def from_json(cls, raw):
+        """Decode a stored composer.composerData value, or return None if it isn't a JSON object"""
+        try:
+            return cls.from_dict(json_loads(raw))
+        except (ValueError, TypeError, UnicodeDecodeError):
+            return None
+
+class ConversationMessage:
+    """A chat bubble or composer message, reduced to the fields we search, display and count"""
+    __slots__ = ("bubble_id", "type", "text", "model", "code_blocks", "timestamp")
+
+    def __init__(self, bubble_id, type, text, model=None, code_blocks=0, timestamp=None):
+        self.bubble_id = bubble_id
+        self.type = type
+        self.text = text
+        self.model = model
+        self.code_blocks = code_blocks
+        self.timestamp = timestamp
+
+    @property
+    def from_user(self):
+        # Composers number the roles (1 = user, 2 = assistant), aichat bubbles name them
+        return self.type in (1, "user")
+
+    @classmethod
+    def from_dict(cls, data):
+        model_info = data.get("modelInfo")
+        timing = data.get("timingInfo")
+        code_blocks = data.get("codeBlocks")
+        return cls(
+            data.get("bubbleId") or data.get("id"),
+            data.get("type"),
+            message_text(data),
+            data.get("modelType") or (model_info.get("modelName") if isinstance(model_info, dict) else None),
+            len(code_blocks) if isinstance(code_blocks, list) else 0,
+            timing.get("clientStartTime") if isinstance(timing, dict) else None
+        )
+
+    def to_dict(self):
+        return {"bubbleId": self.bubble_id, "type": self.type, "text": self.text, "model": self.model,
+                "codeBlocks": self.code_blocks, "timestamp": self.timestamp}
+
+class ChatTab:
+    """An aichat tab of a project's chat data, with its bubbles reduced to ConversationMessages"""
+    __slots__ = ("tab_id", "title", "last_send_time", "messages")
+
+    def __init__(self, tab_id, title=None, last_send_time=None, messages=()):
+        self.tab_id = tab_id
+        self.title = title
+        self.last_send_time = last_send_time
+        self.messages = messages
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("tabId"),
+            data.get("chatTitle"),
+            data.get("lastSendTime"),
+            [ConversationMessage.from_dict(b) for b in data.get("bubbles") or [] if isinstance(b, dict)]
+        )
+
+class ComposerConversation:
+    """
+    Typed view of a composerData:<id> value.
+
+    Keeps the conversation's metadata and the text of its messages; code blocks,
+    rich text, context and the other per-message fields are dropped while decoding.
+    Composers that store their messages under separate bubbleId keys have no
+    `messages`, only the `bubble_ids` of their message headers.
+    """
+    __slots__ = ("composer_id", "name", "created_at", "last_updated_at", "messages", "bubble_ids")
+
+    def __init__(self, composer_id, name=None, created_at=None, last_updated_at=None, messages=(), bubble_ids=()):
+        self.composer_id = composer_id
+        self.name = name
+        self.created_at = created_at
+        self.last_updated_at = last_updated_at
+        self.messages = messages
+        self.bubble_ids = bubble_ids
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
             return None
+        conversation = data.get("conversation")
+        messages = [ConversationMessage.from_dict(m) for m in conversation or [] if isinstance(m, dict)]
+        bubble_ids = []
+        if not messages:
+            bubble_ids = [
+                header["bubbleId"] for header in data.get("fullConversationHeadersOnly") or []
+                if isinstance(header, dict) and header.get("bubbleId")
+            ]
+        return cls(data.get("composerId"), data.get("name"), data.get("createdAt"), data.get("lastUpdatedAt"),
+                   messages, bubble_ids)
+
+    @classmethod
+    def from_json(cls, raw):
+        """Decode a stored composerData value, or return None if it isn't a JSON object"""
+        try:
+            return cls.from_dict(json_loads(raw))
+        except (ValueError, TypeError, UnicodeDecodeError):
+            return None
+
+    def to_dict(self):
+        return {
+            "composerId": self.composer_id,
+            "name": self.name,
+            "createdAt": self.created_at,
+            "lastUpdatedAt": self.last_updated_at,
+            "messages": [message.to_dict() for message in self.messages],
+            "bubbleIds": list(self.bubble_ids),
+        }
+
+class DecodedValueCache:
+    """
+    Thread-safe LRU cache of decoded database values with a memory budget.
+
+    Entries are keyed by (db_path, table, key) and tagged with the database_signature
+    that was current when the value was read, so a lookup only hits while the
+    database is unchanged. The budget is measured in bytes of the encoded value,
+    which is what SQLite hands back before decoding.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key, signature):
+        """
+        Look up a cached value.
+
+        Returns:
+            tuple: (found, value); found is False on a miss or a stale entry
+        """
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return True, entry[2]
+            if entry is not None:
+                self._remove(cache_key)
+            self.misses += 1
+            return False, None
+
+    def put(self, cache_key, signature, value, size):
+        """Store a decoded value, evicting least recently used entries to stay within budget"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if cache_key in self._entries:
+                self._remove(cache_key)
+            self._entries[cache_key] = (signature, size, value)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, db_path=None):
+        """Drop all entries, or only the entries for one database"""
+        with self._lock:
+            for cache_key in [k for k in self._entries if db_path is None or k[0] == db_path]:
+                self._remove(cache_key)
+
+    def stats(self):
+        """Return hit/miss counters and memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, cache_key):
+        _, size, _ = self._entries.pop(cache_key)
+        self.current_bytes -= size
+
+class QueryCancelled(Exception):
+    """Raised inside blocking database work when the request that started it was cancelled"""
+
+class RequestLimitExceeded(ValueError):
+    """Raised when a request runs past its deadline or reads more rows or bytes than it may return"""
+
+class CancelToken:
+    """
+    Cancellation flag, deadline and result budget for the blocking work of one request.
+
+    Connections borrowed through CursorDBManager.connect while a token is current
+    are registered with it, so cancel() can interrupt a running SQLite statement
+    from another thread. A progress handler also checks the flag and the deadline
+    every 1000 SQLite instructions, which stops a long scan once its time is up and
+    catches a cancel that lands just before a statement starts.
+    """
+
+    def __init__(self, timeout=None, max_rows=None, max_bytes=None):
+        """
+        Args:
+            timeout (float): Seconds the work may run before it is interrupted, or None for no deadline
+            max_rows (int): Rows the work may return (see charge()), or None for no limit
+            max_bytes (int): Bytes of values the work may return, or None for no limit
+        """
+        self.cancelled = False
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.bytes = 0
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            connections = list(self._connections)
+        for conn in connections:
+            conn.interrupt()
+
+    def expired(self):
+        """Return whether the deadline has passed"""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def stopped(self):
+        """Return whether the work should stop, because it was cancelled or its deadline has passed"""
+        return self.cancelled or self.expired()
+
+    def check(self):
+        """Raise QueryCancelled if the request has been cancelled, or RequestLimitExceeded past its deadline"""
+        if self.cancelled:
+            raise QueryCancelled("Request was cancelled")
+        if self.expired():
+            raise RequestLimitExceeded(f"Request exceeded its deadline of {self.timeout:g}s")
+
+    def charge(self, rows=0, nbytes=0):
+        """
+        Count rows and bytes the work is about to return against the budget
+        
+        Raises:
+            RequestLimitExceeded: If the request has now read more than it may return
+        """
+        self.rows += rows
+        self.bytes += nbytes
+        if self.max_rows is not None and self.rows > self.max_rows:
+            raise RequestLimitExceeded(
+                f"Request would return more than {self.max_rows} rows; lower the limit or paginate"
+            )
+        if self.max_bytes is not None and self.bytes > self.max_bytes:
+            raise RequestLimitExceeded(
+                f"Request would return more than {self.max_bytes} bytes; select fields, lower the limit or paginate"
+            )
+        self.check()
+
+    @contextmanager
+    def exempt(self):
+        """
+        Suspend the deadline and result budget for a with-block; cancellation still applies
+        
+        Meant for index maintenance, whose work outlives the request. The time spent in
+        the block doesn't count against the deadline, nor do its rows against the budget.
+        """
+        limits = (self.deadline, self.max_rows, self.max_bytes, self.rows, self.bytes)
+        self.deadline = self.max_rows = self.max_bytes = None
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            deadline, self.max_rows, self.max_bytes, self.rows, self.bytes = limits
+            self.deadline = deadline + (time.monotonic() - start) if deadline is not None else None
+
+    @contextmanager
+    def watch(self, conn):
+        """Register a connection for interruption while a with-block runs on it"""
+        with self._lock:
+            self.check()
+            self._connections.add(conn)
+        conn.set_progress_handler(self.stopped, 1000)
+        try:
+            yield conn
+        except sqlite3.OperationalError:
+            # An interrupted statement fails with "interrupted"; report why it was stopped instead
+            self.check()
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+            with self._lock:
+                self._connections.discard(conn)
+
+# Cancel token of the request whose blocking work is running in the current thread
+current_cancel_token = contextvars.ContextVar("current_cancel_token", default=None)
+
+def is_busy_error(error):
+    """Return whether a sqlite3 error means the database was busy or locked by another connection"""
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error)
+    return "database is locked" in message or "database is busy" in message
+
+def retry_on_busy(fn=None, attempts=4, initial_delay=0.05, max_delay=1.0):
+    """
+    Decorator that retries a function with exponential backoff while SQLite reports the database as busy
+
+    Each attempt already waits up to the connection's busy timeout, so the retries
+    only cover lock contention that outlasts it (e.g. Cursor writing a large
+    transaction). The last error is raised once the attempts are used up.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            delay = initial_delay
+            for attempt in range(1, attempts + 1):
+                try:
+                    return fn(*args, **kwargs)
+                except sqlite3.OperationalError as e:
+                    if attempt == attempts or not is_busy_error(e):
+                        raise
+                    logger.info(f"Database busy in {fn.__name__}, retrying in {delay:.2f}s ({attempt}/{attempts})")
+                metrics.count("busy_retries")
+                token = current_cancel_token.get()
+                if token is not None:
+                    token.check()
+                time.sleep(delay * (0.5 + random.random() / 2))
+                delay = min(delay * 2, max_delay)
+        return wrapper
+    return decorator(fn) if fn is not None else decorator
+
+class WorkerPool:
+    """
+    Bounded thread pool that runs the MCP handlers' blocking SQLite and JSON work
+    off the event loop, so concurrent requests overlap instead of queueing.
+    """
+
+    def __init__(self, max_workers=None):
+        """
+        Args:
+            max_workers (int): Maximum number of requests doing database work at once
+        """
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cursor-db-worker")
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) in the pool and return its result
+        
+        If the awaiting request is cancelled, the work's CancelToken is cancelled too,
+        which interrupts any SQLite statement it is running.
+        """
+        return await self.run_with_token(CancelToken(), fn, *args, **kwargs)
+
+    async def run_with_token(self, token, fn, *args, **kwargs):
+        """Like run(), with a CancelToken that carries the request's deadline and result budget"""
+        context = contextvars.copy_context()
+        context.run(current_cancel_token.set, token)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(context.run, fn, *args, **kwargs))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            token.cancel()
+            raise
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class ClientConcurrencyLimiter:
+    """
+    Caps how many requests of each client session do blocking work at once.
+
+    With many clients sharing one worker pool, this keeps a single busy client from
+    occupying every worker; its extra requests wait for one of its own to finish.
+    Sessions are held weakly, so a disconnected client's slots go away with it.
+    """
+
+    def __init__(self, limit=None):
+        """
+        Args:
+            limit (int): Concurrent requests allowed per session, or None for no limit
+        """
+        self.limit = limit
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @asynccontextmanager
+    async def slot(self, session):
+        """Wait for a free slot of the session for the duration of the with-block"""
+        if self.limit is None or session is None:
+            yield
+            return
+        semaphore = self._semaphores.get(session)
+        if semaphore is None:
+            semaphore = self._semaphores[session] = asyncio.Semaphore(self.limit)
+        async with semaphore:
+            yield
+
+# Per-client limit on concurrent blocking work, configured by --client-concurrency
+client_limiter = ClientConcurrencyLimiter()
+
+class RequestLimits:
+    """
+    Deadline and result budget for the blocking work of each MCP request.
+
+    Handlers are identified by their instrumented operation name, e.g.
+    "tool:query_table". A handler's own deadline replaces the default one, and
+    None means no deadline.
+    """
+
+    # Handlers that legitimately run long; clients can still cancel them
+    DEFAULT_DEADLINES = {"tool:export_conversations": None}
+
+    def __init__(self, timeout=None, max_rows=None, max_bytes=None, deadlines=None):
+        """
+        Args:
+            timeout (float): Default seconds a request may run, or None for no deadline
+            max_rows (int): Rows a query may return, or None for no limit
+            max_bytes (int): Bytes of values a query may return, or None for no limit
+            deadlines (dict): Operation name -> seconds (or None), overriding the default
+        """
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.deadlines = {**self.DEFAULT_DEADLINES, **(deadlines or {})}
+
+    def token(self, operation=None):
+        """Return a new CancelToken with the limits of the given handler"""
+        timeout = self.deadlines.get(operation, self.timeout)
+        return CancelToken(timeout, self.max_rows, self.max_bytes)
+
+# Limits of the blocking work of each request, configured by --timeout, --tool-timeout, --max-rows and --max-bytes
+request_limits = RequestLimits()
+
+def charge_request(rows=0, nbytes=0):
+    """Count rows and bytes about to be returned against the current request's budget, if there is one"""
+    token = current_cancel_token.get()
+    if token is not None:
+        token.charge(rows, nbytes)
+
+@contextmanager
+def exempt_from_request_limits():
+    """Run a with-block without the current request's deadline and budget (see CancelToken.exempt)"""
+    token = current_cancel_token.get()
+    if token is None:
+        yield
+        return
+    with token.exempt():
+        yield
+
+# Names of the operations (manager methods and MCP handlers) the current thread is working for
+current_operations = contextvars.ContextVar("current_operations", default=())
+
+def process_rss_bytes():
+    """Return the resident set size of this process in bytes, or None if it can't be determined"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # No /proc (macOS): fall back to the peak RSS, which macOS reports in bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+class Metrics:
+    """
+    Thread-safe per-operation call counts, latency histograms and I/O counters.
+
+    An operation is timed with `operation(name)` (or the `instrumented` decorator).
+    I/O counted with `count()` while operations are running is added to every
+    operation on the current context's stack, so a handler's totals include the
+    manager calls it made, including those running on the worker pool.
+    """
+
+    # Upper bounds of the latency histogram buckets, in seconds
+    LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    COUNTERS = ("rows_scanned", "bytes_read", "bytes_decoded", "cache_hits", "cache_misses", "busy_retries")
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def _operation(self, name):
+        stats = self._operations.get(name)
+        if stats is None:
+            stats = self._operations[name] = {
+                "calls": 0,
+                "errors": 0,
+                "seconds": 0.0,
+                "max_seconds": 0.0,
+                "buckets": [0] * (len(self.LATENCY_BUCKETS) + 1),
+                **{counter: 0 for counter in self.COUNTERS},
+            }
+        return stats
+
+    def observe(self, name, seconds, error=False):
+        """Record one call of an operation"""
+        bucket = len(self.LATENCY_BUCKETS)
+        for i, bound in enumerate(self.LATENCY_BUCKETS):
+            if seconds <= bound:
+                bucket = i
+                break
+        with self._lock:
+            stats = self._operation(name)
+            stats["calls"] += 1
+            stats["errors"] += bool(error)
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["buckets"][bucket] += 1
+
+    def count(self, counter, value=1):
+        """Add to an I/O counter of the operations running in the current context"""
+        names = current_operations.get()
+        if not names or not value:
+            return
+        with self._lock:
+            for name in names:
+                self._operation(name)[counter] += value
+
+    @contextmanager
+    def operation(self, name):
+        """Time a with-block as one call of an operation"""
+        names = current_operations.get()
+        reset = current_operations.set(names if name in names else names + (name,))
+        start = time.perf_counter()
+        error = True
+        try:
+            yield
+            error = False
+        finally:
+            current_operations.reset(reset)
+            self.observe(name, time.perf_counter() - start, error)
+
+    def reset(self):
+        with self._lock:
+            self._operations = {}
+            self.started_at = time.time()
+
+    def snapshot(self, value_cache=None):
+        """
+        Return all metrics as a JSON-serializable dict
+
+        Args:
+            value_cache (DecodedValueCache, optional): Cache whose statistics to include
+        """
+        with self._lock:
+            operations = {name: dict(stats, buckets=list(stats["buckets"])) for name, stats in self._operations.items()}
+        for stats in operations.values():
+            cumulative = 0
+            histogram = {}
+            for bound, count in zip([*self.LATENCY_BUCKETS, "+Inf"], stats.pop("buckets")):
+                cumulative += count
+                histogram[str(bound)] = cumulative
+            lookups = stats["cache_hits"] + stats["cache_misses"]
+            stats["latency_histogram"] = histogram
+            stats["mean_ms"] = round(stats["seconds"] * 1000 / stats["calls"], 3) if stats["calls"] else 0.0
+            stats["max_ms"] = round(stats.pop("max_seconds") * 1000, 3)
+            stats["cache_hit_rate"] = stats["cache_hits"] / lookups if lookups else 0.0
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "process_rss_bytes": process_rss_bytes(),
+            "operations": dict(sorted(operations.items())),
+            "value_cache": value_cache.stats() if value_cache is not None else None,
+        }
+
+    def prometheus_text(self, value_cache=None):
+        """Return all metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot(value_cache)
+        operations = snapshot["operations"]
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        metric("cursor_mcp_calls_total", "counter", "Number of calls per operation",
+               [({"operation": op}, s["calls"]) for op, s in operations.items()])
+        metric("cursor_mcp_errors_total", "counter", "Number of calls per operation that raised",
+               [({"operation": op}, s["errors"]) for op, s in operations.items()])
+        lines.append("# HELP cursor_mcp_duration_seconds Call latency per operation")
+        lines.append("# TYPE cursor_mcp_duration_seconds histogram")
+        for op, s in operations.items():
+            for le, count in s["latency_histogram"].items():
+                lines.append(f'cursor_mcp_duration_seconds_bucket{{operation="{op}",le="{le}"}} {count}')
+            lines.append(f'cursor_mcp_duration_seconds_sum{{operation="{op}"}} {s["seconds"]}')
+            lines.append(f'cursor_mcp_duration_seconds_count{{operation="{op}"}} {s["calls"]}')
+        for counter, help_text in (
+            ("rows_scanned", "Rows read from SQLite"),
+            ("bytes_read", "Bytes of values read from SQLite"),
+            ("bytes_decoded", "Bytes of JSON decoded"),
+            ("cache_hits", "Decoded value cache hits"),
+            ("cache_misses", "Decoded value cache misses"),
+            ("busy_retries", "Retries after SQLite reported the database busy"),
+        ):
+            metric(f"cursor_mcp_{counter}_total", "counter", f"{help_text} per operation",
+                   [({"operation": op}, s[counter]) for op, s in operations.items()])
+        cache = snapshot["value_cache"]
+        if cache is not None:
+            metric("cursor_mcp_value_cache_bytes", "gauge", "Bytes held by the decoded value cache", [({}, cache["bytes"])])
+            metric("cursor_mcp_value_cache_entries", "gauge", "Entries in the decoded value cache", [({}, cache["entries"])])
+            metric("cursor_mcp_value_cache_hit_ratio", "gauge", "Hit rate of the decoded value cache", [({}, cache["hit_rate"])])
+        if snapshot["process_rss_bytes"] is not None:
+            metric("process_resident_memory_bytes", "gauge", "Resident memory size in bytes",
+                   [({}, snapshot["process_rss_bytes"])])
+        metric("process_uptime_seconds", "gauge", "Seconds since the metrics were started", [({}, snapshot["uptime_seconds"])])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_file(self, path, value_cache=None):
+        """Atomically write the Prometheus text dump to a file (e.g. for node_exporter's textfile collector)"""
+        path = Path(path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w') as f:
+                f.write(self.prometheus_text(value_cache))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics file {path}: {e}")
+
+# Process-wide metrics, exposed as the cursor://metrics resource
+metrics = Metrics()
+
+# Profile of the MCP request being handled, if it was picked for profiling
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+class CallProfile:
+    """cProfile data and timings of one profiled MCP request"""
+
+    # Up to CPython 3.11 cProfile hooks only the thread that enabled it, so work of
+    # concurrent requests on other workers stays out of a profile and several can be
+    # enabled at once. From 3.12 it is built on sys.monitoring, which is process-wide:
+    # only one profile can be enabled at a time, and it also sees other threads' work.
+    PROCESS_WIDE = sys.version_info >= (3, 12)
+    _exclusive = threading.Lock()
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.profile = cProfile.Profile()
+        self.worker_seconds = 0.0
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Run blocking work of the request under the profiler; called on a worker thread
+        
+        If the profiler can't be enabled, because another profile (or another tool such
+        as a debugger or coverage) is using it, the work runs without being profiled.
+        """
+        exclusive = self.PROCESS_WIDE
+        if exclusive and not self._exclusive.acquire(blocking=False):
+            return fn(*args, **kwargs)
+        try:
+            try:
+                self.profile.enable()
+            except ValueError as e:
+                logger.debug(f"Not profiling {self.operation}: {e}")
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.profile.disable()
+                self.worker_seconds += time.perf_counter() - start
+        finally:
+            if exclusive:
+                self._exclusive.release()
+
+class CallProfiler:
+    """
+    Opt-in cProfile and tracemalloc profiling of MCP requests.
+
+    A sampled share of the requests to the selected handlers run their worker-thread
+    work under cProfile while tracemalloc traces allocations. Requests slower than
+    the threshold have their profile written to a .prof file (readable with pstats or
+    snakeviz), and a summary is kept for the cursor://profiles resource: how the time
+    split between SQLite, JSON decoding, other Python code, serializing the response
+    and waiting, plus the lines that allocated the memory the response holds.
+
+    Only one request is profiled at a time; requests arriving meanwhile run as usual.
+    tracemalloc sees every thread, so allocations of concurrent requests are included.
+    """
+
+    TOP_FUNCTIONS = 15
+    TOP_ALLOCATORS = 10
+
+    def __init__(self, directory=None, enabled=False, sample_rate=1.0, threshold=0.1, operations=None,
+                 memory=True, keep=100):
+        """
+        Args:
+            directory (Path): Directory for the .prof files (default: "profiles" in the cache directory)
+            enabled (bool): Whether requests are profiled
+            sample_rate (float): Share of the selected requests to profile, 0 to 1
+            threshold (float): Seconds a profiled request must take to be recorded
+            operations (iterable): Operation names to profile, e.g. "tool:query_table", or None for all
+            memory (bool): Whether to trace allocations with tracemalloc
+            keep (int): Number of recorded requests (and their files) to keep
+        """
+        self.directory = Path(directory) if directory else get_default_cache_dir() / "profiles"
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.threshold = 0.1
+        self.operations = None
+        self.memory = True
+        self.keep = keep
+        self.profiled_calls = 0
+        self._records = []
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+        self._random = random.Random()
+        self.configure(enabled, sample_rate, threshold, operations, memory)
+
+    def configure(self, enabled=None, sample_rate=None, threshold=None, operations=None, memory=None):
+        """
+        Change the profiling settings; arguments left as None keep their value
+
+        Args:
+            operations (iterable): Operation names to profile; an empty list selects all of them
+
+        Returns:
+            dict: The settings now in effect
+        """
+        if sample_rate is not None and not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if threshold is not None and threshold < 0:
+            raise ValueError("threshold must be >= 0")
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if threshold is not None:
+            self.threshold = threshold
+        if operations is not None:
+            # Tools can be named without their "tool:" prefix
+            self.operations = {name if ':' in name else f'tool:{name}' for name in operations} or None
+        if memory is not None:
+            self.memory = memory
+        return self.settings()
+
+    def settings(self):
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "threshold_ms": self.threshold * 1000,
+            "operations": sorted(self.operations) if self.operations else None,
+            "memory": self.memory,
+            "directory": str(self.directory),
+        }
+
+    def selected(self, operation):
+        """Return whether a request to the given handler should be profiled"""
+        return (self.enabled and (self.operations is None or operation in self.operations)
+                and self._random.random() < self.sample_rate)
+
+    async def run(self, operation, fn, *args, **kwargs):
+        """Await the handler coroutine fn(*args, **kwargs), profiling it if it is picked"""
+        if not self.selected(operation) or current_profile.get() is not None or not self._active.acquire(blocking=False):
+            return await fn(*args, **kwargs)
+        call = CallProfile(operation)
+        reset = current_profile.set(call)
+        trace_memory = self.memory and not tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.start()
+        result = None
+        error = None
+        start = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+            return result
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            current_profile.reset(reset)
+            try:
+                # Snapshotting memory, timing serialization and summarizing the profile are
+                # slow, so they run on a worker thread rather than the event loop
+                await run_blocking(self.finish, call, seconds, result, error, trace_memory)
+            finally:
+                if trace_memory and tracemalloc.is_tracing():
+                    tracemalloc.stop()  # finish() didn't get to run
+                self._active.release()
+
+    def finish(self, call, seconds, result, error, trace_memory):
+        """Stop tracing allocations and record the request if it was slow; called on a worker thread"""
+        peak_bytes = None
+        allocations = None
+        if trace_memory:
+            if error is None:
+                # While the result is alive, the traced memory still held is what it is made of
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+                allocations = tracemalloc.take_snapshot().filter_traces(
+                    [tracemalloc.Filter(False, tracemalloc.__file__)])
+            tracemalloc.stop()
+        with self._lock:
+            self.profiled_calls += 1
+        if seconds < self.threshold:
+            return
+        serialize_seconds = self.serialize_seconds(result) if error is None else 0.0
+        try:
+            self.record(call, seconds, serialize_seconds, peak_bytes, allocations, error)
+        except OSError as e:
+            logger.warning(f"Could not write profile of {call.operation}: {e}")
+
+    @staticmethod
+    def serialize_seconds(result):
+        """Time serializing a handler's result the way FastMCP does before sending it"""
+        import pydantic_core  # FastMCP's own dependency
+        start = time.perf_counter()
+        pydantic_core.to_json(result, fallback=str, indent=2)
+        return time.perf_counter() - start
+
+    @staticmethod
+    def time_category(filename, function):
+        """Classify a profiled function as SQLite, JSON decoding or other Python work"""
+        if "sqlite3" in function:
+            return "sqlite"
+        if f"{os.sep}json{os.sep}" in filename or "json" in function.split(" of ")[-1]:
+            return "json"
+        return "other_python"
+
+    def record(self, call, seconds, serialize_seconds, peak_bytes, allocations, error):
+        """Write the profile of a slow request to a file and keep its summary"""
+        stats = pstats.Stats(call.profile)
+        split = {"sqlite": 0.0, "json": 0.0, "other_python": 0.0}
+        functions = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            split[self.time_category(filename, function)] += own
+            location = function if filename == "~" else f"{filename}:{line}({function})"
+            functions.append({"function": location, "calls": calls, "own_ms": own * 1000,
+                              "cumulative_ms": cumulative * 1000})
+        functions.sort(key=lambda f: f["cumulative_ms"], reverse=True)
+        # The profiler's own overhead makes the split add up to slightly more than the measured time
+        profiled = sum(split.values()) or 1.0
+        breakdown = {name: value / profiled * call.worker_seconds * 1000 for name, value in split.items()}
+        breakdown["serialize"] = serialize_seconds * 1000
+        breakdown["waiting"] = max(seconds - call.worker_seconds - serialize_seconds, 0.0) * 1000
+
+        allocators = []
+        if allocations is not None:
+            for stat in allocations.statistics("lineno")[:self.TOP_ALLOCATORS]:
+                frame = stat.traceback[0]
+                allocators.append({"location": f"{frame.filename}:{frame.lineno}", "bytes": stat.size,
+                                   "count": stat.count})
+
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        started = datetime.now(timezone.utc)
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", call.operation)
+        path = self.directory / f"{started:%Y%m%dT%H%M%S}-{sequence:06d}-{name}.prof"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stats.dump_stats(path)
+
+        record = {
+            "operation": call.operation,
+            "time": started.isoformat(),
+            "duration_ms": seconds * 1000,
+            "breakdown_ms": breakdown,
+            "peak_traced_bytes": peak_bytes,
+            "top_functions": functions[:self.TOP_FUNCTIONS],
+            "allocators": allocators,
+            "profile_path": str(path),
+            "error": error,
+        }
+        with self._lock:
+            self._records.append(record)
+            evicted = self._records[:-self.keep] if len(self._records) > self.keep else []
+            del self._records[:len(evicted)]
+        for old in evicted:
+            Path(old["profile_path"]).unlink(missing_ok=True)
+        logger.info(f"Profiled {call.operation}: {seconds * 1000:.1f} ms, written to {path}")
+
+    def summary(self, limit=20):
+        """
+        Return the slowest recorded requests and the lines that allocated the most across them
+
+        Args:
+            limit (int): Number of requests and allocators to list
+        """
+        with self._lock:
+            records = list(self._records)
+            profiled_calls = self.profiled_calls
+        allocators = {}
+        for record in records:
+            for allocator in record["allocators"]:
+                total = allocators.setdefault(allocator["location"], {"location": allocator["location"], "bytes": 0,
+                                                                      "count": 0, "calls": 0})
+                total["bytes"] += allocator["bytes"]
+                total["count"] += allocator["count"]
+                total["calls"] += 1
+        return {
+            "settings": self.settings(),
+            "profiled_calls": profiled_calls,
+            "recorded_calls": len(records),
+            "slowest": heapq.nlargest(limit, records, key=lambda r: r["duration_ms"]),
+            "largest_allocators": heapq.nlargest(limit, allocators.values(), key=lambda a: a["bytes"]),
+        }
+
+# Opt-in request profiling, configured by --profile and the set_profiling tool
+profiler = CallProfiler()
+
+def instrumented(name):
+    """Decorator that records every call of a function or coroutine function as operation `name`"""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with metrics.operation(name):
+                    return await profiler.run(name, fn, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metrics.operation(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def value_size(value):
+    """Return the size in bytes (characters, for text) of a value read from SQLite"""
+    return len(value) if isinstance(value, (str, bytes)) else 0
+
+# Full text of strings cut short by compact responses, by handle, for fetch_truncated
+truncated_strings = DecodedValueCache(32 * 1024 * 1024)
+
+def json_size(value):
+    """Return the size in bytes of a value serialized as minified JSON"""
+    return len(json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8"))
+
+class CompactEncoder:
+    """
+    Shrinks a JSON value before it is sent to a client.
+
+    - Empty object members (null, "", [] and {}) are dropped.
+    - Objects, arrays and strings of at least MIN_REF_BYTES that occur more than once
+      are emitted once under "refs" and replaced by {"$ref": id} wherever they occur.
+    - With max_string_length, longer strings are cut and end with a marker naming a
+      handle; the full text is kept in truncated_strings for fetch_truncated.
+    - Keys of the value that could be mistaken for a reference are escaped with one
+      more "$": "$ref" becomes "$$ref", "$$ref" becomes "$$$ref", and so on.
+
+    Repeats are found by comparing serialized subtrees, which are built bottom-up
+    from their children's so the whole value is serialized only once.
+    """
+
+    MIN_REF_BYTES = 64
+    ESCAPED_KEY = re.compile(r"\$+ref")
+
+    def __init__(self, max_string_length=None):
+        """
+        Args:
+            max_string_length (int, optional): Cut strings longer than this many characters
+        """
+        self.max_string_length = max_string_length
+        self.truncated = {}
+        self._texts = {}
+        self._counts = Counter()
+        self._ref_ids = {}
+        self._refs = {}
+        self._uses = Counter()
+
+    def encode(self, value):
+        """
+        Return the compact form of value
+        
+        Returns:
+            dict: {"data": compacted value, "refs": {id: shared value}, "truncated": {handle: full length},
+                "size": {"original_bytes", "compact_bytes", "reduction"}}
+        """
+        original_bytes = json_size(value)
+        stripped = self._measure(value)
+        data = self._emit(stripped)
+        refs = {}
+        for ref, definition in self._refs.items():
+            if self._uses[ref] > 1:
+                refs[ref] = self._inline(definition)
+        data = self._inline(data)
+        result = {"data": data, "refs": refs, "truncated": self.truncated}
+        compact_bytes = json_size(result)
+        result["size"] = {
+            "original_bytes": original_bytes,
+            "compact_bytes": compact_bytes,
+            "reduction": round(1 - compact_bytes / original_bytes, 4) if original_bytes else 0.0,
+        }
+        return result
+
+    def _measure(self, value):
+        """Strip empty members and cut long strings, recording each subtree's serialized text"""
+        if isinstance(value, dict):
+            stripped = {}
+            for key, item in value.items():
+                if item is None or (isinstance(item, (str, list, dict)) and not item):
+                    continue
+                if isinstance(key, str) and self.ESCAPED_KEY.fullmatch(key):
+                    key = "$" + key
+                stripped[key] = self._measure(item)
+            text = "{" + ",".join(
+                f"{json.dumps(str(key), ensure_ascii=False)}:{self._text(item)}" for key, item in stripped.items()
+            ) + "}"
+        elif isinstance(value, list):
+            stripped = [self._measure(item) for item in value]
+            text = "[" + ",".join(self._text(item) for item in stripped) + "]"
+        elif isinstance(value, str):
+            stripped = self._truncate(value)
+            text = json.dumps(stripped, ensure_ascii=False)
+        else:
+            return value
+        if len(text) >= self.MIN_REF_BYTES:
+            self._counts[text] += 1
+        if not isinstance(stripped, str):
+            self._texts[id(stripped)] = (stripped, text)
+        return stripped
+
+    def _text(self, value):
+        if isinstance(value, (dict, list)):
+            return self._texts[id(value)][1]
+        return json.dumps(value, ensure_ascii=False, default=str)
+
+    def _truncate(self, value):
+        if self.max_string_length is None or len(value) <= self.max_string_length:
+            return value
+        handle = hashlib.blake2b(value.encode("utf-8"), digest_size=8).hexdigest()
+        truncated_strings.put(handle, None, value, len(value))
+        self.truncated[handle] = len(value)
+        return f"{value[:self.max_string_length]}... [{len(value) - self.max_string_length} more characters, handle {handle}]"
+
+    def _emit(self, value):
+        """Build the output top-down, replacing repeated subtrees with references"""
+        if not isinstance(value, (dict, list, str)):
+            return value
+        text = self._text(value)
+        if self._counts[text] > 1:
+            ref = self._ref_ids.get(text)
+            if ref is None:
+                ref = self._ref_ids[text] = f"#{len(self._ref_ids)}"
+                self._refs[ref] = self._emit_children(value)
+            self._uses[ref] += 1
+            return {"$ref": ref}
+        return self._emit_children(value)
+
+    def _emit_children(self, value):
+        if isinstance(value, dict):
+            return {key: self._emit(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._emit(item) for item in value]
+        return value
+
+    def _inline(self, value):
+        """
+        Put back references that ended up used only once
+        
+        A subtree can repeat only because the larger subtree containing it repeats;
+        that larger subtree is emitted once, so the inner reference is used once.
+        """
+        if isinstance(value, dict):
+            ref = value.get("$ref") if len(value) == 1 else None
+            if ref is not None and self._uses[ref] == 1:
+                return self._inline(self._refs[ref])
+            return {key: self._inline(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._inline(item) for item in value]
+        return value
+
+def compact_response(value, max_string_length=None):
+    """Return the compact encoding of a response (see CompactEncoder)"""
+    return CompactEncoder(max_string_length).encode(value)
+
+class CursorDBManager:
+    def __init__(self, cursor_path=None, project_dirs=None, cache_max_bytes=64 * 1024 * 1024, cache_dir=None,
+                 discover=True, busy_timeout=5.0):
+        """
+        Initialize the CursorDBManager with a Cursor main directory and/or list of project directories.
+        
+        Args:
+            cursor_path (str): Path to main Cursor directory (e.g. ~/Library/Application Support/Cursor/User/)
+            project_dirs (list): List of paths to Cursor project directories containing state.vscdb files
+            cache_max_bytes (int): Memory budget for the decoded value cache
+            cache_dir (str): Directory for the discovery manifest (defaults to the user cache directory)
+            discover (bool): Scan for projects right away; pass False to call refresh_db_paths() later
+            busy_timeout (float): Seconds a read waits on a database locked by Cursor before it is retried
+        """
+        if cursor_path:
+            self.cursor_path = Path(cursor_path).expanduser().resolve()
+        else:
+            # Try to get the default cursor path
+            self.cursor_path = self.get_default_cursor_path()
+            
+        self.project_dirs = project_dirs or []
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else get_default_cache_dir()
+        self.busy_timeout = busy_timeout
+        self.db_paths = {}
+        self.projects_info = {}
+        self._workspace_ids = {}
+        self.global_db_path = None
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+        self._executor = None
+        self._search_index = None
+        self._stats_index = None
+        self.value_cache = DecodedValueCache(cache_max_bytes)
+        self.key_index = KeyIndex()
+        if discover:
+            self.refresh_db_paths()
+    
+    def get_default_cursor_path(self):
+        """Return the default Cursor path based on the operating system"""
+        system = platform.system()
+        home = Path.home()
+        
+        default_path = None
+        if system == "Darwin":  # macOS
+            default_path = home / "Library/Application Support/Cursor/User"
+        elif system == "Windows":
+            default_path = home / "AppData/Roaming/Cursor/User"
+        elif system == "Linux":
+            default_path = home / ".config/Cursor/User"
+        else:
+            logger.warning(f"Unknown operating system: {system}. Cannot determine default Cursor path.")
+            return None
+        
+        logger.info(f"Detected default Cursor path for {system}: {default_path}")
+        return default_path
+    
+    def detect_cursor_projects(self):
+        """
+        Detect Cursor projects by scanning the workspaceStorage directory
+        
+        Workspaces whose directory mtime matches the persisted discovery manifest are
+        taken from the manifest; only new or changed workspaces have their
+        workspace.json re-read, in parallel.
+        """
+        if not self.cursor_path:
+            logger.error("No Cursor path available")
+            return []
+            
+        # Check if the path exists
+        if not self.cursor_path.exists():
+            logger.error(f"Cursor path does not exist: {self.cursor_path}")
+            return []
+                
+        workspace_storage = self.cursor_path / "workspaceStorage"
+        if not workspace_storage.exists():
+            logger.warning(f"Workspace storage directory not found: {workspace_storage}")
+            return []
+            
+        logger.info(f"Found workspace storage directory: {workspace_storage}")
+        
+        manifest_path = self._manifest_path(workspace_storage)
+        previous = self._load_manifest(manifest_path)
+        manifest = {}
+        changed = []
+        
+        # Stat all subdirectories in workspaceStorage and reuse unchanged manifest entries
+        with os.scandir(workspace_storage) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_dir():
+                        continue
+                    mtime_ns = entry.stat().st_mtime_ns
+                except OSError:
+                    continue
+                cached = previous.get(entry.name)
+                if cached is not None and cached.get("mtime_ns") == mtime_ns:
+                    manifest[entry.name] = cached
+                else:
+                    changed.append((entry.name, mtime_ns))
+        
+        # Re-read only the new or changed workspaces
+        if changed:
+            scanned = self._get_executor().map(
+                lambda item: self._scan_workspace(workspace_storage / item[0]), changed
+            )
+            for (workspace_id, mtime_ns), project in zip(changed, scanned):
+                manifest[workspace_id] = {"mtime_ns": mtime_ns, "project": project}
+        
+        if manifest != previous:
+            self._save_manifest(manifest_path, manifest)
+        logger.info(f"Scanned {len(manifest)} workspaces ({len(changed)} new or changed)")
+        
+        return [entry["project"] for _, entry in sorted(manifest.items()) if entry["project"]]
+    
+    def _scan_workspace(self, workspace_dir):
+        """Read a single workspaceStorage directory, returning its project info or None"""
+        workspace_json = workspace_dir / "workspace.json"
+        state_db = workspace_dir / "state.vscdb"
+        
+        if not (workspace_json.exists() and state_db.exists()):
+            return None
+        try:
+            with open(workspace_json, 'r') as f:
+                workspace_data = json.load(f)
+                
+            folder_uri = workspace_data.get("folder")
+            if folder_uri:
+                # Extract the project name from the URI
+                # For "file:///Users/johndamask/code/cursor-chat-browser", get "cursor-chat-browser"
+                project_name = folder_uri.rstrip('/').split('/')[-1]
+                logger.info(f"Found project: {project_name} at {state_db}")
+                return {
+                    "name": project_name,
+                    "workspace_id": workspace_dir.name,
+                    "db_path": str(state_db),
+                    "workspace_dir": str(workspace_dir),
+                    "folder_uri": folder_uri
+                }
+        except Exception as e:
+            logger.error(f"Error processing workspace: {workspace_dir}: {e}")
+        return None
+    
+    def _manifest_path(self, workspace_storage):
+        """Return the discovery manifest file for a workspaceStorage directory"""
+        digest = hashlib.sha1(str(workspace_storage).encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / f"discovery-{digest}.json"
+    
+    def _load_manifest(self, manifest_path):
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest["workspaces"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable discovery manifest {manifest_path}: {e}")
+        return {}
+    
+    def _save_manifest(self, manifest_path, workspaces):
+        try:
+            manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = manifest_path.with_name(f"{manifest_path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": MANIFEST_VERSION, "workspaces": workspaces}, f)
+            os.replace(tmp_path, manifest_path)
+        except OSError as e:
+            logger.warning(f"Could not save discovery manifest {manifest_path}: {e}")
+    
+    def _get_executor(self):
+        """Return the manager's shared thread pool, creating it on first use"""
+        with self._pools_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=min(32, (os.cpu_count() or 1) + 4),
+                    thread_name_prefix="cursor-db"
+                )
+            return self._executor
+        
+    def refresh_db_paths(self):
+        """Scan project directories and identify all state.vscdb files"""
+        projects = []
+        global_db_path = None
+        
+        # First, detect projects from the Cursor directory
+        if self.cursor_path:
+            projects.extend(self.detect_cursor_projects())
+            
+            # Set the global storage database path
+            global_storage_path = self.cursor_path / "globalStorage" / "state.vscdb"
+            if global_storage_path.exists():
+                global_db_path = str(global_storage_path)
+                logger.info(f"Found global storage database at {global_db_path}")
+            else:
+                logger.warning(f"Global storage database not found at {global_storage_path}")
+        
+        # Then add explicitly specified project directories
+        for project_dir in self.project_dirs:
+            project_path = Path(project_dir).expanduser().resolve()
+            db_path = project_path / "state.vscdb"
+            
+            if db_path.exists():
+                projects.append({
+                    "name": project_path.name,
+                    # Same scheme Cursor uses for workspaceStorage IDs: a hash of the folder
+                    "workspace_id": hashlib.md5(str(project_path).encode("utf-8")).hexdigest(),
+                    "db_path": str(db_path),
+                    "workspace_dir": None,
+                    "folder_uri": None
+                })
+                logger.info(f"Found database: {project_path.name} at {db_path}")
+            else:
+                logger.warning(f"No state.vscdb found in {project_path}")
+        
+        # Projects are keyed by folder name; when several workspaces share a name,
+        # each is keyed as "name@workspace_id" so none of them is overwritten
+        name_counts = Counter(project["name"] for project in projects)
+        db_paths = {}
+        projects_info = {}
+        workspace_ids = {}
+        for project in projects:
+            project_key = project["name"]
+            if name_counts[project_key] > 1:
+                project_key = f"{project['name']}@{project['workspace_id']}"
+            db_paths[project_key] = project["db_path"]
+            projects_info[project_key] = project
+            workspace_ids[project["workspace_id"]] = project_key
+        
+        # Swap in the new state in one step so concurrent readers never see a partial scan
+        self.db_paths, self.projects_info, self._workspace_ids = db_paths, projects_info, workspace_ids
+        self.global_db_path = global_db_path
+        
+        self._close_unused_pools()
+    
+    def resolve_project(self, project_name):
+        """
+        Resolve a project name or workspace ID to its key in db_paths
+        
+        Args:
+            project_name (str): Project key from list_projects() or a workspace ID
+            
+        Returns:
+            str: The project's key in db_paths
+        """
+        if project_name in self.db_paths:
+            return project_name
+        if project_name in self._workspace_ids:
+            return self._workspace_ids[project_name]
+        ambiguous = [key for key, info in self.projects_info.items() if info["name"] == project_name]
+        if ambiguous:
+            raise ValueError(f"Project name '{project_name}' is ambiguous, use one of: {', '.join(ambiguous)}")
+        raise ValueError(f"Project '{project_name}' not found")
+        
+    @contextmanager
+    def connect(self, db_path):
+        """
+        Borrow a pooled read-only connection to a database
+        
+        When called from a request's worker thread, the connection is registered
+        with the request's CancelToken so cancelling the request interrupts it.
+        
+        Args:
+            db_path (str): Path to a state.vscdb file
+            
+        Returns:
+            contextmanager: Yields a sqlite3.Connection that is returned to the pool on exit
+        """
+        db_path = str(db_path)
+        with self._pools_lock:
+            pool = self._pools.get(db_path)
+            if pool is None:
+                pool = self._pools[db_path] = SQLiteConnectionPool(db_path, timeout=self.busy_timeout)
+        token = current_cancel_token.get()
+        with pool.connection() as conn:
+            if token is None:
+                yield conn
+            else:
+                with token.watch(conn):
+                    yield conn
+    
+    @contextmanager
+    def snapshot(self, db_path):
+        """
+        Borrow a pooled connection that sees one consistent version of a database
+        
+        The with-block runs inside a single read transaction, so every statement sees
+        the database as it was when the snapshot was taken, even if Cursor commits in
+        between. In WAL mode this doesn't block Cursor at all; with a rollback journal
+        it holds a shared lock that delays Cursor's commits until the block ends, so
+        keep the block short and use snapshot_copy() for long reads.
+        
+        Args:
+            db_path (str): Path to a state.vscdb file
+            
+        Returns:
+            contextmanager: Yields a sqlite3.Connection inside a read transaction
+        """
+        @retry_on_busy
+        def begin(conn):
+            conn.execute("BEGIN")
+            try:
+                # A deferred transaction only takes its snapshot at the first read
+                conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        
+        with self.connect(db_path) as conn:
+            begin(conn)
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+    
+    @retry_on_busy
+    def snapshot_copy(self, db_path, target_path):
+        """
+        Copy a database to target_path with the SQLite backup API
+        
+        The copy is a consistent point-in-time image, taken in one step so a
+        concurrent write can't restart it; afterwards, reads from the copy hold no
+        locks on Cursor's database however long they take.
+        
+        Args:
+            db_path (str): Path to a state.vscdb file
+            target_path (str): File to write the copy to
+            
+        Returns:
+            str: target_path
+        """
+        target = sqlite3.connect(str(target_path))
+        try:
+            with self.connect(db_path) as conn:
+                conn.backup(target)
+        finally:
+            target.close()
+        logger.info(f"Copied a snapshot of {db_path} to {target_path}")
+        return str(target_path)
+    
+    def close(self):
+        """Close all pooled database connections and stop the worker threads"""
+        with self._pools_lock:
+            pools, self._pools = self._pools, {}
+            executor, self._executor = self._executor, None
+        for pool in pools.values():
+            pool.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
+        if self._search_index is not None:
+            self._search_index.close()
+            self._search_index = None
+        if self._stats_index is not None:
+            self._stats_index.close()
+            self._stats_index = None
+    
+    def _close_unused_pools(self):
+        """Close pools for databases that are no longer known to the manager"""
+        known = set(self.db_paths.values())
+        if self.global_db_path:
+            known.add(self.global_db_path)
+        with self._pools_lock:
+            unused = [path for path in self._pools if path not in known]
+            pools = [self._pools.pop(path) for path in unused]
+        for pool in pools:
+            pool.close()
+        for path in unused:
+            self.value_cache.invalidate(path)
+            self.key_index.invalidate(path)
+    
+    @retry_on_busy
+    def get_value(self, db_path, table_name, key):
+        """
+        Return the decoded value stored under a key, using the decoded value cache
+        
+        Args:
+            db_path (str): Path to a state.vscdb file
+            table_name (str): Either 'ItemTable' or 'cursorDiskKV'
+            key (str): Key to look up
+            
+        Returns:
+            The decoded value, or None if the key doesn't exist
+        """
+        if table_name not in ["ItemTable", "cursorDiskKV"]:
+            raise ValueError("Table name must be either 'ItemTable' or 'cursorDiskKV'")
+        
+        cache_key = (db_path, table_name, key)
+        # Take the signature before reading so a concurrent write can only make the entry stale
+        signature = database_signature(db_path)
+        found, value = self.value_cache.get(cache_key, signature)
+        if found:
+            metrics.count("cache_hits")
+            return value
+        metrics.count("cache_misses")
+        
+        with self.connect(db_path) as conn:
+            row = conn.execute(f"SELECT value FROM {table_name} WHERE key = ?", (key,)).fetchone()
+        
+        if row is None:
+            self.value_cache.put(cache_key, signature, None, 0)
+            return None
+        metrics.count("rows_scanned")
+        metrics.count("bytes_read", value_size(row[0]))
+        value = decode_value(row[0])
+        self.value_cache.put(cache_key, signature, value, len(row[0]))
+        return value
+    
+    @retry_on_busy
+    def get_typed_value(self, db_path, table_name, key, value_type):
+        """
+        Return the value stored under a key decoded into a typed view, using the decoded value cache
+        
+        Typed views are cached separately from the full decoded value, and hold only
+        the fields they declare, so they're much smaller.
+        
+        Args:
+            db_path (str): Path to a state.vscdb file
+            table_name (str): Either 'ItemTable' or 'cursorDiskKV'
+            key (str): Key to look up
+            value_type (type): A class with a from_json(raw) constructor, e.g. ComposerIndex
+            
+        Returns:
+            An instance of value_type, or None if the key doesn't exist or doesn't hold a JSON object
+        """
+        if table_name not in ["ItemTable", "cursorDiskKV"]:
+            raise ValueError("Table name must be either 'ItemTable' or 'cursorDiskKV'")
+        
+        cache_key = (db_path, table_name, key, value_type.__name__)
+        signature = database_signature(db_path)
+        found, value = self.value_cache.get(cache_key, signature)
+        if found:
+            metrics.count("cache_hits")
+            return value
+        metrics.count("cache_misses")
+        
+        with self.connect(db_path) as conn:
+            row = conn.execute(f"SELECT value FROM {table_name} WHERE key = ?", (key,)).fetchone()
+        
+        if row is None:
+            self.value_cache.put(cache_key, signature, None, 0)
+            return None
+        metrics.count("rows_scanned")
+        metrics.count("bytes_read", value_size(row[0]))
+        metrics.count("bytes_decoded", value_size(row[0]))
+        value = value_type.from_json(row[0])
+        self.value_cache.put(cache_key, signature, value, len(row[0]))
+        return value
+    
+    @retry_on_busy
+    def get_projected_value(self, db_path, table_name, key, projection):
+        """
+        Return selected JSON paths of the value stored under a key, extracted by SQLite
+        
+        Args:
+            db_path (str): Path to a state.vscdb file
+            table_name (str): Either 'ItemTable' or 'cursorDiskKV'
+            key (str): Key to look up
+            projection (JSONProjection): Paths to extract
+            
+        Returns:
+            dict: Field -> extracted value, or None if the key doesn't exist
+        """
+        if table_name not in ["ItemTable", "cursorDiskKV"]:
+            raise ValueError("Table name must be either 'ItemTable' or 'cursorDiskKV'")
+        
+        with self.connect(db_path) as conn:
+            row = conn.execute(
+                f"SELECT {projection.select_sql} FROM {table_name} AS t WHERE key = ?",
+                projection.params + [key]
+            ).fetchone()
+        if row is None:
+            return None
+        metrics.count("rows_scanned")
+        metrics.count("bytes_read", sum(value_size(column) for column in row))
+        return projection.decode(row)
+    
+    def composer_workspace_map(self):
+        """
+        Map each composer ID to the workspace ID of the project that lists it
+        
+        Returns:
+            dict: Composer ID -> workspace ID
+        """
+        mapping = {}
+        for info in list(self.projects_info.values()):
+            try:
+                index = self.get_typed_value(info["db_path"], "ItemTable", COMPOSER_DATA_KEY, ComposerIndex)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not read composers for {info['name']}: {e}")
+                continue
+            if index is None:
+                continue
+            for composer_id in index.composer_ids:
+                mapping[composer_id] = info["workspace_id"]
+        return mapping
+    
+    @instrumented("search_all_databases")
+    def search_all_databases(self, term, mode="keys", table_name="cursorDiskKV", limit=20, match="substring"):
+        """
+        Search every project database and the global storage database in parallel
+        
+        Each database returns its own best `limit` matches, and the per-database
+        results are merged with a bounded heap into one top-k list. A database that
+        fails is reported under "errors" instead of failing the whole search.
+        
+        Args:
+            term (str): Text to look for
+            mode (str): 'keys' to match keys, 'content' to match inside values
+            table_name (str): Either 'ItemTable' or 'cursorDiskKV'
+            limit (int): Number of results to return overall
+            match (str): How keys are matched: 'substring', 'prefix', 'glob' or 'regex'
+            
+        Returns:
+            dict: {"results": [...], "timings_ms": {db: ms}, "errors": {db: message}}
+        """
+        if mode not in ("keys", "content"):
+            raise ValueError("Mode must be either 'keys' or 'content'")
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        if match not in KEY_MATCH_MODES:
+            raise ValueError(f"Match mode must be one of: {', '.join(KEY_MATCH_MODES)}")
+        if mode == "content" and match != "substring":
+            raise ValueError("Only 'substring' matching is supported when searching content")
+        if match in ("glob", "regex"):
+            # Reject a bad pattern once instead of once per database
+            compile_key_matcher(term, match)
+        if table_name not in ["ItemTable", "cursorDiskKV"]:
+            raise ValueError("Table name must be either 'ItemTable' or 'cursorDiskKV'")
+        if not term:
+            raise ValueError("A search term is required")
+        
+        targets = list(self.db_paths.items())
+        if self.global_db_path:
+            targets.append((GLOBAL_DB_NAME, self.global_db_path))
+        
+        def search_one(target):
+            name, db_path = target
+            start = time.perf_counter()
+            try:
+                return name, self._search_database(db_path, term, mode, table_name, limit, match), None, start
+            except sqlite3.Error as e:
+                return name, [], str(e), start
+        
+        heap = []
+        timings = {}
+        errors = {}
+        # Each search runs in a copy of this context so the request's cancel token comes along
+        futures = [
+            self._get_executor().submit(contextvars.copy_context().run, search_one, target)
+            for target in targets
+        ]
+        for future in futures:
+            name, matches, error, start = future.result()
+            timings[name] = round((time.perf_counter() - start) * 1000, 2)
+            if error:
+                errors[name] = error
+            for score, row_key, value in matches:
+                # Ties are broken by key so the merged order is deterministic
+                entry = (score, _ReverseKey(row_key), name, value)
+                if len(heap) < limit:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+        
+        charge_request(len(heap), sum(value_size(value) for _, _, _, value in heap))
+        results = [
+            {"project": name, "key": row_key.key, "score": score, "value": decode_value(value)}
+            for score, row_key, name, value in sorted(heap, reverse=True)
+        ]
+        return {"results": results, "timings_ms": timings, "errors": errors}
+    
+    @retry_on_busy
+    def _search_database(self, db_path, term, mode, table_name, limit, match="substring"):
+        """
+        Return up to `limit` (score, key, raw value) matches from one database, best first
+        
+        Key matches score 3 for an exact key, 2 for a prefix and 1 for a substring;
+        glob and regex matches all score 1. Content matches score the number of
+        occurrences of the term in the value.
+        """
+        params = {"term": term, "limit": limit}
+        if match in ("glob", "regex"):
+            keys = self.key_index.match(self, db_path, table_name, term, match, limit=limit)
+            sql = f"""
+                SELECT 1 AS score, key, value FROM {table_name}
+                WHERE key IN ({', '.join('?' * len(keys))}) ORDER BY key
+            """
+            params = keys
+        elif mode == "keys" and match == "prefix":
+            params["lower"], params["upper"] = key_prefix_range(term)
+            sql = f"""
+                SELECT CASE WHEN key = :term THEN 3 ELSE 2 END AS score, key, value
+                FROM {table_name} WHERE key >= :lower AND key < :upper
+                ORDER BY score DESC, key LIMIT :limit
+            """
+        elif mode == "keys":
+            sql = f"""
+                SELECT CASE WHEN key = :term THEN 3
+                            WHEN substr(key, 1, length(:term)) = :term THEN 2
+                            ELSE 1 END AS score, key, value
+                FROM {table_name} WHERE instr(key, :term) > 0
+                ORDER BY score DESC, key LIMIT :limit
+            """
+        else:
+            sql = f"""
+                SELECT (length(value) - length(replace(value, :term, ''))) / length(:term) AS score, key, value
+                FROM {table_name} WHERE instr(value, :term) > 0
+                ORDER BY score DESC, key LIMIT :limit
+            """
+        with self.connect(db_path) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        metrics.count("rows_scanned", len(rows))
+        metrics.count("bytes_read", sum(value_size(value) for _, _, value in rows))
+        return rows
+    
+    def get_search_index(self):
+        """Return the full-text search index, opening it on first use"""
+        with self._pools_lock:
+            if self._search_index is None:
+                self._search_index = ConversationSearchIndex(self.cache_dir / "search-index.db")
+            return self._search_index
+    
+    def get_stats_index(self):
+        """Return the sidecar statistics database, opening it on first use"""
+        with self._pools_lock:
+            if self._stats_index is None:
+                self._stats_index = StatsIndex(self.cache_dir / "stats.db")
+            return self._stats_index
+    
+    @instrumented("get_stats")
+    def get_stats(self, project_name=None, limit=100):
+        """
+        Return conversation statistics, updating the stats database with any changes first
+        
+        Args:
+            project_name (str, optional): Return one project's aggregates plus per-composer and
+                per-chat-tab statistics instead of the overview of all projects
+            limit (int): Maximum number of composers and of chat tabs to list for a project
+            
+        Returns:
+            dict: Totals and per-project aggregates, or one project's statistics
+        """
+        project_key = self.resolve_project(project_name) if project_name else None
+        index = self.get_stats_index()
+        index.update(self)
+        if project_key:
+            info = self.projects_info[project_key]
+            return {"project": project_key, "workspace_id": info["workspace_id"],
+                    **index.project(info["workspace_id"], limit)}
+        summary = index.summary()
+        projects_by_workspace = dict(self._workspace_ids)
+        summary["projects"] = {
+            projects_by_workspace[workspace_id]: stats
+            for workspace_id, stats in summary["projects"].items()
+            if workspace_id in projects_by_workspace
+        }
+        return summary
+    
+    @instrumented("get_recent_conversations")
+    def get_recent_conversations(self, limit=20, since=None, until=None, kind=None, project_name=None):
+        """
+        Return the most recently updated composers and chat tabs across all projects
+        
+        Reads the timeline from the stats database (see StatsIndex.timeline), which is
+        brought up to date first, so no conversation is decoded unless it changed.
+        
+        Args:
+            limit (int): Maximum number of conversations to return
+            since (int or str, optional): Only conversations updated at or after this time
+                (epoch milliseconds or ISO 8601)
+            until (int or str, optional): Only conversations updated before this time
+            kind (str, optional): 'composer' or 'chat_tab' to return only one kind
+            project_name (str, optional): Only conversations of this project
+            
+        Returns:
+            list: Conversations, newest first, each with its kind, ID, owning project, title,
+                timestamps and message count
+        """
+        if kind not in (None, "composer", "chat_tab"):
+            raise ValueError("Kind must be either 'composer' or 'chat_tab'")
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        workspace_id = None
+        if project_name:
+            workspace_id = self.projects_info[self.resolve_project(project_name)]["workspace_id"]
+        index = self.get_stats_index()
+        index.update(self)
+        results = index.timeline(limit, parse_timestamp(since), parse_timestamp(until), kind, workspace_id)
+        projects_by_workspace = dict(self._workspace_ids)
+        for result in results:
+            result["project"] = projects_by_workspace.get(result["workspace_id"])
+        return results
+    
+    @instrumented("export_conversations")
+    def export_conversations(self, output_path, format="jsonl", compression=None, resume=True, workers=4,
+                             snapshot=False, overwrite=False):
+        """
+        Stream every project's chat tabs and every global composer and bubble to a file
+        
+        Args:
+            output_path (str): JSONL file, or directory of part files for Parquet
+            format (str): 'jsonl' or 'parquet'
+            compression (str, optional): 'zstd' to compress JSONL output
+            resume (bool): Continue an interrupted export from its checkpoint instead of starting over
+            workers (int): Number of databases read in parallel
+            snapshot (bool): Export from consistent point-in-time copies of the databases
+            overwrite (bool): Replace an existing output that isn't an interrupted export
+            
+        Returns:
+            dict: Summary of the export (see ConversationExporter.run)
+        """
+        return ConversationExporter(self, output_path, format, compression, workers, snapshot=snapshot,
+                                    overwrite=overwrite).run(resume)
+    
+    @instrumented("search_conversations")
+    def search_conversations(self, query, project_name=None, limit=20):
+        """
+        Full-text search over all chat tabs and composer conversations
+        
+        Args:
+            query (str): FTS5 query, or plain words
+            project_name (str, optional): Restrict results to one project
+            limit (int): Maximum number of results to return
+            
+        Returns:
+            list: Ranked matches with snippets
+        """
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        workspace_id = None
+        if project_name:
+            workspace_id = self.projects_info[self.resolve_project(project_name)]["workspace_id"]
+        index = self.get_search_index()
+        index.update(self)
+        results = index.search(query, workspace_id=workspace_id, limit=limit)
+        projects_by_workspace = dict(self._workspace_ids)
+        for result in results:
+            result["project"] = projects_by_workspace.get(result["workspace_id"])
+        return results
+        
+    def add_project_dir(self, project_dir):
+        """Add a new project directory to the manager"""
+        project_path = Path(project_dir).expanduser().resolve()
+        if project_path not in [Path(d).expanduser().resolve() for d in self.project_dirs]:
+            self.project_dirs.append(project_path)
+            self.refresh_db_paths()
+        return len(self.db_paths)
+    
+    def list_projects(self, detailed=False):
+        """
+        Return list of available projects
+        
+        Args:
+            detailed (bool): Whether to return detailed project information
+            
+        Returns:
+            dict: Project information (either just DB paths or full details)
+        """
+        if detailed:
+            return self.projects_info
+        return self.db_paths
+    
+    @instrumented("execute_query")
+    @retry_on_busy
+    def execute_query(self, project_name, table_name, query_type, key=None, limit=100, fields=None,
+                      match="substring"):
+        """
+        Execute a query against a specific project's database
+        
+        Args:
+            project_name (str): Name of the project (key in db_paths)
+            table_name (str): Either 'ItemTable' or 'cursorDiskKV'
+            query_type (str): Type of query ('get_all', 'get_by_key', 'search_keys')
+            key (str, optional): Key to search for when using 'get_by_key' or 'search_keys'
+            limit (int): Maximum number of results to return
+            fields (list, optional): JSON paths to return instead of the whole value (see JSONProjection)
+            match (str): How 'search_keys' matches key (see _run_query)
+            
+        Returns:
+            list: Query results
+        """
+        db_path = self._query_db_path(project_name, table_name)
+        projection = JSONProjection(fields) if fields else None
+        keys = self._indexed_key_matches(db_path, table_name, query_type, key, match, limit)
+        
+        try:
+            with self.connect(db_path) as conn:
+                return [
+                    self._decode_row(row, projection)
+                    for row in self._run_query(conn, table_name, query_type, key, limit, projection=projection,
+                                               match=match, keys=keys)
+                ]
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error: {e}")
+            raise
+    
+    @instrumented("execute_query_page")
+    @retry_on_busy
+    def execute_query_page(self, project_name, table_name, query_type, key=None, limit=100, page_token=None,
+                           fields=None, match="substring"):
+        """
+        Execute a query and return one page of results, ordered by key
+        
+        Pages are fetched with keyset pagination (`key > last key of the previous page`),
+        so each page is an index range scan no matter how deep into the table it is.
+        
+        Args:
+            project_name (str): Name of the project (key in db_paths)
+            table_name (str): Either 'ItemTable' or 'cursorDiskKV'
+            query_type (str): Type of query ('get_all', 'get_by_key', 'search_keys')
+            key (str, optional): Key to search for when using 'get_by_key' or 'search_keys'
+            limit (int): Maximum number of results per page
+            page_token (str, optional): next_page_token from the previous page
+            fields (list, optional): JSON paths to return instead of the whole value (see JSONProjection)
+            match (str): How 'search_keys' matches key (see _run_query)
+            
+        Returns:
+            dict: {"results": [...], "next_page_token": token or None when there are no more rows}
+        """
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        db_path = self._query_db_path(project_name, table_name)
+        projection = JSONProjection(fields) if fields else None
+        query = {"table": table_name, "query_type": query_type, "key": key, "match": match}
+        after_key = decode_page_token(page_token, query) if page_token else None
+        keys = self._indexed_key_matches(db_path, table_name, query_type, key, match, limit + 1, after_key)
+        
+        try:
+            with self.connect(db_path) as conn:
+                results = []
+                next_page_token = None
+                rows = self._run_query(conn, table_name, query_type, key, limit + 1, after_key=after_key,
+                                       ordered=True, projection=projection, match=match, keys=keys)
+                for row in rows:
+                    if len(results) == limit:
+                        # The extra row only tells us that another page exists
+                        next_page_token = encode_page_token(query, results[-1]["key"])
+                        break
+                    results.append(self._decode_row(row, projection))
+                return {"results": results, "next_page_token": next_page_token}
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error: {e}")
+            raise
+    
+    def _query_db_path(self, project_name, table_name):
+        """Validate query arguments and return the project's database path"""
+        project_name = self.resolve_project(project_name)
+            
+        if table_name not in ["ItemTable", "cursorDiskKV"]:
+            raise ValueError("Table name must be either 'ItemTable' or 'cursorDiskKV'")
+        
+        return self.db_paths[project_name]
+    
+    def _indexed_key_matches(self, db_path, table_name, query_type, key, match, limit, after_key=None):
+        """
+        Return the keys a glob or regex 'search_keys' query selects, from the key index
+        
+        Returns None for the queries that SQLite answers on its own.
+        """
+        if match not in KEY_MATCH_MODES:
+            raise ValueError(f"Match mode must be one of: {', '.join(KEY_MATCH_MODES)}")
+        if query_type != "search_keys" or not key or match not in ("glob", "regex"):
+            return None
+        return self.key_index.match(self, db_path, table_name, key, match, after_key=after_key, limit=limit)
+    
+    def _run_query(self, conn, table_name, query_type, key, limit, after_key=None, ordered=False, projection=None,
+                   match="substring", keys=None):
+        """
+        Run a query_type against table_name on an open connection
+        
+        'search_keys' matches key according to match:
+        - 'substring': key appears anywhere (case-insensitive LIKE, a full table scan)
+        - 'prefix': keys starting with key (a range scan of the key index)
+        - 'glob' / 'regex': the given keys, which the caller looked up in the KeyIndex
+        
+        Returns a cursor that yields (key, value) rows - or (key, *projected fields)
+        rows when a projection is given - as they are read, so callers can stop
+        early without buffering the whole result.
+        """
+        conditions = []
+        params = list(projection.params) if projection else []
+        if query_type == "get_all":
+            pass
+        elif query_type == "get_by_key" and key:
+            conditions.append("key = ?")
+            params.append(key)
+        elif query_type == "search_keys" and key and match == "substring":
+            conditions.append("key LIKE ?")
+            params.append(f"%{key}%")
+        elif query_type == "search_keys" and key and match == "prefix":
+            conditions.append("key >= ? AND key < ?")
+            params.extend(key_prefix_range(key))
+        elif query_type == "search_keys" and key and keys is not None:
+            conditions.append(f"key IN ({', '.join('?' * len(keys))})")
+            params.extend(keys)
+        else:
+            raise ValueError("Invalid query type or missing key parameter")
+        
+        if after_key is not None:
+            conditions.append("key > ?")
+            params.append(after_key)
+        
+        sql = f"SELECT key, {projection.select_sql if projection else 'value'} FROM {table_name} AS t"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if ordered:
+            sql += " ORDER BY key"
+        if query_type != "get_by_key":
+            sql += " LIMIT ?"
+            params.append(limit)
+        
+        return conn.execute(sql, params)
+    
+    def _decode_row(self, row, projection):
+        size = sum(value_size(column) for column in row[1:])
+        metrics.count("rows_scanned")
+        metrics.count("bytes_read", size)
+        charge_request(1, size)
+        if projection:
+            return {"key": row[0], "value": projection.decode(row[1:])}
+        return {"key": row[0], "value": decode_value(row[1])}
+    
+    @instrumented("get_chat_data")
+    def get_chat_data(self, project_name):
+        """
+        Retrieve AI chat data from a project
+        
+        Args:
+            project_name (str): Name of the project
+            
+        Returns:
+            dict: Chat data from the project
+        """
+        project_name = self.resolve_project(project_name)
+        
+        try:
+            chat_data = self.get_value(
+                self.db_paths[project_name], 
+                "ItemTable", 
+                CHAT_DATA_KEY
+            )
+            
+            if chat_data is not None:
+                return chat_data
+            else:
+                return {"error": "No chat data found for this project"}
+                
+        except Exception as e:
+            logger.error(f"Error retrieving chat data: {e}")
+            raise
+    
+    @instrumented("get_composer_ids")
+    def get_composer_ids(self, project_name, fields=None):
+        """
+        Retrieve composer IDs from a project
+        
+        Args:
+            project_name (str): Name of the project
+            fields (list, optional): JSON paths of composer.composerData to return instead of the full data
+            
+        Returns:
+            list: List of composer IDs
+        """
+        project_name = self.resolve_project(project_name)
+        
+        try:
+            if fields:
+                projection = JSONProjection(["allComposers[*].composerId"] + list(JSONProjection(fields).fields))
+                projected = self.get_projected_value(self.db_paths[project_name], "ItemTable", COMPOSER_DATA_KEY, projection)
+                if projected is None:
+                    return {"error": "No composer data found for this project"}
+                composer_ids = projected.pop("allComposers[*].composerId") or []
+                return {
+                    "composer_ids": [c for c in composer_ids if c is not None],
+                    "fields": projected
+                }
+            
+            composer_data = self.get_value(
+                self.db_paths[project_name], 
+                "ItemTable", 
+                COMPOSER_DATA_KEY
+            )
+            
+            if composer_data is not None:
+                # Extract composer IDs from the data
+                composer_ids = []
+                if "allComposers" in composer_data:
+                    for composer in composer_data["allComposers"]:
+                        if "composerId" in composer:
+                            composer_ids.append(composer["composerId"])
+                return {
+                    "composer_ids": composer_ids,
+                    "full_data": composer_data
+                }
+            else:
+                return {"error": "No composer data found for this project"}
+                
+        except Exception as e:
+            logger.error(f"Error retrieving composer IDs: {e}")
+            raise
+    
+    @instrumented("get_composer_data")
+    def get_composer_data(self, composer_id, fields=None):
+        """
+        Retrieve composer data from global storage
+        
+        Args:
+            composer_id (str): Composer ID
+            fields (list, optional): JSON paths to return instead of the full composer data
+            
+        Returns:
+            dict: Composer data
+        """
+        if not self.global_db_path:
+            raise ValueError("Global storage database not found")
+        
+        try:
+            key = f"{COMPOSER_KEY_PREFIX}{composer_id}"
+            if fields:
+                data = self.get_projected_value(self.global_db_path, "cursorDiskKV", key, JSONProjection(fields))
+            else:
+                data = self.get_value(self.global_db_path, "cursorDiskKV", key)
+            
+            if data is not None:
+                return {"composer_id": composer_id, "data": data}
+            else:
+                return {"error": f"No data found for composer ID: {composer_id}"}
+                
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error: {e}")
+            raise
+    
+    def iter_composer_data(self, composer_ids, fields=None):
+        """
+        Fetch many composers from global storage with a single query
+        
+        Composers already in the decoded value cache are yielded first; the rest are
+        read with one `key IN (SELECT ... FROM json_each(?))` query and yielded as
+        SQLite returns them. Unknown IDs are yielded last, with an error.
+        
+        Args:
+            composer_ids (list): Composer IDs
+            fields (list, optional): JSON paths to return instead of the full composer data
+            
+        Yields:
+            dict: {"composer_id": ..., "data": ...} or {"composer_id": ..., "error": ...}
+        """
+        if not self.global_db_path:
+            raise ValueError("Global storage database not found")
+        
+        db_path = self.global_db_path
+        projection = JSONProjection(fields) if fields else None
+        pending = list(dict.fromkeys(composer_ids))
+        signature = database_signature(db_path)
+        token = current_cancel_token.get()
+        
+        if projection is None:
+            misses = []
+            for composer_id in pending:
+                found, data = self.value_cache.get((db_path, "cursorDiskKV", f"{COMPOSER_KEY_PREFIX}{composer_id}"), signature)
+                metrics.count("cache_hits" if found and data is not None else "cache_misses")
+                if found and data is not None:
+                    yield {"composer_id": composer_id, "data": data}
+                else:
+                    misses.append(composer_id)
+            pending = misses
+        
+        remaining = set(pending)
+        if pending:
+            value_sql = projection.select_sql if projection else "t.value"
+            params = (projection.params if projection else []) + [COMPOSER_KEY_PREFIX, json.dumps(pending)]
+            try:
+                with self.connect(db_path) as conn:
+                    rows = conn.execute(
+                        f"""
+                        SELECT t.key, {value_sql} FROM cursorDiskKV AS t
+                        WHERE t.key IN (SELECT ? || ids.value FROM json_each(?) AS ids)
+                        """,
+                        params
+                    )
+                    for row in rows:
+                        if token is not None:
+                            token.check()
+                        composer_id = row[0][len(COMPOSER_KEY_PREFIX):]
+                        remaining.discard(composer_id)
+                        metrics.count("rows_scanned")
+                        metrics.count("bytes_read", sum(value_size(column) for column in row[1:]))
+                        if projection:
+                            yield {"composer_id": composer_id, "data": projection.decode(row[1:])}
+                            continue
+                        data = decode_value(row[1])
+                        self.value_cache.put((db_path, "cursorDiskKV", row[0]), signature, data, len(row[1]))
+                        yield {"composer_id": composer_id, "data": data}
+            except sqlite3.Error as e:
+                logger.error(f"SQLite error: {e}")
+                raise
+        
+        for composer_id in pending:
+            if composer_id in remaining:
+                yield {"composer_id": composer_id, "error": f"No data found for composer ID: {composer_id}"}
+    
+    @instrumented("get_composers_batch")
+    def get_composers_batch(self, composer_ids, fields=None):
+        """
+        Retrieve many composers from global storage, in the order they were requested
+        
+        Args:
+            composer_ids (list): Composer IDs
+            fields (list, optional): JSON paths to return instead of the full composer data
+            
+        Returns:
+            list: One result per distinct composer ID (see iter_composer_data)
+        """
+        by_id = {result["composer_id"]: result for result in self.iter_composer_data(composer_ids, fields)}
+        return [by_id[composer_id] for composer_id in dict.fromkeys(composer_ids)]
+
+    @instrumented("read_chat_messages")
+    @retry_on_busy
+    def read_chat_messages(self, project_name, tab_id=None, start=0, limit=50, max_bytes=DEFAULT_PAGE_BYTES,
+                           cursor=None):
+        """
+        Read one page of a project's chat tabs, or of the bubbles of one tab
+
+        Without tab_id, pages through summaries of the tabs (ID, title, bubble count).
+        With tab_id, pages through that tab's bubbles. Only the requested slice of
+        the chat data is extracted (by SQLite's json_each) and decoded.
+
+        Args:
+            project_name (str): Name of the project
+            tab_id (str, optional): Tab whose bubbles to read
+            start (int): Index of the first tab or bubble to return
+            limit (int): Maximum number of tabs or bubbles to return
+            max_bytes (int): Stop adding bubbles once their encoded size reaches this budget
+            cursor (str, optional): next_cursor from the previous page; overrides start
+
+        Returns:
+            dict: {"total": n, "start": i, "tabs" or "messages": [...], "next_cursor": token or None}
+        """
+        project_name = self.resolve_project(project_name)
+        query = {"chat": project_name, "tab_id": tab_id}
+        start = decode_page_token(cursor, query) if cursor else start
+        if start < 0 or limit < 1:
+            raise ValueError("start must be >= 0 and limit >= 1")
+
+        with self.snapshot(self.db_paths[project_name]) as conn:
+            if tab_id is None:
+                rows = conn.execute(
+                    """
+                    SELECT j.key, json_extract(j.value, '$.tabId'), json_extract(j.value, '$.chatTitle'),
+                           json_array_length(j.value, '$.bubbles'), json_extract(j.value, '$.lastSendTime')
+                    FROM ItemTable AS t, json_each(t.value, '$.tabs') AS j
+                    WHERE t.key = ? AND json_valid(t.value) AND j.key >= ? LIMIT ?
+                    """,
+                    (CHAT_DATA_KEY, start, limit)
+                ).fetchall()
+                metrics.count("rows_scanned", len(rows))
+                tabs = [
+                    {"index": index, "tabId": tid, "chatTitle": title, "bubble_count": count or 0, "lastSendTime": sent}
+                    for index, tid, title, count, sent in rows
+                ]
+                total = self._json_array_length(conn, "ItemTable", CHAT_DATA_KEY, "$.tabs")
+                page = {"project": project_name, "total": total, "start": start, "tabs": tabs}
+                end = start + len(tabs)
+            else:
+                tab_index = conn.execute(
+                    """
+                    SELECT j.key FROM ItemTable AS t, json_each(t.value, '$.tabs') AS j
+                    WHERE t.key = ? AND json_valid(t.value) AND json_extract(j.value, '$.tabId') = ?
+                    """,
+                    (CHAT_DATA_KEY, tab_id)
+                ).fetchone()
+                if tab_index is None:
+                    return {"error": f"No chat tab found with ID: {tab_id}"}
+                path = f"$.tabs[{tab_index[0]}].bubbles"
+                messages = self._read_json_array(conn, "ItemTable", CHAT_DATA_KEY, path, start, limit, max_bytes)
+                total = self._json_array_length(conn, "ItemTable", CHAT_DATA_KEY, path)
+                page = {"project": project_name, "tab_id": tab_id, "total": total, "start": start, "messages": messages}
+                end = start + len(messages)
+
+        page["next_cursor"] = encode_page_token(query, end) if end < total else None
+        return page
+
+    @instrumented("read_composer_messages")
+    @retry_on_busy
+    def read_composer_messages(self, composer_id, start=0, limit=50, max_bytes=DEFAULT_PAGE_BYTES, cursor=None):
+        """
+        Read one page of a composer conversation's messages
+
+        Works for composers that embed their messages in `conversation` as well as
+        for newer ones that keep only message headers and store each bubble under
+        its own key. Only the requested messages are extracted and decoded.
+
+        Args:
+            composer_id (str): Composer ID
+            start (int): Index of the first message to return
+            limit (int): Maximum number of messages to return
+            max_bytes (int): Stop adding messages once their encoded size reaches this budget
+            cursor (str, optional): next_cursor from the previous page; overrides start
+
+        Returns:
+            dict: {"composer_id": ..., "total": n, "start": i, "messages": [...], "next_cursor": token or None}
+        """
+        if not self.global_db_path:
+            raise ValueError("Global storage database not found")
+        query = {"composer": composer_id}
+        start = decode_page_token(cursor, query) if cursor else start
+        if start < 0 or limit < 1:
+            raise ValueError("start must be >= 0 and limit >= 1")
+        key = f"{COMPOSER_KEY_PREFIX}{composer_id}"
+
+        with self.snapshot(self.global_db_path) as conn:
+            row = conn.execute(
+                """
+                SELECT json_array_length(value, '$.conversation'), json_array_length(value, '$.fullConversationHeadersOnly')
+                FROM cursorDiskKV WHERE key = ? AND json_valid(value)
+                """,
+                (key,)
+            ).fetchone()
+            if row is None:
+                return {"error": f"No data found for composer ID: {composer_id}"}
+            embedded, headers = row[0] or 0, row[1] or 0
+
+            if embedded or not headers:
+                total = embedded
+                messages = self._read_json_array(conn, "cursorDiskKV", key, "$.conversation", start, limit, max_bytes)
+            else:
+                total = headers
+                messages = self._read_composer_bubbles(conn, composer_id, key, start, limit, max_bytes)
+
+        end = start + len(messages)
+        return {
+            "composer_id": composer_id,
+            "total": total,
+            "start": start,
+            "messages": messages,
+            "next_cursor": encode_page_token(query, end) if end < total else None
+        }
+
+    def _json_array_length(self, conn, table_name, key, path):
+        row = conn.execute(
+            f"SELECT json_array_length(value, ?) FROM {table_name} WHERE key = ? AND json_valid(value)", (path, key)
+        ).fetchone()
+        return (row[0] or 0) if row else 0
+
+    def _read_json_array(self, conn, table_name, key, path, start, limit, max_bytes):
+        """
+        Return [{"index": i, "message": ...}] for the elements of a JSON array inside a stored value
+
+        Elements are extracted one at a time by json_each and decoded until `limit`
+        elements or `max_bytes` of encoded JSON have been read; the first element is
+        always returned so that paging makes progress.
+        """
+        rows = conn.execute(
+            f"""
+            SELECT j.key, json_quote(j.value) FROM {table_name} AS t, json_each(t.value, ?) AS j
+            WHERE t.key = ? AND json_valid(t.value) AND j.key >= ? LIMIT ?
+            """,
+            (path, key, start, limit)
+        )
+        messages = []
+        size = 0
+        for index, raw in rows:
+            size += len(raw)
+            if messages and size > max_bytes:
+                break
+            metrics.count("rows_scanned")
+            metrics.count("bytes_read", len(raw))
+            messages.append({"index": index, "message": decode_value(raw)})
+        return messages
+
+    def _read_composer_bubbles(self, conn, composer_id, key, start, limit, max_bytes):
+        """Page through a composer's message headers and load the separately stored bubbles they point to"""
+        headers = conn.execute(
+            """
+            SELECT j.key, json_extract(j.value, '$.bubbleId') FROM cursorDiskKV AS t,
+                   json_each(t.value, '$.fullConversationHeadersOnly') AS j
+            WHERE t.key = ? AND json_valid(t.value) AND j.key >= ? LIMIT ?
+            """,
+            (key, start, limit)
+        ).fetchall()
+        bubble_ids = [bubble_id for _, bubble_id in headers if bubble_id]
+        prefix = f"{BUBBLE_KEY_PREFIX}{composer_id}:"
+        raw_bubbles = dict(conn.execute(
+            "SELECT key, value FROM cursorDiskKV WHERE key IN (SELECT ? || value FROM json_each(?))",
+            (prefix, json.dumps(bubble_ids))
+        ))
+
+        messages = []
+        size = 0
+        for index, bubble_id in headers:
+            raw = raw_bubbles.get(f"{prefix}{bubble_id}")
+            size += value_size(raw)
+            if messages and size > max_bytes:
+                break
+            if raw is not None:
+                metrics.count("rows_scanned")
+                metrics.count("bytes_read", value_size(raw))
+            messages.append({"index": index, "bubble_id": bubble_id, "message": decode_value(raw) if raw is not None else None})
+        return messages
+
+class ConversationSearchIndex:
+    """
+    Sidecar SQLite FTS5 index over every chat tab and composer conversation.
+
+    Each chat tab and each composer is one document. Source databases are tracked
+    by database_signature and documents by a cheap fingerprint, so update() only
+    reads databases that changed and only re-indexes documents that changed.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sources (
+            source TEXT PRIMARY KEY,
+            signature TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            doc_key TEXT NOT NULL UNIQUE,
+            source TEXT NOT NULL,
+            fingerprint TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS documents_source ON documents (source);
+        CREATE VIRTUAL TABLE IF NOT EXISTS conversations USING fts5(
+            title, body,
+            kind UNINDEXED, workspace_id UNINDEXED, composer_id UNINDEXED, tab_id UNINDEXED,
+            tokenize = 'porter unicode61'
+        );
+    """
+
+    # Documents (re)indexed per committed transaction
+    COMMIT_BATCH = 200
+
+    def __init__(self, index_path):
+        """
+        Args:
+            index_path (str): Path of the sidecar index database
+        """
+        self.index_path = Path(index_path)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.index_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            self._conn.executescript(self.SCHEMA)
+        except sqlite3.OperationalError as e:
+            self._conn.close()
+            raise RuntimeError(f"SQLite FTS5 is not available: {e}")
+        # Searches read through their own connection, so (with WAL) they see the
+        # committed batches of an update instead of waiting for it to finish
+        self._search_lock = threading.Lock()
+        self._search_conn = sqlite3.connect(str(self.index_path), check_same_thread=False)
+
+    def close(self):
+        with self._lock, self._search_lock:
+            self._conn.close()
+            self._search_conn.close()
+
+    def update(self, manager):
+        """
+        Bring the index up to date with the manager's project and global databases
         
-        logger.info(f"Detected default Cursor path for {system}: {default_path}")
-        return default_path
-    
-    def detect_cursor_projects(self):
-        """Detect Cursor projects by scanning the workspaceStorage directory"""
-        if not self.cursor_path:
-            logger.error("No Cursor path available")
-            return []
-            
-        # Check if the path exists
-        if not self.cursor_path.exists():
-            logger.error(f"Cursor path does not exist: {self.cursor_path}")
-            return []
-                
-        workspace_storage = self.cursor_path / "workspaceStorage"
-        if not workspace_storage.exists():
-            logger.warning(f"Workspace storage directory not found: {workspace_storage}")
-            return []
-            
-        logger.info(f"Found workspace storage directory: {workspace_storage}")
+        Each source is committed on its own, and its signature is only recorded once
+        it was indexed successfully, so a source that failed is retried next time.
+        Within a source, documents are committed in batches of COMMIT_BATCH, so a
+        cancelled build keeps its progress. Building the index may take much longer
+        than a request is allowed to run, so it isn't subject to the request's deadline.
         
-        projects = []
+        If another thread is already updating the index, this returns right away and
+        the caller searches what has been committed so far.
+        """
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            with exempt_from_request_limits():
+                self._update(manager)
+        finally:
+            self._lock.release()
+
+    def _update(self, manager):
+        """Index whatever changed since the last update; called with the update lock held"""
+        known = dict(self._conn.execute("SELECT source, signature FROM sources"))
+        current = set()
+        projects_changed = False
         
-        # Scan all subdirectories in workspaceStorage
-        for workspace_dir in workspace_storage.iterdir():
-            if not workspace_dir.is_dir():
+        for info in list(manager.projects_info.values()):
+            source = info["db_path"]
+            current.add(source)
+            # Take the signature before reading so a concurrent write only makes it stale
+            signature = json.dumps(database_signature(source))
+            if known.get(source) == signature:
                 continue
-                
-            workspace_json = workspace_dir / "workspace.json"
-            state_db = workspace_dir / "state.vscdb"
-            
-            if workspace_json.exists() and state_db.exists():
-                try:
-                    with open(workspace_json, 'r') as f:
-                        workspace_data = json.load(f)
-                        
-                    folder_uri = workspace_data.get("folder")
-                    if folder_uri:
-                        # Extract the project name from the URI
-                        # For "file:///Users/johndamask/code/cursor-chat-browser", get "cursor-chat-browser"
-                        project_name = folder_uri.rstrip('/').split('/')[-1]
-                        
-                        projects.append({
-                            "name": project_name,
-                            "db_path": str(state_db),
-                            "workspace_dir": str(workspace_dir),
-                            "folder_uri": folder_uri
-                        })
-                        logger.info(f"Found project: {project_name} at {state_db}")
-                except Exception as e:
-                    logger.error(f"Error processing workspace: {workspace_dir}: {e}")
-        
-        return projects
-        
-    def refresh_db_paths(self):
-        """Scan project directories and identify all state.vscdb files"""
-        self.db_paths = {}
-        self.projects_info = {}
-        
-        # First, detect projects from the Cursor directory
-        if self.cursor_path:
-            cursor_projects = self.detect_cursor_projects()
-            for project in cursor_projects:
-                project_name = project["name"]
-                self.db_paths[project_name] = project["db_path"]
-                self.projects_info[project_name] = project
-            
-            # Set the global storage database path
-            global_storage_path = self.cursor_path / "globalStorage" / "state.vscdb"
-            if global_storage_path.exists():
-                self.global_db_path = str(global_storage_path)
-                logger.info(f"Found global storage database at {self.global_db_path}")
-            else:
-                logger.warning(f"Global storage database not found at {global_storage_path}")
+            projects_changed = True
+            with self._conn:
+                if self._index_chat(manager, info):
+                    self._set_signature(source, signature)
         
-        # Then add explicitly specified project directories
-        for project_dir in self.project_dirs:
-            project_path = Path(project_dir).expanduser().resolve()
-            db_path = project_path / "state.vscdb"
-            
-            if db_path.exists():
-                project_name = project_path.name
-                self.db_paths[project_name] = str(db_path)
-                self.projects_info[project_name] = {
-                    "name": project_name,
-                    "db_path": str(db_path),
-                    "workspace_dir": None,
-                    "folder_uri": None
-                }
-                logger.info(f"Found database: {project_name} at {db_path}")
-            else:
-                logger.warning(f"No state.vscdb found in {project_path}")
+        # Composer ownership comes from the project databases, so a change there
+        # re-checks which workspace each composer belongs to; only a change of
+        # global storage itself needs the composers to be fingerprinted again
+        global_db_path = manager.global_db_path
+        if global_db_path:
+            current.add(global_db_path)
+            signature = json.dumps(database_signature(global_db_path))
+            global_changed = known.get(global_db_path) != signature
+            if projects_changed or global_changed:
+                with self._conn:
+                    self._index_composers(manager, global_changed)
+                    if global_changed:
+                        self._set_signature(global_db_path, signature)
         
-    # def add_project_dir(self, project_dir):
-    #     """Add a new project directory to the manager"""
-    #     project_path = Path(project_dir).expanduser().resolve()
-    #     if project_path not in self.project_dirs:
-    #         self.project_dirs.append(project_path)
-    #         self.refresh_db_paths()
-    #     return len(self.db_paths)
-    
-    def list_projects(self, detailed=False):
+        for source in set(known) - current:
+            with self._conn:
+                self._sync_documents(source, {}, None)
+                self._conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+
+    def _set_signature(self, source, signature):
+        self._conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?)", (source, signature))
+
+    def search(self, query, workspace_id=None, limit=20):
         """
-        Return list of available projects
+        Return the best matches for an FTS5 query
         
         Args:
-            detailed (bool): Whether to return detailed project information
+            query (str): FTS5 query; falls back to matching the plain words if it isn't valid FTS5 syntax
+            workspace_id (str, optional): Only return documents from this workspace
+            limit (int): Maximum number of results
             
         Returns:
-            dict: Project information (either just DB paths or full details)
+            list: Matches ordered by bm25 rank
         """
-        if detailed:
-            return self.projects_info
-        return self.db_paths
-    
-    def execute_query(self, project_name, table_name, query_type, key=None, limit=100):
+        sql = """
+            SELECT kind, workspace_id, composer_id, tab_id, title,
+                   snippet(conversations, 1, '[', ']', '...', 24), bm25(conversations)
+            FROM conversations
+            WHERE conversations MATCH ? AND (? IS NULL OR workspace_id = ?)
+            ORDER BY bm25(conversations)
+            LIMIT ?
         """
-        Execute a query against a specific project's database
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        with self._search_lock:
+            try:
+                rows = self._search_conn.execute(sql, (query, workspace_id, workspace_id, limit)).fetchall()
+            except sqlite3.OperationalError:
+                # Not valid FTS5 syntax: search for the words as literal terms instead
+                quoted = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+                if not quoted:
+                    return []
+                rows = self._search_conn.execute(sql, (quoted, workspace_id, workspace_id, limit)).fetchall()
+        return [
+            {
+                "kind": kind,
+                "workspace_id": workspace_id,
+                "composer_id": composer_id,
+                "tab_id": tab_id,
+                "title": title,
+                "snippet": snippet,
+                "score": -rank,
+            }
+            for kind, workspace_id, composer_id, tab_id, title, snippet, rank in rows
+        ]
+
+    def _index_chat(self, manager, info):
+        source = info["db_path"]
+        try:
+            chat_data = manager.get_value(source, "ItemTable", CHAT_DATA_KEY)
+        except sqlite3.Error as e:
+            logger.warning(f"Skipping chat data of {info['name']} in search index: {e}")
+            return False
         
+        documents = {}
+        for position, tab in enumerate(iter_chat_tabs(chat_data)):
+            tab_id = tab.get("tabId") or str(position)
+            texts = [message_text(bubble) for bubble in tab.get("bubbles") or []]
+            title = tab.get("chatTitle") or ""
+            fingerprint = f"{tab.get('lastSendTime')}:{len(texts)}:{sum(map(len, texts))}:{title}"
+            documents[f"chat:{info['workspace_id']}:{tab_id}"] = (fingerprint, {
+                "kind": "chat",
+                "workspace_id": info["workspace_id"],
+                "composer_id": None,
+                "tab_id": tab_id,
+                "title": title,
+                "body": "\n".join(texts),
+            })
+        self._sync_documents(source, {k: fp for k, (fp, _) in documents.items()},
+                             lambda doc_keys: ((k, documents[k][1]) for k in doc_keys))
+        return True
+
+    def _index_composers(self, manager, rescan=True):
+        """
         Args:
-            project_name (str): Name of the project (key in db_paths)
-            table_name (str): Either 'ItemTable' or 'cursorDiskKV'
-            query_type (str): Type of query ('get_all', 'get_by_key', 'search_keys')
-            key (str, optional): Key to search for when using 'get_by_key' or 'search_keys'
-            limit (int): Maximum number of results to return
-            
-        Returns:
-            list: Query results
+            rescan (bool): Fingerprint the composers in global storage again; without it the
+                indexed fingerprints are reused and only composers that moved to another
+                workspace are re-indexed
         """
-        if project_name not in self.db_paths:
-            raise ValueError(f"Project '{project_name}' not found")
+        source = manager.global_db_path
+        workspaces = manager.composer_workspace_map()
+        
+        with manager.snapshot(source) as conn:
+            if rescan:
+                contents = composer_fingerprints(conn)
+            else:
+                # Document fingerprints are "<content fingerprint>:<workspace ID>"
+                contents = {
+                    doc_key[len("composer:"):]: fingerprint.rsplit(":", 1)[0]
+                    for doc_key, fingerprint in self._conn.execute(
+                        "SELECT doc_key, fingerprint FROM documents WHERE source = ?", (source,)
+                    )
+                }
+            fingerprints = {
+                f"composer:{composer_id}": f"{fingerprint}:{workspaces.get(composer_id)}"
+                for composer_id, fingerprint in contents.items()
+            }
             
-        if table_name not in ["ItemTable", "cursorDiskKV"]:
-            raise ValueError("Table name must be either 'ItemTable' or 'cursorDiskKV'")
+            def build(doc_keys):
+                for doc_key in doc_keys:
+                    composer_id = doc_key[len("composer:"):]
+                    row = conn.execute(
+                        "SELECT value FROM cursorDiskKV WHERE key = ?", (f"{COMPOSER_KEY_PREFIX}{composer_id}",)
+                    ).fetchone()
+                    if row:
+                        metrics.count("rows_scanned")
+                        metrics.count("bytes_read", value_size(row[0]))
+                        metrics.count("bytes_decoded", value_size(row[0]))
+                    conversation = ComposerConversation.from_json(row[0]) if row else None
+                    if conversation is None:
+                        continue
+                    texts = [message.text for message in conversation.messages]
+                    if conversation.bubble_ids:
+                        bubbles = load_composer_bubbles(conn, composer_id)
+                        texts = [message_text(bubbles.get(bubble_id)) for bubble_id in conversation.bubble_ids]
+                    yield doc_key, {
+                        "kind": "composer",
+                        "workspace_id": workspaces.get(composer_id),
+                        "composer_id": composer_id,
+                        "tab_id": None,
+                        "title": conversation.name or "",
+                        "body": "\n".join(texts),
+                    }
+            
+            self._sync_documents(source, fingerprints, build)
+
+    def _sync_documents(self, source, fingerprints, build):
+        """
+        Make the indexed documents of a source match `fingerprints`.
         
-        db_path = self.db_paths[project_name]
+        Documents that disappeared are deleted; new or changed ones are (re)built
+        by calling build(doc_keys), which yields (doc_key, fields) pairs. Every
+        COMMIT_BATCH documents are committed as they're built.
+        """
+        existing = {
+            doc_key: (doc_id, fingerprint)
+            for doc_id, doc_key, fingerprint in self._conn.execute(
+                "SELECT id, doc_key, fingerprint FROM documents WHERE source = ?", (source,)
+            )
+        }
+        stale = [doc_id for doc_key, (doc_id, _) in existing.items() if doc_key not in fingerprints]
+        changed = [
+            doc_key for doc_key, fingerprint in fingerprints.items()
+            if doc_key not in existing or existing[doc_key][1] != fingerprint
+        ]
+        stale.extend(existing[doc_key][0] for doc_key in changed if doc_key in existing)
         
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
+        self._conn.executemany("DELETE FROM conversations WHERE rowid = ?", ((i,) for i in stale))
+        self._conn.executemany("DELETE FROM documents WHERE id = ?", ((i,) for i in stale))
+        if not changed:
+            return
+        for count, (doc_key, fields) in enumerate(build(changed), 1):
+            cursor = self._conn.execute(
+                "INSERT INTO documents (doc_key, source, fingerprint) VALUES (?, ?, ?)",
+                (doc_key, source, fingerprints[doc_key])
+            )
+            self._conn.execute(
+                """
+                INSERT INTO conversations (rowid, title, body, kind, workspace_id, composer_id, tab_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (cursor.lastrowid, fields["title"], fields["body"], fields["kind"],
+                 fields["workspace_id"], fields["composer_id"], fields["tab_id"])
+            )
+            if count % self.COMMIT_BATCH == 0:
+                self._conn.commit()
+        logger.info(f"Search index: re-indexed {len(changed)} documents from {source}")
+
+def message_stats(messages):
+    """Aggregate a list of ConversationMessages into counts, models used and activity timestamps"""
+    models = Counter(message.model for message in messages if message.model)
+    timestamps = [message.timestamp for message in messages if isinstance(message.timestamp, (int, float))]
+    user_messages = sum(1 for message in messages if message.from_user)
+    return {
+        "messages": len(messages),
+        "user_messages": user_messages,
+        "assistant_messages": len(messages) - user_messages,
+        "code_blocks": sum(message.code_blocks for message in messages),
+        "models": dict(models),
+        "first_message_at": min(timestamps) if timestamps else None,
+        "last_message_at": max(timestamps) if timestamps else None,
+    }
+
+class StatsIndex:
+    """
+    Sidecar SQLite database of per-project and per-composer conversation statistics.
+
+    Like ConversationSearchIndex, source databases are tracked by database_signature
+    and composers by a cheap fingerprint, so update() only decodes the chat data and
+    composers that changed. Project aggregates and the overall totals are recomputed
+    only for projects whose conversations changed and stored precomputed, so reading
+    them costs the same no matter how much history there is.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sources (
+            source TEXT PRIMARY KEY,
+            signature TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS composers (
+            composer_id TEXT PRIMARY KEY,
+            workspace_id TEXT,
+            fingerprint TEXT NOT NULL,
+            name TEXT,
+            created_at INTEGER,
+            last_updated_at INTEGER,
+            messages INTEGER NOT NULL,
+            user_messages INTEGER NOT NULL,
+            assistant_messages INTEGER NOT NULL,
+            code_blocks INTEGER NOT NULL,
+            bytes INTEGER NOT NULL,
+            models TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS composers_workspace ON composers (workspace_id, last_updated_at);
+        CREATE INDEX IF NOT EXISTS composers_updated ON composers (last_updated_at);
+        CREATE TABLE IF NOT EXISTS chat_data (
+            workspace_id TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            bytes INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS chat_tabs (
+            workspace_id TEXT NOT NULL,
+            tab_id TEXT NOT NULL,
+            title TEXT,
+            last_updated_at INTEGER,
+            messages INTEGER NOT NULL,
+            user_messages INTEGER NOT NULL,
+            assistant_messages INTEGER NOT NULL,
+            code_blocks INTEGER NOT NULL,
+            models TEXT NOT NULL,
+            PRIMARY KEY (workspace_id, tab_id)
+        );
+        CREATE INDEX IF NOT EXISTS chat_tabs_updated ON chat_tabs (last_updated_at);
+        CREATE INDEX IF NOT EXISTS chat_tabs_workspace ON chat_tabs (workspace_id, last_updated_at);
+        CREATE TABLE IF NOT EXISTS projects (
+            workspace_id TEXT PRIMARY KEY,
+            stats TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            stats TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, index_path):
+        """
+        Args:
+            index_path (str): Path of the sidecar stats database
+        """
+        self.index_path = Path(index_path)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.index_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def update(self, manager):
+        """
+        Bring the statistics up to date with the manager's project and global databases
+        
+        Like building the search index, this isn't subject to the request's deadline.
+        """
+        with exempt_from_request_limits(), self._lock, self._conn:
+            known = dict(self._conn.execute("SELECT source, signature FROM sources"))
+            current = {}
+            changed_workspaces = set()
+            projects_changed = False
             
-            if query_type == "get_all":
-                cursor.execute(f"SELECT key, value FROM {table_name} LIMIT ?", (limit,))
-            elif query_type == "get_by_key" and key:
-                cursor.execute(f"SELECT key, value FROM {table_name} WHERE key = ?", (key,))
-            elif query_type == "search_keys" and key:
-                search_term = f"%{key}%"
-                cursor.execute(f"SELECT key, value FROM {table_name} WHERE key LIKE ? LIMIT ?", 
-                              (search_term, limit))
-            else:
-                raise ValueError("Invalid query type or missing key parameter")
-                
-            results = []
-            for row in cursor.fetchall():
-                key, value = row
-                try:
-                    # Try to parse JSON value
-                    parsed_value = json.loads(value)
-                    results.append({"key": key, "value": parsed_value})
-                except json.JSONDecodeError:
-                    # If not valid JSON, return as string
-                    results.append({"key": key, "value": value})
+            for info in list(manager.projects_info.values()):
+                signature = json.dumps(database_signature(info["db_path"]))
+                current[info["db_path"]] = signature
+                if known.get(info["db_path"]) != signature:
+                    changed = self._update_chat(manager, info)
+                    if changed is None:
+                        # Unreadable: keep the old signature so it is retried next time
+                        current[info["db_path"]] = known.get(info["db_path"], "")
+                    elif changed:
+                        changed_workspaces.add(info["workspace_id"])
+                    projects_changed = True
             
-            conn.close()
-            return results
+            # Composer ownership comes from the project databases, so a change there
+            # only re-checks which workspace each composer belongs to; composers are
+            # fingerprinted and decoded again only when global storage changed
+            global_db_path = manager.global_db_path
+            if global_db_path:
+                signature = json.dumps(database_signature(global_db_path))
+                current[global_db_path] = signature
+                if known.get(global_db_path) != signature:
+                    changed_workspaces |= self._update_composers(manager)
+                elif projects_changed:
+                    changed_workspaces |= self._update_ownership(manager)
             
-        except sqlite3.Error as e:
-            logger.error(f"SQLite error: {e}")
-            raise
-    
-    def get_chat_data(self, project_name):
+            for source in set(known) - set(current):
+                changed_workspaces |= self._remove_source(source)
+            
+            if changed_workspaces:
+                for workspace_id in changed_workspaces:
+                    self._update_project(workspace_id)
+                self._update_totals()
+            if current != known:
+                self._conn.execute("DELETE FROM sources")
+                self._conn.executemany("INSERT INTO sources VALUES (?, ?)", current.items())
+
+    def summary(self):
         """
-        Retrieve AI chat data from a project
+        Return the precomputed totals and per-project aggregates
+        
+        Returns:
+            dict: {"totals": {...}, "projects": {workspace_id: {...}}, "updated_at": epoch seconds}
+        """
+        with self._lock:
+            totals = self._conn.execute("SELECT stats, updated_at FROM totals WHERE id = 1").fetchone()
+            projects = self._conn.execute("SELECT workspace_id, stats FROM projects").fetchall()
+        return {
+            "totals": json.loads(totals[0]) if totals else self._empty_stats(),
+            "projects": {workspace_id: json.loads(stats) for workspace_id, stats in projects},
+            "updated_at": totals[1] if totals else None,
+        }
+
+    def project(self, workspace_id, limit=100):
+        """
+        Return one project's aggregates and its most recently updated composers and chat tabs
         
         Args:
-            project_name (str): Name of the project
-            
+            workspace_id (str): Workspace ID of the project
+            limit (int): Maximum number of composers and of chat tabs to list
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT stats FROM projects WHERE workspace_id = ?", (workspace_id,)).fetchone()
+            composers = self._conn.execute(
+                """
+                SELECT composer_id, name, created_at, last_updated_at, messages, user_messages,
+                       assistant_messages, code_blocks, bytes, models
+                FROM composers WHERE workspace_id = ?
+                ORDER BY last_updated_at DESC LIMIT ?
+                """,
+                (workspace_id, limit)
+            ).fetchall()
+            tabs = self._conn.execute(
+                """
+                SELECT tab_id, title, last_updated_at, messages, user_messages, assistant_messages, code_blocks, models
+                FROM chat_tabs WHERE workspace_id = ?
+                ORDER BY last_updated_at DESC LIMIT ?
+                """,
+                (workspace_id, limit)
+            ).fetchall()
+        return {
+            "stats": json.loads(row[0]) if row else self._empty_stats(),
+            "composers": [
+                {
+                    "composer_id": composer_id, "name": name, "created_at": created_at,
+                    "last_updated_at": last_updated_at, "messages": messages, "user_messages": user_messages,
+                    "assistant_messages": assistant_messages, "code_blocks": code_blocks, "bytes": size,
+                    "models": json.loads(models),
+                }
+                for (composer_id, name, created_at, last_updated_at, messages, user_messages,
+                     assistant_messages, code_blocks, size, models) in composers
+            ],
+            "chat_tabs": [
+                {
+                    "tab_id": tab_id, "title": title, "last_updated_at": last_updated_at, "messages": messages,
+                    "user_messages": user_messages, "assistant_messages": assistant_messages,
+                    "code_blocks": code_blocks, "models": json.loads(models),
+                }
+                for (tab_id, title, last_updated_at, messages, user_messages,
+                     assistant_messages, code_blocks, models) in tabs
+            ],
+        }
+
+    def timeline(self, limit=20, since=None, until=None, kind=None, workspace_id=None):
+        """
+        Return the most recently updated composers and chat tabs, newest first
+        
+        Each side is read through its last_updated_at index and only the newest
+        `limit` rows of each are merged, so the cost depends on `limit` rather than
+        on the size of the history. Conversations without a timestamp are left out.
+        
+        Args:
+            limit (int): Maximum number of conversations to return
+            since (int, optional): Only conversations updated at or after this time (epoch milliseconds)
+            until (int, optional): Only conversations updated before this time (epoch milliseconds)
+            kind (str, optional): 'composer' or 'chat_tab' to return only one kind
+            workspace_id (str, optional): Only conversations of this workspace
+        """
+        conditions = ["last_updated_at IS NOT NULL"]
+        params = []
+        for condition, value in (("last_updated_at >= ?", since), ("last_updated_at < ?", until),
+                                 ("workspace_id = ?", workspace_id)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        where = " AND ".join(conditions)
+        legs = {
+            "composer": f"""
+                SELECT 'composer', composer_id, workspace_id, name, created_at, last_updated_at, messages
+                FROM composers WHERE {where} ORDER BY last_updated_at DESC LIMIT ?
+            """,
+            "chat_tab": f"""
+                SELECT 'chat_tab', tab_id, workspace_id, title, NULL, last_updated_at, messages
+                FROM chat_tabs WHERE {where} ORDER BY last_updated_at DESC LIMIT ?
+            """,
+        }
+        selected = [sql for name, sql in legs.items() if kind is None or kind == name]
+        sql = " UNION ALL ".join(f"SELECT * FROM ({leg})" for leg in selected)
+        with self._lock:
+            rows = self._conn.execute(
+                f"{sql} ORDER BY 6 DESC, 2 LIMIT ?", (params + [limit]) * len(selected) + [limit]
+            ).fetchall()
+        return [
+            {
+                "kind": row_kind, "id": conversation_id, "workspace_id": row_workspace_id, "title": title,
+                "created_at": created_at, "last_updated_at": last_updated_at, "messages": messages,
+            }
+            for row_kind, conversation_id, row_workspace_id, title, created_at, last_updated_at, messages in rows
+        ]
+
+    def _update_chat(self, manager, info):
+        """
+        Recompute the chat tab statistics of a project if its chat data changed
+        
         Returns:
-            dict: Chat data from the project
+            bool: Whether it changed, or None if the chat data could not be read
         """
-        if project_name not in self.db_paths:
-            raise ValueError(f"Project '{project_name}' not found")
+        workspace_id = info["workspace_id"]
+        try:
+            with manager.connect(info["db_path"]) as conn:
+                row = conn.execute("SELECT value FROM ItemTable WHERE key = ?", (CHAT_DATA_KEY,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Skipping chat data of {info['name']} in stats: {e}")
+            return None
+        raw = row[0] if row else None
+        fingerprint = hashlib.blake2b(raw.encode("utf-8") if isinstance(raw, str) else raw or b"",
+                                      digest_size=16).hexdigest()
+        previous = self._conn.execute(
+            "SELECT fingerprint FROM chat_data WHERE workspace_id = ?", (workspace_id,)
+        ).fetchone()
+        if previous is not None and previous[0] == fingerprint:
+            return False
         
+        metrics.count("rows_scanned")
+        metrics.count("bytes_read", value_size(raw))
+        metrics.count("bytes_decoded", value_size(raw))
         try:
-            results = self.execute_query(
-                project_name, 
-                "ItemTable", 
-                "get_by_key", 
-                "workbench.panel.aichat.view.aichat.chatdata"
+            tabs = [ChatTab.from_dict(tab) for tab in iter_chat_tabs(json_loads(raw))] if raw else []
+        except (ValueError, TypeError):
+            tabs = []
+        self._conn.execute("DELETE FROM chat_tabs WHERE workspace_id = ?", (workspace_id,))
+        for position, tab in enumerate(tabs):
+            stats = message_stats(tab.messages)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chat_tabs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (workspace_id, tab.tab_id or str(position), tab.title,
+                 tab.last_send_time if tab.last_send_time is not None else stats["last_message_at"],
+                 stats["messages"], stats["user_messages"], stats["assistant_messages"], stats["code_blocks"],
+                 json.dumps(stats["models"]))
             )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO chat_data VALUES (?, ?, ?, ?)",
+            (workspace_id, info["db_path"], fingerprint, value_size(raw))
+        )
+        return True
+
+    def _update_composers(self, manager):
+        """Recompute the statistics of new or changed composers; return the workspaces affected"""
+        source = manager.global_db_path
+        workspaces = manager.composer_workspace_map()
+        existing = {
+            composer_id: (fingerprint, workspace_id)
+            for composer_id, fingerprint, workspace_id in self._conn.execute(
+                "SELECT composer_id, fingerprint, workspace_id FROM composers"
+            )
+        }
+        affected = set()
+        
+        with manager.snapshot(source) as conn:
+            fingerprints = {
+                composer_id: f"{fingerprint}:{workspaces.get(composer_id)}"
+                for composer_id, fingerprint in composer_fingerprints(conn).items()
+            }
+            for composer_id in set(existing) - set(fingerprints):
+                affected.add(existing[composer_id][1])
+                self._conn.execute("DELETE FROM composers WHERE composer_id = ?", (composer_id,))
             
-            if results and len(results) > 0:
-                return results[0]["value"]
-            else:
-                return {"error": "No chat data found for this project"}
-                
-        except Exception as e:
-            logger.error(f"Error retrieving chat data: {e}")
-            raise
-    
-    def get_composer_ids(self, project_name):
+            changed = [
+                composer_id for composer_id, fingerprint in fingerprints.items()
+                if composer_id not in existing or existing[composer_id][0] != fingerprint
+            ]
+            for composer_id in changed:
+                row = conn.execute(
+                    "SELECT value FROM cursorDiskKV WHERE key = ?", (f"{COMPOSER_KEY_PREFIX}{composer_id}",)
+                ).fetchone()
+                if row is None:
+                    continue
+                metrics.count("rows_scanned")
+                metrics.count("bytes_read", value_size(row[0]))
+                metrics.count("bytes_decoded", value_size(row[0]))
+                conversation = ComposerConversation.from_json(row[0])
+                if conversation is None:
+                    continue
+                messages = conversation.messages
+                size = value_size(row[0])
+                if conversation.bubble_ids:
+                    bubbles = load_composer_bubbles(conn, composer_id)
+                    messages = [
+                        ConversationMessage.from_dict(bubbles[bubble_id])
+                        for bubble_id in conversation.bubble_ids if isinstance(bubbles.get(bubble_id), dict)
+                    ]
+                    lower, upper = key_prefix_range(f"{BUBBLE_KEY_PREFIX}{composer_id}:")
+                    size += conn.execute(
+                        "SELECT coalesce(sum(length(value)), 0) FROM cursorDiskKV WHERE key >= ? AND key < ?",
+                        (lower, upper)
+                    ).fetchone()[0]
+                stats = message_stats(messages)
+                workspace_id = workspaces.get(composer_id)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO composers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (composer_id, workspace_id, fingerprints[composer_id], conversation.name,
+                     conversation.created_at if conversation.created_at is not None else stats["first_message_at"],
+                     conversation.last_updated_at if conversation.last_updated_at is not None else stats["last_message_at"],
+                     stats["messages"], stats["user_messages"], stats["assistant_messages"], stats["code_blocks"],
+                     size, json.dumps(stats["models"]))
+                )
+                affected.add(workspace_id)
+                if composer_id in existing:
+                    affected.add(existing[composer_id][1])
+        
+        if changed:
+            logger.info(f"Stats: recomputed {len(changed)} composers from {source}")
+        return affected
+
+    def _update_ownership(self, manager):
+        """Move composers whose owning workspace changed to their new project; return the workspaces affected"""
+        workspaces = manager.composer_workspace_map()
+        affected = set()
+        moved = []
+        for composer_id, fingerprint, workspace_id in self._conn.execute(
+            "SELECT composer_id, fingerprint, workspace_id FROM composers"
+        ).fetchall():
+            owner = workspaces.get(composer_id)
+            if owner != workspace_id:
+                # Fingerprints are "<content fingerprint>:<workspace ID>"
+                moved.append((owner, f"{fingerprint.rsplit(':', 1)[0]}:{owner}", composer_id))
+                affected |= {owner, workspace_id}
+        self._conn.executemany("UPDATE composers SET workspace_id = ?, fingerprint = ? WHERE composer_id = ?", moved)
+        return affected
+
+    def _remove_source(self, source):
+        """Forget the statistics read from a database that no longer exists; return the workspaces affected"""
+        affected = {row[0] for row in self._conn.execute("SELECT workspace_id FROM chat_data WHERE source = ?", (source,))}
+        for workspace_id in affected:
+            self._conn.execute("DELETE FROM chat_tabs WHERE workspace_id = ?", (workspace_id,))
+            self._conn.execute("DELETE FROM chat_data WHERE workspace_id = ?", (workspace_id,))
+        return affected
+
+    def _update_project(self, workspace_id):
+        """Recompute the stored aggregates of one project from its composers and chat tabs"""
+        stats = self._empty_stats()
+        models = Counter()
+        activity = []
+        for table in ("composers", "chat_tabs"):
+            created = "min(created_at)" if table == "composers" else "min(last_updated_at)"
+            size = "sum(bytes)" if table == "composers" else "0"
+            row = self._conn.execute(
+                f"""
+                SELECT count(*), sum(messages), sum(user_messages), sum(assistant_messages), sum(code_blocks),
+                       {size}, {created}, max(last_updated_at)
+                FROM {table} WHERE workspace_id IS ?
+                """,
+                (workspace_id,)
+            ).fetchone()
+            stats[table] = row[0]
+            for i, field in enumerate(("messages", "user_messages", "assistant_messages", "code_blocks", "bytes"), 1):
+                stats[field] += row[i] or 0
+            activity.extend(t for t in row[6:] if t is not None)
+            for (model_counts,) in self._conn.execute(f"SELECT models FROM {table} WHERE workspace_id IS ?", (workspace_id,)):
+                models.update(json.loads(model_counts))
+        chat_bytes = self._conn.execute("SELECT bytes FROM chat_data WHERE workspace_id IS ?", (workspace_id,)).fetchone()
+        stats["bytes"] += chat_bytes[0] if chat_bytes else 0
+        stats["models"] = dict(models.most_common())
+        stats["first_activity_at"] = min(activity) if activity else None
+        stats["last_activity_at"] = max(activity) if activity else None
+        
+        if workspace_id is None:
+            return
+        if stats["composers"] or stats["chat_tabs"] or chat_bytes:
+            self._conn.execute("INSERT OR REPLACE INTO projects VALUES (?, ?)", (workspace_id, json.dumps(stats)))
+        else:
+            self._conn.execute("DELETE FROM projects WHERE workspace_id = ?", (workspace_id,))
+
+    def _update_totals(self):
+        """Recompute the stored totals across all projects, including composers no project lists"""
+        totals = self._empty_stats()
+        models = Counter()
+        activity = []
+        for (project_stats,) in self._conn.execute("SELECT stats FROM projects"):
+            project_stats = json.loads(project_stats)
+            for field in ("composers", "chat_tabs", "messages", "user_messages", "assistant_messages",
+                          "code_blocks", "bytes"):
+                totals[field] += project_stats[field]
+            models.update(project_stats["models"])
+            activity.extend(t for t in (project_stats["first_activity_at"], project_stats["last_activity_at"]) if t)
+        row = self._conn.execute(
+            """
+            SELECT count(*), sum(messages), sum(user_messages), sum(assistant_messages), sum(code_blocks), sum(bytes),
+                   min(created_at), max(last_updated_at)
+            FROM composers WHERE workspace_id IS NULL
+            """
+        ).fetchone()
+        totals["composers"] += row[0]
+        for i, field in enumerate(("messages", "user_messages", "assistant_messages", "code_blocks", "bytes"), 1):
+            totals[field] += row[i] or 0
+        activity.extend(t for t in row[6:] if t is not None)
+        for (model_counts,) in self._conn.execute("SELECT models FROM composers WHERE workspace_id IS NULL"):
+            models.update(json.loads(model_counts))
+        totals["projects"] = self._conn.execute("SELECT count(*) FROM projects").fetchone()[0]
+        totals["models"] = dict(models.most_common())
+        totals["first_activity_at"] = min(activity) if activity else None
+        totals["last_activity_at"] = max(activity) if activity else None
+        self._conn.execute("INSERT OR REPLACE INTO totals VALUES (1, ?, ?)", (json.dumps(totals), time.time()))
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            "composers": 0, "chat_tabs": 0, "messages": 0, "user_messages": 0, "assistant_messages": 0,
+            "code_blocks": 0, "bytes": 0, "models": {}, "first_activity_at": None, "last_activity_at": None,
+        }
+
+class _JsonlSink:
+    """Writes export batches as JSON lines, optionally as one zstd frame per batch"""
+
+    def __init__(self, path, compression=None):
+        if compression not in (None, "zstd"):
+            raise ValueError("Compression must be either None or 'zstd'")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package (pip install zstandard)")
+        self.path = Path(path)
+        self._compressor = zstandard.ZstdCompressor() if compression == "zstd" else None
+        self._file = None
+
+    def exists(self):
+        return self.path.exists()
+
+    def can_resume(self, position):
+        """Return whether the output still holds everything up to `position`, so it can be appended to"""
+        return self.path.is_file() and self.path.stat().st_size >= position
+
+    def open(self, position):
+        """Open the output, discarding anything written after `position` (a byte offset, or None to start over)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "r+b" if position is not None and self.path.exists() else "wb")
+        self._file.truncate(position or 0)
+        self._file.seek(position or 0)
+
+    def write_batch(self, records):
+        lines = []
+        for fields, data in records:
+            # The stored value is already (minified) JSON, so it's spliced in without decoding it
+            lines.append(json.dumps(fields, separators=(",", ":"))[:-1] + ',"data":' + data + "}\n")
+        payload = "".join(lines).encode("utf-8")
+        if self._compressor is not None:
+            # Frames are independent, so the file can be truncated at any batch boundary on resume
+            payload = self._compressor.compress(payload)
+        self._file.write(payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    @property
+    def position(self):
+        """Byte offset of the end of the last written batch"""
+        return self._file.tell()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+class _ParquetSink:
+    """Writes each export batch as one part file in a Parquet dataset directory"""
+
+    COLUMNS = ("kind", "project", "workspace_id", "composer_id", "tab_id", "bubble_id", "data")
+
+    def __init__(self, path):
+        # pyarrow is a heavy import, so it's only loaded when Parquet output is asked for
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet export requires the pyarrow package (pip install pyarrow)")
+        self._pyarrow = pyarrow
+        self.path = Path(path)
+        self._parts = 0
+
+    def exists(self):
+        return self.path.exists() and (not self.path.is_dir() or any(self.path.iterdir()))
+
+    def can_resume(self, position):
+        """Return whether all parts up to `position` are still there"""
+        return all((self.path / f"part-{i:06d}.parquet").is_file() for i in range(position))
+
+    def open(self, position):
+        """Open the dataset directory, discarding parts written after `position` (a part count, or None)"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._parts = position or 0
+        for part in self.path.glob("part-*.parquet"):
+            if int(part.stem.split("-")[1]) >= self._parts:
+                part.unlink()
+
+    def write_batch(self, records):
+        columns = {name: [] for name in self.COLUMNS}
+        for fields, data in records:
+            for name in self.COLUMNS[:-1]:
+                columns[name].append(fields.get(name))
+            columns["data"].append(data)
+        table = self._pyarrow.table({name: self._pyarrow.array(values, self._pyarrow.string())
+                                     for name, values in columns.items()})
+        part = self.path / f"part-{self._parts:06d}.parquet"
+        tmp_part = part.with_name(f"{part.name}.tmp")
+        self._pyarrow.parquet.write_table(table, tmp_part, compression="zstd")
+        os.replace(tmp_part, part)
+        self._parts += 1
+
+    @property
+    def position(self):
+        """Number of part files written"""
+        return self._parts
+
+    def close(self):
+        pass
+
+class ConversationExporter:
+    """
+    Streams every project's chat tabs and every global composer and bubble to a file.
+
+    Each source (a project's chat data, the global composers, the global bubbles)
+    is read by its own reader thread in key order, in bounded batches, and the raw
+    JSON is handed to the writer without being decoded. Readers and the writer are
+    connected by a bounded queue, so memory stays constant however big the
+    history is. After every written batch a checkpoint records how far each source
+    got and where the output ends; an interrupted export resumes from there.
+    """
+
+    CHECKPOINT_VERSION = 1
+
+    def __init__(self, manager, output_path, format="jsonl", compression=None, workers=4,
+                 batch_records=1000, batch_bytes=8 * 1024 * 1024, read_batch=200, snapshot=False, overwrite=False):
         """
-        Retrieve composer IDs from a project
+        Args:
+            manager (CursorDBManager): Manager whose databases are exported
+            output_path (str): JSONL file, or directory of part files for Parquet
+            format (str): 'jsonl' or 'parquet'
+            compression (str, optional): 'zstd' to compress JSONL output
+            workers (int): Number of sources read in parallel
+            batch_records (int): Maximum records per written batch (and checkpoint)
+            batch_bytes (int): Maximum bytes of JSON per written batch
+            read_batch (int): Rows fetched per query by the readers
+            snapshot (bool): Export from point-in-time copies of the databases (see
+                CursorDBManager.snapshot_copy) instead of reading the live databases batch by batch
+            overwrite (bool): Replace an existing output that isn't an interrupted export
+        """
+        if format not in ("jsonl", "parquet"):
+            raise ValueError("Format must be either 'jsonl' or 'parquet'")
+        self.manager = manager
+        self.output_path = Path(output_path).expanduser()
+        self.format = format
+        self.compression = compression
+        self.workers = max(1, workers)
+        self.batch_records = batch_records
+        self.batch_bytes = batch_bytes
+        self.read_batch = read_batch
+        self.snapshot = snapshot
+        self.overwrite = overwrite
+        self._copies = {}
+        self.checkpoint_path = self.output_path.with_name(f"{self.output_path.name}.checkpoint.json")
+        if format == "parquet":
+            if compression:
+                raise ValueError("Parquet output is always zstd-compressed; compression only applies to JSONL")
+            self._sink = _ParquetSink(self.output_path)
+        else:
+            self._sink = _JsonlSink(self.output_path, compression)
+
+    def run(self, resume=True):
+        """
+        Export everything, resuming from the checkpoint if there is one
         
         Args:
-            project_name (str): Name of the project
+            resume (bool): Continue an interrupted export instead of starting over
             
         Returns:
-            list: List of composer IDs
+            dict: Output path, records and sources exported, and whether the export was resumed
         """
-        if project_name not in self.db_paths:
-            raise ValueError(f"Project '{project_name}' not found")
+        start = time.perf_counter()
+        checkpoint = self._load_checkpoint() if resume else None
+        if checkpoint is not None and not self._sink.can_resume(checkpoint["position"]):
+            logger.warning(f"Export output {self.output_path} no longer matches its checkpoint, starting over")
+            checkpoint = None
+        # Only the output of an interrupted export (which has a checkpoint) is replaced without asking
+        if checkpoint is None and self._sink.exists() and not (self.overwrite or self.checkpoint_path.exists()):
+            raise ValueError(f"{self.output_path} already exists; pass overwrite to replace it")
+        state = checkpoint["sources"] if checkpoint else {}
+        records = checkpoint["records"] if checkpoint else 0
+        sources = [name for name in self._sources() if not state.get(name, {}).get("done")]
+        token = current_cancel_token.get()
+        queue_ = queue.Queue(maxsize=self.workers * 64)
+        stop = threading.Event()
+        pending = {}
+        batch = []
+        batch_size = 0
         
+        def flush():
+            nonlocal batch, batch_size, records
+            if batch:
+                self._sink.write_batch(batch)
+                records += len(batch)
+            if batch or pending:
+                for name, progress in pending.items():
+                    state.setdefault(name, {}).update(progress)
+                self._save_checkpoint(self._sink.position, records, state)
+            pending.clear()
+            batch, batch_size = [], 0
+        
+        snapshot_dir = tempfile.TemporaryDirectory(prefix="cursor-db-export-") if self.snapshot else None
         try:
-            results = self.execute_query(
-                project_name, 
-                "ItemTable", 
-                "get_by_key", 
-                "composer.composerData"
-            )
-            
-            if results and len(results) > 0:
-                composer_data = results[0]["value"]
-                # Extract composer IDs from the data
-                composer_ids = []
-                if "allComposers" in composer_data:
-                    for composer in composer_data["allComposers"]:
-                        if "composerId" in composer:
-                            composer_ids.append(composer["composerId"])
-                return {
-                    "composer_ids": composer_ids,
-                    "full_data": composer_data
-                }
+            if snapshot_dir is not None:
+                self._copy_sources(sources, snapshot_dir.name)
+            self._sink.open(checkpoint["position"] if checkpoint else None)
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cursor-db-export") as executor:
+                try:
+                    for name in sources:
+                        executor.submit(contextvars.copy_context().run, self._read_source, name,
+                                        state.get(name, {}).get("after"), queue_, stop)
+                    remaining = len(sources)
+                    while remaining:
+                        if token is not None:
+                            token.check()
+                        name, after, item = queue_.get()
+                        if isinstance(item, BaseException):
+                            raise item
+                        if item is None:
+                            pending.setdefault(name, {})["done"] = True
+                            remaining -= 1
+                            continue
+                        batch.append(item)
+                        batch_size += len(item[1])
+                        pending.setdefault(name, {})["after"] = after
+                        if len(batch) >= self.batch_records or batch_size >= self.batch_bytes:
+                            flush()
+                    flush()
+                finally:
+                    # Unblock the readers before the executor waits for them
+                    stop.set()
+        finally:
+            self._sink.close()
+            if snapshot_dir is not None:
+                self._copies = {}
+                self.manager._close_unused_pools()
+                snapshot_dir.cleanup()
+        
+        self.checkpoint_path.unlink(missing_ok=True)
+        logger.info(f"Exported {records} records to {self.output_path}")
+        return {
+            "output": str(self.output_path),
+            "format": self.format,
+            "compression": self.compression,
+            "records": records,
+            "sources": len(state),
+            "resumed": checkpoint is not None,
+            "elapsed_s": round(time.perf_counter() - start, 3),
+        }
+
+    def _sources(self):
+        names = [f"chat:{workspace_id}" for workspace_id in sorted(self.manager._workspace_ids)]
+        if self.manager.global_db_path:
+            names.extend(["composers", "bubbles"])
+        return names
+
+    def _copy_sources(self, sources, directory):
+        """Take snapshot copies of the databases the remaining sources read from"""
+        paths = set()
+        for name in sources:
+            if name.startswith("chat:"):
+                project = self.manager._workspace_ids.get(name[len("chat:"):])
+                if project is not None:
+                    paths.add(self.manager.db_paths[project])
             else:
-                return {"error": "No composer data found for this project"}
-                
-        except Exception as e:
-            logger.error(f"Error retrieving composer IDs: {e}")
-            raise
-    
-    def get_composer_data(self, composer_id):
+                paths.add(self.manager.global_db_path)
+        for i, db_path in enumerate(sorted(paths)):
+            self._copies[db_path] = self.manager.snapshot_copy(db_path, Path(directory) / f"{i}.vscdb")
+
+    def _read_source(self, name, after, queue_, stop):
+        """Reader thread: put (source, position, (fields, raw JSON)) items on the queue, then (source, None, None)"""
+        def put(item):
+            while not stop.is_set():
+                try:
+                    queue_.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        try:
+            reader = self._read_chat(name[len("chat:"):], after) if name.startswith("chat:") else \
+                self._read_global(name, after)
+            for position, record in reader:
+                if not put((name, position, record)):
+                    return
+            put((name, None, None))
+        except BaseException as e:
+            put((name, None, e))
+
+    def _read_chat(self, workspace_id, after):
+        project = self.manager._workspace_ids.get(workspace_id)
+        if project is None:
+            return
+        db_path = self._copies.get(self.manager.db_paths[project], self.manager.db_paths[project])
+        after = -1 if after is None else after
+        while True:
+            with self.manager.connect(db_path) as conn:
+                rows = conn.execute(
+                    """
+                    SELECT j.key, json_extract(j.value, '$.tabId'), json(j.value)
+                    FROM ItemTable AS t, json_each(t.value, '$.tabs') AS j
+                    WHERE t.key = ? AND json_valid(t.value) AND j.key > ? LIMIT ?
+                    """,
+                    (CHAT_DATA_KEY, after, self.read_batch)
+                ).fetchall()
+            metrics.count("rows_scanned", len(rows))
+            for index, tab_id, data in rows:
+                metrics.count("bytes_read", len(data))
+                yield index, ({"kind": "chat_tab", "project": project, "workspace_id": workspace_id,
+                               "tab_id": tab_id or str(index)}, data)
+            if len(rows) < self.read_batch:
+                return
+            after = rows[-1][0]
+
+    def _read_global(self, name, after):
+        prefix = COMPOSER_KEY_PREFIX if name == "composers" else BUBBLE_KEY_PREFIX
+        lower, upper = key_prefix_range(prefix)
+        workspaces = self.manager.composer_workspace_map()
+        projects = dict(self.manager._workspace_ids)
+        db_path = self._copies.get(self.manager.global_db_path, self.manager.global_db_path)
+        after = after or lower
+        while True:
+            # Keyset batches keep each read short, so no read transaction is held for the whole export
+            with self.manager.connect(db_path) as conn:
+                rows = conn.execute(
+                    """
+                    SELECT key, json(value) FROM cursorDiskKV
+                    WHERE key > ? AND key < ? AND json_valid(value)
+                    ORDER BY key LIMIT ?
+                    """,
+                    (after, upper, self.read_batch)
+                ).fetchall()
+            metrics.count("rows_scanned", len(rows))
+            for key, data in rows:
+                metrics.count("bytes_read", len(data))
+                if name == "composers":
+                    composer_id, bubble_id = key[len(prefix):], None
+                else:
+                    composer_id, _, bubble_id = key[len(prefix):].partition(":")
+                workspace_id = workspaces.get(composer_id)
+                yield key, ({"kind": "composer" if bubble_id is None else "bubble",
+                             "project": projects.get(workspace_id), "workspace_id": workspace_id,
+                             "composer_id": composer_id, "bubble_id": bubble_id}, data)
+            if len(rows) < self.read_batch:
+                return
+            after = rows[-1][0]
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, "r") as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable export checkpoint {self.checkpoint_path}: {e}")
+            return None
+        if (checkpoint.get("version") != self.CHECKPOINT_VERSION or checkpoint.get("format") != self.format
+                or checkpoint.get("compression") != self.compression):
+            logger.warning(f"Export checkpoint {self.checkpoint_path} is for different settings, starting over")
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, position, records, state):
+        tmp_path = self.checkpoint_path.with_name(f"{self.checkpoint_path.name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": self.CHECKPOINT_VERSION, "format": self.format, "compression": self.compression,
+                       "position": position, "records": records, "sources": state}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+class DatabaseWatcher:
+    """
+    Background thread that detects changes to the project and global databases.
+
+    Databases are compared by database_signature, either on every poll interval or
+    as soon as the file system reports a write when the optional watchdog package
+    is installed. For a database that changed, only the resources whose underlying
+    values changed are reported: a project's chat or composer index, or individual
+    composers in global storage. New or removed workspaces report the project list.
+    """
+
+    def __init__(self, manager, on_change, interval=2.0):
+        """
+        Args:
+            manager (CursorDBManager): Manager whose databases are watched
+            on_change (callable): Called from the watcher thread with a set of changed resource URIs
+            interval (float): Seconds between polls
+        """
+        self.manager = manager
+        self.on_change = on_change
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+        self._watched_dirs = set()
+        self._signatures = {}
+        self._fingerprints = {}
+        self._storage_mtime = None
+        self._checked = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cursor-db-watcher", daemon=True)
+        self._thread.start()
+        if Observer is not None:
+            self._observer = Observer()
+            self._observer.start()
+            self._watch_dirs()
+            logger.info("Watching Cursor databases with file system notifications")
+        else:
+            logger.info(f"Watching Cursor databases by polling every {self.interval}s")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        self.check()  # Establish the baseline
+        while not self._stop.is_set():
+            woken = self._wake.wait(self.interval)
+            if self._stop.is_set():
+                break
+            if woken:
+                # Let a burst of writes settle before looking
+                time.sleep(0.1)
+            self._wake.clear()
+            try:
+                changed = self.check()
+                if changed:
+                    self.on_change(changed)
+            except Exception as e:
+                logger.error(f"Error checking databases for changes: {e}")
+
+    def _watch_dirs(self):
+        watcher = self
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if ".vscdb" in getattr(event, "src_path", "") or event.is_directory:
+                    watcher._wake.set()
+        
+        dirs = {str(Path(path).parent) for path in self._db_paths().values()}
+        if self.manager.cursor_path:
+            dirs.add(str(self.manager.cursor_path / "workspaceStorage"))
+        for directory in dirs - self._watched_dirs:
+            if os.path.isdir(directory):
+                self._observer.schedule(Handler(), directory, recursive=False)
+                self._watched_dirs.add(directory)
+
+    def _db_paths(self):
+        """Return resource URI prefix -> database path for everything being watched"""
+        targets = {f"cursor://projects/{name}": path for name, path in self.manager.db_paths.items()}
+        if self.manager.global_db_path:
+            targets["cursor://composers"] = self.manager.global_db_path
+        return targets
+
+    def check(self):
         """
-        Retrieve composer data from global storage
+        Compare the databases with the last check
         
-        Args:
-            composer_id (str): Composer ID
-            
         Returns:
-            dict: Composer data
+            set: URIs of resources that changed (empty on the first check)
         """
-        if not self.global_db_path:
-            raise ValueError("Global storage database not found")
+        first_check = not self._checked
+        self._checked = True
+        changed = set()
         
+        workspace_storage = self.manager.cursor_path / "workspaceStorage" if self.manager.cursor_path else None
         try:
-            conn = sqlite3.connect(self.global_db_path)
-            cursor = conn.cursor()
-            
-            key = f"composerData:{composer_id}"
-            cursor.execute("SELECT value FROM cursorDiskKV WHERE key = ?", (key,))
-            
-            row = cursor.fetchone()
-            conn.close()
-            
-            if row:
-                try:
-                    return {"composer_id": composer_id, "data": json.loads(row[0])}
-                except json.JSONDecodeError:
-                    return {"composer_id": composer_id, "data": row[0]}
-            else:
-                return {"error": f"No data found for composer ID: {composer_id}"}
-                
-        except sqlite3.Error as e:
-            logger.error(f"SQLite error: {e}")
-            raise
+            storage_mtime = os.stat(workspace_storage).st_mtime_ns if workspace_storage else None
+        except OSError:
+            storage_mtime = None
+        if storage_mtime != self._storage_mtime:
+            if self._storage_mtime is not None:
+                self.manager.refresh_db_paths()
+                changed.update({"cursor://projects", "cursor://projects/detailed"})
+                if self._observer is not None:
+                    self._watch_dirs()
+            self._storage_mtime = storage_mtime
+        
+        for uri_prefix, db_path in self._db_paths().items():
+            signature = database_signature(db_path)
+            if self._signatures.get(db_path) == signature:
+                continue
+            try:
+                if uri_prefix == "cursor://composers":
+                    fingerprints = self._composer_fingerprints(db_path)
+                else:
+                    fingerprints = self._project_fingerprints(db_path, uri_prefix)
+            except sqlite3.Error as e:
+                # Leave the signature alone so the next check tries again
+                logger.warning(f"Could not check {db_path} for changes: {e}")
+                continue
+            previous = self._fingerprints.get(db_path, {})
+            self._signatures[db_path] = signature
+            self._fingerprints[db_path] = fingerprints
+            if not first_check:
+                changed.update(uri for uri in set(previous) | set(fingerprints)
+                               if previous.get(uri) != fingerprints.get(uri))
+        return changed
+
+    def _project_fingerprints(self, db_path, uri_prefix):
+        with self.manager.connect(db_path) as conn:
+            rows = conn.execute(
+                "SELECT key, value FROM ItemTable WHERE key IN (?, ?)", (CHAT_DATA_KEY, COMPOSER_DATA_KEY)
+            ).fetchall()
+        uris = {CHAT_DATA_KEY: f"{uri_prefix}/chat", COMPOSER_DATA_KEY: f"{uri_prefix}/composers"}
+        return {
+            uris[key]: hashlib.blake2b(value if isinstance(value, bytes) else value.encode("utf-8")).hexdigest()
+            for key, value in rows
+        }
+
+    def _composer_fingerprints(self, db_path):
+        with self.manager.connect(db_path) as conn:
+            fingerprints = composer_fingerprints(conn)
+        return {f"cursor://composers/{composer_id}": fingerprint for composer_id, fingerprint in fingerprints.items()}
+
+def parse_args(argv=None):
+    """Parse the server's command line arguments, ignoring any meant for MCP itself"""
+    parser = argparse.ArgumentParser(description='Cursor IDE SQLite Database MCP Server')
+    parser.add_argument('--cursor-path', help='Path to Cursor User directory (e.g. ~/Library/Application Support/Cursor/User/)')
+    parser.add_argument('--project-dirs', nargs='+', help='List of additional Cursor project directories to scan')
+    parser.add_argument('--cache-mb', type=int, default=64, help='Memory budget in MB for decoded chat and composer values')
+    parser.add_argument('--workers', type=int, help='Maximum number of requests doing database work concurrently')
+    parser.add_argument('--watch-interval', type=float, default=2.0,
+                        help='Seconds between checks for database changes (0 disables change notifications)')
+    parser.add_argument('--metrics-file', help='Periodically write the metrics in Prometheus text format to this file')
+    parser.add_argument('--metrics-interval', type=float, default=15.0,
+                        help='Seconds between writes of --metrics-file')
+    parser.add_argument('--export', metavar='OUTPUT',
+                        help='Export all conversations to OUTPUT and exit instead of starting the server')
+    parser.add_argument('--export-format', choices=['jsonl', 'parquet'], default='jsonl', help='Format of --export')
+    parser.add_argument('--export-compression', choices=['zstd'], help='Compress --export JSONL output')
+    parser.add_argument('--export-workers', type=int, default=4, help='Databases read in parallel by --export')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='Start --export over instead of resuming from its checkpoint')
+    parser.add_argument('--export-snapshot', action='store_true',
+                        help='Export from point-in-time copies of the databases instead of the live files')
+    parser.add_argument('--export-overwrite', action='store_true',
+                        help='Let --export replace an existing file that is not an interrupted export')
+    parser.add_argument('--export-dir',
+                        help='Directory the export_conversations tool writes into (default: "exports" in the cache directory)')
+    parser.add_argument('--busy-timeout', type=float, default=5.0,
+                        help='Seconds a read waits on a database locked by Cursor before it is retried')
+    parser.add_argument('--transport', choices=['stdio', 'sse', 'streamable-http'], default='stdio',
+                        help='Serve one client over stdio, or many concurrent clients over SSE or streamable HTTP')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on with --transport sse/streamable-http')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on with --transport sse/streamable-http')
+    parser.add_argument('--client-concurrency', type=int,
+                        help='Maximum number of requests of one client session doing database work at once '
+                             '(default: unlimited over stdio, 4 over the network transports)')
+    parser.add_argument('--timeout', type=float, default=30.0,
+                        help='Seconds a request may run before its query is interrupted (0 disables the deadline)')
+    parser.add_argument('--tool-timeout', action='append', default=[], metavar='NAME=SECONDS',
+                        help='Deadline of one tool or resource, e.g. query_table=10 (0 disables it); repeatable')
+    parser.add_argument('--max-rows', type=int, default=10000,
+                        help='Maximum number of rows one query may return (0 disables the limit)')
+    parser.add_argument('--max-result-mb', type=float, default=64,
+                        help='Maximum MB of values one query may return (0 disables the limit)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile requests with cProfile and tracemalloc (can also be toggled with the set_profiling tool)')
+    parser.add_argument('--profile-dir', help='Directory for per-request .prof files (default: "profiles" in the cache directory)')
+    parser.add_argument('--profile-sample-rate', type=float, default=1.0, help='Share of requests to profile, 0 to 1')
+    parser.add_argument('--profile-threshold-ms', type=float, default=100.0,
+                        help='Record only profiled requests that take at least this many milliseconds')
+    parser.add_argument('--profile-operations', nargs='+', metavar='NAME',
+                        help='Tools or resources to profile, e.g. query_table resource:cursor://projects (default: all)')
+    parser.add_argument('--profile-memory', action=argparse.BooleanOptionalAction, default=True,
+                        help='Trace the allocations of profiled requests with tracemalloc')
+    
+    # Parse known args only, to avoid conflicts with MCP's own args
+    args, _ = parser.parse_known_args(argv)
+    if args.client_concurrency is None and args.transport != 'stdio':
+        args.client_concurrency = 4
+    tool_timeouts = {}
+    for value in args.tool_timeout:
+        name, _, seconds = value.partition('=')
+        try:
+            seconds = float(seconds)
+        except ValueError:
+            parser.error(f"--tool-timeout expects NAME=SECONDS, got '{value}'")
+        # Tools can be named without their "tool:" prefix
+        tool_timeouts[name if ':' in name else f'tool:{name}'] = seconds or None
+    args.tool_timeout = tool_timeouts
+    if not 0 <= args.profile_sample_rate <= 1:
+        parser.error("--profile-sample-rate must be between 0 and 1")
+    return args
+
+# Background task that discovers the Cursor projects after startup
+discovery = None
+
+# Whether the process-wide state (manager, worker pool, watcher) is set up
+server_running = False
+
+# Directory clients' exports are confined to, configured by --export-dir
+export_dir = None
 
-# Create an MCP server with lifespan support
 @asynccontextmanager
-async def app_lifespan(app: FastMCP) -> AsyncIterator[Dict[str, Any]]:
-    """Manage application lifecycle with context"""
+async def server_state(args):
+    """
+    Set up the state shared by every client session of this process and tear it down on exit
+    
+    That is the CursorDBManager with its connection pools and decoded value cache,
+    the worker pool, the database watcher and the metrics dump.
+    """
+    global db_manager, worker_pool, discovery, client_limiter, request_limits, profiler, export_dir, server_running
+    watcher = None
+    metrics_file = None
+    metrics_stop = threading.Event()
     try:
-        # Initialize the DB manager on startup
-        global db_manager
-        db_manager = CursorDBManager()
+        server_running = True
+        client_limiter = ClientConcurrencyLimiter(args.client_concurrency)
+        request_limits = RequestLimits(
+            timeout=args.timeout or None,
+            max_rows=args.max_rows or None,
+            max_bytes=int(args.max_result_mb * 1024 * 1024) or None,
+            deadlines=args.tool_timeout
+        )
+        export_dir = Path(args.export_dir).expanduser() if args.export_dir else None
+        profiler = CallProfiler(
+            directory=args.profile_dir,
+            enabled=args.profile,
+            sample_rate=args.profile_sample_rate,
+            threshold=args.profile_threshold_ms / 1000,
+            operations=args.profile_operations,
+            memory=args.profile_memory
+        )
         
-        # Parse command line arguments
-        parser = argparse.ArgumentParser(description='Cursor IDE SQLite Database MCP Server')
-        parser.add_argument('--cursor-path', help='Path to Cursor User directory (e.g. ~/Library/Application Support/Cursor/User/)')
-        parser.add_argument('--project-dirs', nargs='+', help='List of additional Cursor project directories to scan')
-        
-        # Parse known args only, to avoid conflicts with MCP's own args
-        args, _ = parser.parse_known_args()
-        
-        # Configure the DB manager with the Cursor path
-        if args.cursor_path:
-            db_manager.cursor_path = Path(args.cursor_path).expanduser().resolve()
-        
-        # Add explicitly specified project directories
-        if args.project_dirs:
-            for project_dir in args.project_dirs:
-                db_manager.add_project_dir(project_dir)
+        # Project discovery runs in the background so the MCP handshake doesn't wait for it
+        db_manager = CursorDBManager(
+            cursor_path=args.cursor_path,
+            project_dirs=args.project_dirs,
+            cache_max_bytes=args.cache_mb * 1024 * 1024,
+            discover=False,
+            busy_timeout=args.busy_timeout
+        )
+        worker_pool = WorkerPool(args.workers)
         
         # Log detected Cursor path
         if db_manager.cursor_path:
@@ -375,66 +4386,387 @@ async def app_lifespan(app: FastMCP) -> AsyncIterator[Dict[str, Any]]:
         else:
             logger.warning("No Cursor path specified or detected")
         
-        logger.info(f"Available projects: {list(db_manager.list_projects().keys())}")
+        # Watch the databases and notify subscribed clients of changed resources
+        if args.watch_interval > 0:
+            loop = asyncio.get_running_loop()
+            watcher = DatabaseWatcher(
+                db_manager,
+                lambda uris: asyncio.run_coroutine_threadsafe(subscriptions.notify(uris), loop),
+                interval=args.watch_interval
+            )
+        
+        async def discover():
+            start = time.perf_counter()
+            try:
+                await worker_pool.run(db_manager.refresh_db_paths)
+            except Exception as e:
+                logger.error(f"Error discovering Cursor projects: {e}")
+            logger.info(f"Discovered {len(db_manager.db_paths)} projects in {time.perf_counter() - start:.2f}s: "
+                        f"{list(db_manager.list_projects().keys())}")
+            # The watcher's baseline must be taken from the discovered projects
+            if watcher is not None:
+                watcher.start()
+        
+        discovery = asyncio.ensure_future(discover())
+        
+        # Dump the metrics for a Prometheus textfile collector
+        if args.metrics_file:
+            metrics_file = args.metrics_file
+            
+            def dump_metrics():
+                while not metrics_stop.wait(args.metrics_interval):
+                    metrics.write_prometheus_file(metrics_file, db_manager.value_cache)
+            
+            threading.Thread(target=dump_metrics, name="cursor-db-metrics", daemon=True).start()
         
+        yield
+    finally:
+        # Cleanup on shutdown
+        logger.info("Shutting down Cursor DB MCP server")
+        server_running = False
+        if discovery is not None and not discovery.done():
+            discovery.cancel()
+        if watcher is not None:
+            watcher.stop()
+        metrics_stop.set()
+        if metrics_file is not None:
+            metrics.write_prometheus_file(metrics_file, db_manager.value_cache)
+        if worker_pool is not None:
+            worker_pool.shutdown()
+        if db_manager is not None:
+            db_manager.close()
+
+# Create an MCP server with lifespan support
+@asynccontextmanager
+async def app_lifespan(app: FastMCP) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Manage application lifecycle with context
+    
+    FastMCP enters the lifespan once per client session. Over stdio the process
+    serves a single session, which sets up and tears down the shared state; the
+    network transports set it up once in serve_http() and every session uses it.
+    """
+    if server_running:
+        yield {}
+        return
+    async with server_state(parse_args()):
         # Yield empty context - we're using global db_manager instead
         yield {}
+
+async def serve_http(args):
+    """Serve many concurrent clients over SSE or streamable HTTP from one shared server state"""
+    import uvicorn
+    
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    if args.host not in ("127.0.0.1", "localhost", "::1"):
+        # FastMCP only configures DNS rebinding protection for loopback hosts, as it would for this host
+        mcp.settings.transport_security = None
+    app = mcp.sse_app() if args.transport == "sse" else mcp.streamable_http_app()
+    config = uvicorn.Config(app, host=args.host, port=args.port, log_level=mcp.settings.log_level.lower())
+    async with server_state(args):
+        logger.info(f"Serving {args.transport} on {args.host}:{args.port}")
+        await uvicorn.Server(config).serve()
+
+async def wait_for_discovery():
+    """Wait until the background discovery of Cursor projects started at startup has finished"""
+    if discovery is not None and not discovery.done():
+        # Shielded so a cancelled request doesn't cancel the discovery other requests wait on
+        await asyncio.shield(discovery)
+
+def current_session():
+    """Return the client session of the MCP request being handled, or None outside of a request"""
+    try:
+        return mcp._mcp_server.request_context.session
+    except LookupError:
+        return None
+
+def resolve_export_path(output_path):
+    """
+    Resolve an output path sent by a client inside the export directory
+    
+    Raises:
+        ValueError: If the path (after following symlinks) points outside of it
+    """
+    directory = export_dir or db_manager.cache_dir / "exports"
+    directory = Path(directory).expanduser().resolve()
+    path = (directory / Path(output_path).expanduser()).resolve()
+    if path == directory or not path.is_relative_to(directory):
+        raise ValueError(f"Exports can only be written inside the export directory {directory}")
+    return path
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run blocking database work for an MCP handler on the worker pool, once discovery has finished"""
+    global worker_pool
+    await wait_for_discovery()
+    if worker_pool is None:
+        worker_pool = WorkerPool()
+    async with client_limiter.slot(current_session()):
+        # The handler is the outermost operation of the request
+        operations = current_operations.get()
+        token = request_limits.token(operations[0] if operations else None)
+        call = current_profile.get()
+        if call is not None:
+            return await worker_pool.run_with_token(token, call.run, fn, *args, **kwargs)
+        return await worker_pool.run_with_token(token, fn, *args, **kwargs)
+
+async def iter_blocking(gen_fn, *args, **kwargs):
+    """Run a blocking generator on the worker pool and yield its items as they are produced"""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    
+    def produce():
+        token = current_cancel_token.get()
+        try:
+            for item in gen_fn(*args, **kwargs):
+                token.check()
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+    
+    producer = asyncio.ensure_future(run_blocking(produce))
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            yield item
+        # Re-raise anything the generator raised
+        await producer
     finally:
-        # Cleanup on shutdown (if needed)
-        logger.info("Shutting down Cursor DB MCP server")
+        if not producer.done():
+            producer.cancel()
+
+async def report_progress(ctx, progress, total=None):
+    """Send a progress notification if the client asked for them"""
+    if ctx is None:
+        return
+    try:
+        await ctx.report_progress(progress, total)
+    except ValueError:
+        # Not running inside an MCP request (e.g. the handler was called directly)
+        pass
 
 # Create the MCP server with lifespan
 mcp = FastMCP("Cursor DB Manager", lifespan=app_lifespan)
 
+class SubscriptionRegistry:
+    """Tracks which client sessions subscribed to which resource URIs"""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, session, uri):
+        with self._lock:
+            self._subscriptions.setdefault(session, set()).add(uri)
+
+    def unsubscribe(self, session, uri):
+        with self._lock:
+            uris = self._subscriptions.get(session)
+            if uris is not None:
+                uris.discard(uri)
+                if not uris:
+                    del self._subscriptions[session]
+
+    async def notify(self, changed_uris):
+        """Send resources/updated to every session subscribed to a changed resource"""
+        with self._lock:
+            subscriptions = [(session, set(uris)) for session, uris in self._subscriptions.items()]
+        for session, uris in subscriptions:
+            for uri in uris:
+                # A projected or compact view (".../fields/...", ".../compact") changes whenever its resource does
+                if any(uri in (changed, f"{changed}/compact") or uri.startswith(f"{changed}/fields/")
+                       for changed in changed_uris):
+                    try:
+                        await session.send_resource_updated(uri)
+                    except Exception as e:
+                        logger.info(f"Dropping subscriptions of a closed session: {e}")
+                        with self._lock:
+                            self._subscriptions.pop(session, None)
+                        break
+
+# Resource subscriptions, notified by the DatabaseWatcher
+subscriptions = SubscriptionRegistry()
+
+@mcp._mcp_server.subscribe_resource()
+async def subscribe_resource(uri) -> None:
+    subscriptions.subscribe(mcp._mcp_server.request_context.session, str(uri))
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe_resource(uri) -> None:
+    subscriptions.unsubscribe(mcp._mcp_server.request_context.session, str(uri))
+
+def _get_capabilities_with_subscribe(*args, _get_capabilities=mcp._mcp_server.get_capabilities, **kwargs):
+    # FastMCP always advertises subscribe=False; we support resource subscriptions
+    capabilities = _get_capabilities(*args, **kwargs)
+    if capabilities.resources is not None:
+        capabilities.resources.subscribe = True
+    return capabilities
+
+mcp._mcp_server.get_capabilities = _get_capabilities_with_subscribe
+
 # MCP Resources
 @mcp.resource("cursor://projects")
-def list_all_projects() -> Dict[str, str]:
+@instrumented("resource:cursor://projects")
+async def list_all_projects() -> Dict[str, str]:
     """List all available Cursor projects and their database paths"""
     global db_manager
+    await wait_for_discovery()
     return db_manager.list_projects(detailed=False)
 
 @mcp.resource("cursor://projects/detailed")
-def list_detailed_projects() -> Dict[str, Dict[str, Any]]:
+@instrumented("resource:cursor://projects/detailed")
+async def list_detailed_projects() -> Dict[str, Dict[str, Any]]:
     """List all available Cursor projects with detailed information"""
     global db_manager
+    await wait_for_discovery()
     return db_manager.list_projects(detailed=True)
 
 @mcp.resource("cursor://projects/{project_name}/chat")
-def get_project_chat_data(project_name: str) -> Dict[str, Any]:
+@instrumented("resource:cursor://projects/{project_name}/chat")
+async def get_project_chat_data(project_name: str) -> Dict[str, Any]:
     """Retrieve AI chat data from a specific Cursor project"""
     global db_manager
     try:
-        return db_manager.get_chat_data(project_name)
+        return await run_blocking(db_manager.get_chat_data, project_name)
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Error retrieving chat data: {str(e)}"}
+
+@mcp.resource("cursor://projects/{project_name}/chat/compact")
+@instrumented("resource:cursor://projects/{project_name}/chat/compact")
+async def get_project_chat_data_compact(project_name: str) -> Dict[str, Any]:
+    """A project's AI chat data in the compact encoding: empty fields dropped, repeated subtrees sent once by reference"""
+    global db_manager
+    try:
+        return await run_blocking(compact_response, await run_blocking(db_manager.get_chat_data, project_name))
     except ValueError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": f"Error retrieving chat data: {str(e)}"}
 
 @mcp.resource("cursor://projects/{project_name}/composers")
-def get_project_composer_ids(project_name: str) -> Dict[str, Any]:
+@instrumented("resource:cursor://projects/{project_name}/composers")
+async def get_project_composer_ids(project_name: str) -> Dict[str, Any]:
     """Retrieve composer IDs from a specific Cursor project"""
     global db_manager
     try:
-        return db_manager.get_composer_ids(project_name)
+        return await run_blocking(db_manager.get_composer_ids, project_name)
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Error retrieving composer data: {str(e)}"}
+
+@mcp.resource("cursor://projects/{project_name}/composers/fields/{fields}")
+@instrumented("resource:cursor://projects/{project_name}/composers/fields/{fields}")
+async def get_project_composer_fields(project_name: str, fields: str) -> Dict[str, Any]:
+    """Retrieve composer IDs and selected comma-separated JSON paths of a project's composer index"""
+    global db_manager
+    try:
+        return await run_blocking(db_manager.get_composer_ids, project_name, fields=JSONProjection(fields).fields)
     except ValueError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": f"Error retrieving composer data: {str(e)}"}
 
 @mcp.resource("cursor://composers/{composer_id}")
-def get_composer_data_resource(composer_id: str) -> Dict[str, Any]:
+@instrumented("resource:cursor://composers/{composer_id}")
+async def get_composer_data_resource(composer_id: str) -> Dict[str, Any]:
     """Retrieve composer data from global storage"""
     global db_manager
     try:
-        return db_manager.get_composer_data(composer_id)
+        return await run_blocking(db_manager.get_composer_data, composer_id)
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Error retrieving composer data: {str(e)}"}
+
+@mcp.resource("cursor://composers/{composer_id}/compact")
+@instrumented("resource:cursor://composers/{composer_id}/compact")
+async def get_composer_data_compact_resource(composer_id: str) -> Dict[str, Any]:
+    """Composer data in the compact encoding: empty fields dropped, repeated subtrees sent once by reference"""
+    global db_manager
+    try:
+        return await run_blocking(compact_response, await run_blocking(db_manager.get_composer_data, composer_id))
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Error retrieving composer data: {str(e)}"}
+
+@mcp.resource("cursor://composers/{composer_id}/fields/{fields}")
+@instrumented("resource:cursor://composers/{composer_id}/fields/{fields}")
+async def get_composer_fields_resource(composer_id: str, fields: str) -> Dict[str, Any]:
+    """Retrieve selected comma-separated JSON paths (e.g. name,conversation[*].text) of a composer"""
+    global db_manager
+    try:
+        return await run_blocking(db_manager.get_composer_data, composer_id, fields=JSONProjection(fields).fields)
     except ValueError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": f"Error retrieving composer data: {str(e)}"}
 
+@mcp.resource("cursor://metrics")
+async def get_metrics() -> Dict[str, Any]:
+    """Per-operation call counts, latency histograms, I/O counters and cache hit rates"""
+    global db_manager
+    return metrics.snapshot(db_manager.value_cache if db_manager is not None else None)
+
+@mcp.resource("cursor://metrics/prometheus", mime_type="text/plain")
+async def get_metrics_prometheus() -> str:
+    """The server's metrics in the Prometheus text exposition format"""
+    global db_manager
+    return metrics.prometheus_text(db_manager.value_cache if db_manager is not None else None)
+
+@mcp.resource("cursor://profiles")
+async def get_profiles() -> Dict[str, Any]:
+    """The slowest profiled requests with their time breakdown and top functions, and the largest allocators"""
+    return profiler.summary()
+
+@mcp.resource("cursor://stats")
+@instrumented("resource:cursor://stats")
+async def get_stats_resource() -> Dict[str, Any]:
+    """Conversation statistics: totals and per-project composer, chat tab, message and code block counts, models used, sizes and activity"""
+    global db_manager
+    try:
+        return await run_blocking(db_manager.get_stats)
+    except ValueError as e:
+        return {"error": str(e)}
+    except sqlite3.Error as e:
+        return {"error": f"Error reading statistics: {str(e)}"}
+
+@mcp.resource("cursor://stats/projects/{project_name}")
+@instrumented("resource:cursor://stats/projects/{project_name}")
+async def get_project_stats_resource(project_name: str) -> Dict[str, Any]:
+    """Statistics of one project, with per-composer and per-chat-tab aggregates"""
+    global db_manager
+    try:
+        return await run_blocking(db_manager.get_stats, project_name)
+    except ValueError as e:
+        return {"error": str(e)}
+    except sqlite3.Error as e:
+        return {"error": f"Error reading statistics: {str(e)}"}
+
+@mcp.resource("cursor://recent")
+@instrumented("resource:cursor://recent")
+async def get_recent_conversations_resource() -> List[Dict[str, Any]]:
+    """The 20 most recently updated composers and chat tabs across all projects, newest first"""
+    global db_manager
+    try:
+        return await run_blocking(db_manager.get_recent_conversations)
+    except sqlite3.Error as e:
+        return [{"error": f"Error reading recent conversations: {str(e)}"}]
+
 # MCP Tools
 @mcp.tool()
-def query_table(project_name: str, table_name: str, query_type: str, key: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+@instrumented("tool:query_table")
+async def query_table(project_name: str, table_name: str, query_type: str, key: Optional[str] = None, limit: int = 100,
+                paginate: bool = False, page_token: Optional[str] = None,
+                fields: Optional[List[str]] = None,
+                match: str = "substring", compact: bool = False,
+                max_string_length: Optional[int] = None) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
     """
     Query a specific table in a project's database
     
@@ -443,24 +4775,298 @@ def query_table(project_name: str, table_name: str, query_type: str, key: Option
         table_name: Either 'ItemTable' or 'cursorDiskKV'
         query_type: Type of query ('get_all', 'get_by_key', 'search_keys')
         key: Key to search for when using 'get_by_key' or 'search_keys'
+        limit: Maximum number of results to return (per page when paginating)
+        paginate: Return results ordered by key in pages of `limit` rows, with a next_page_token
+        page_token: next_page_token from a previous call, to fetch the following page
+        fields: JSON paths to return instead of whole values, e.g. ["allComposers[*].composerId"];
+            extracted inside SQLite so large values are never sent in full
+        match: How 'search_keys' matches key: 'substring' (anywhere, case-insensitive), 'prefix'
+            (fast range scan, e.g. "composerData:"), 'glob' (e.g. "bubbleId:*:a1?") or 'regex'
+        compact: Return {"data", "refs", "truncated", "size"} with empty fields dropped and repeated
+            subtrees and long strings sent once under "refs" as {"$ref": id}
+        max_string_length: With compact, cut longer strings; fetch the rest with fetch_truncated
+    
+    Returns:
+        List of query results, or {"results": [...], "next_page_token": ...} when paginating
+    """
+    global db_manager
+    if limit < 1:
+        return [{"error": "limit must be >= 1"}]
+    try:
+        if paginate or page_token:
+            result = await run_blocking(
+                db_manager.execute_query_page, project_name, table_name, query_type, key, limit, page_token, fields,
+                match
+            )
+        else:
+            result = await run_blocking(db_manager.execute_query, project_name, table_name, query_type, key, limit,
+                                        fields, match)
+        if compact:
+            return await run_blocking(compact_response, result, max_string_length)
+        return result
+    except ValueError as e:
+        return [{"error": str(e)}]
+    except sqlite3.Error as e:
+        return [{"error": f"Database error: {str(e)}"}]
+
+@mcp.tool()
+@instrumented("tool:search_conversations")
+async def search_conversations(query: str, project_name: Optional[str] = None, limit: int = 20) -> Dict[str, Any]:
+    """
+    Full-text search across the chat history and composer conversations of all projects
+    
+    Args:
+        query: Words to search for (SQLite FTS5 syntax such as "exact phrase", OR, NOT and prefix* is supported)
+        project_name: Optional project to restrict the search to
         limit: Maximum number of results to return
     
     Returns:
-        List of query results
+        Ranked matches with snippets, project names and composer IDs
+    """
+    global db_manager
+    if limit < 1:
+        return {"error": "limit must be >= 1"}
+    start = time.perf_counter()
+    try:
+        results = await run_blocking(db_manager.search_conversations, query, project_name, limit)
+    except ValueError as e:
+        return {"error": str(e)}
+    except (sqlite3.Error, RuntimeError) as e:
+        return {"error": f"Search error: {str(e)}"}
+    return {
+        "query": query,
+        "results": results,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+    }
+
+@mcp.tool()
+@instrumented("tool:recent_conversations")
+async def recent_conversations(limit: int = 20, since: Optional[Union[int, str]] = None,
+                               until: Optional[Union[int, str]] = None, kind: Optional[str] = None,
+                               project_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    List the most recently updated composers and chat tabs across all projects, newest first
+    
+    Args:
+        limit: Maximum number of conversations to return
+        since: Only conversations updated at or after this time (epoch milliseconds or ISO 8601, e.g. "2025-03-01")
+        until: Only conversations updated before this time; pass the last result's last_updated_at to page back
+        kind: 'composer' or 'chat_tab' to list only one kind
+        project_name: Optional project to restrict the timeline to
+    
+    Returns:
+        Conversations with their kind, ID (composer or tab ID), project, title, timestamps and message count
+    """
+    global db_manager
+    try:
+        results = await run_blocking(db_manager.get_recent_conversations, limit, since, until, kind, project_name)
+    except ValueError as e:
+        return {"error": str(e)}
+    except sqlite3.Error as e:
+        return {"error": f"Error reading recent conversations: {str(e)}"}
+    return {"results": results}
+
+@mcp.tool()
+@instrumented("tool:search_all_projects")
+async def search_all_projects(term: str, mode: str = "keys", table_name: str = "cursorDiskKV", limit: int = 20,
+                              match: str = "substring") -> Dict[str, Any]:
+    """
+    Search every project database and the global storage database at once
+    
+    Args:
+        term: Text to look for
+        mode: 'keys' to match keys (exact > prefix > substring), or 'content' to match inside values
+            (ranked by number of occurrences)
+        table_name: Either 'ItemTable' or 'cursorDiskKV'
+        limit: Number of results to return overall
+        match: How keys are matched: 'substring', 'prefix', 'glob' or 'regex'
+    
+    Returns:
+        Merged top results with their project, plus per-project timings and errors
+    """
+    global db_manager
+    if limit < 1:
+        return {"error": "limit must be >= 1"}
+    try:
+        return await run_blocking(db_manager.search_all_databases, term, mode, table_name, limit, match)
+    except ValueError as e:
+        return {"error": str(e)}
+
+@mcp.tool()
+@instrumented("tool:get_composers")
+async def get_composers(composer_ids: List[str], fields: Optional[List[str]] = None, ctx: Context = None) -> List[Dict[str, Any]]:
+    """
+    Retrieve many composers from global storage in one call
+    
+    Args:
+        composer_ids: Composer IDs, e.g. from cursor://projects/{project_name}/composers
+        fields: Optional JSON paths to return instead of the full composer data, e.g. ["name", "conversation[*].text"]
+    
+    Returns:
+        One result per composer ID, in the order requested
     """
     global db_manager
     try:
-        return db_manager.execute_query(project_name, table_name, query_type, key, limit)
+        by_id = {}
+        async for result in iter_blocking(db_manager.iter_composer_data, composer_ids, fields):
+            by_id[result["composer_id"]] = result
+            await report_progress(ctx, len(by_id), len(composer_ids))
+        return [by_id[composer_id] for composer_id in dict.fromkeys(composer_ids)]
     except ValueError as e:
         return [{"error": str(e)}]
     except sqlite3.Error as e:
         return [{"error": f"Database error: {str(e)}"}]
 
 @mcp.tool()
-def refresh_databases() -> Dict[str, Any]:
+@instrumented("tool:read_chat_messages")
+async def read_chat_messages(project_name: str, tab_id: Optional[str] = None, start: int = 0, limit: int = 50,
+                             max_bytes: int = DEFAULT_PAGE_BYTES, cursor: Optional[str] = None, compact: bool = False,
+                             max_string_length: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Page through a project's chat tabs, or through the bubbles of one chat tab
+    
+    Args:
+        project_name: Name of the project
+        tab_id: Tab to read bubbles from; without it, returns a page of tab summaries
+        start: Index of the first tab or bubble to return
+        limit: Maximum number of tabs or bubbles per page
+        max_bytes: Approximate budget of encoded JSON per page (at least one bubble is always returned)
+        cursor: next_cursor from a previous call, to fetch the following page
+        compact: Return {"data", "refs", "truncated", "size"} with empty fields dropped and repeated
+            subtrees and long strings sent once under "refs" as {"$ref": id}
+        max_string_length: With compact, cut longer strings; fetch the rest with fetch_truncated
+    
+    Returns:
+        {"total": ..., "start": ..., "tabs" or "messages": [...], "next_cursor": ...}
+    """
+    global db_manager
+    try:
+        result = await run_blocking(db_manager.read_chat_messages, project_name, tab_id, start, limit, max_bytes, cursor)
+        if compact:
+            return await run_blocking(compact_response, result, max_string_length)
+        return result
+    except ValueError as e:
+        return {"error": str(e)}
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {str(e)}"}
+
+@mcp.tool()
+@instrumented("tool:read_composer_messages")
+async def read_composer_messages(composer_id: str, start: int = 0, limit: int = 50, max_bytes: int = DEFAULT_PAGE_BYTES,
+                                 cursor: Optional[str] = None, compact: bool = False,
+                                 max_string_length: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Page through the messages of one composer conversation
+    
+    Args:
+        composer_id: Composer ID
+        start: Index of the first message to return
+        limit: Maximum number of messages per page
+        max_bytes: Approximate budget of encoded JSON per page (at least one message is always returned)
+        cursor: next_cursor from a previous call, to fetch the following page
+        compact: Return {"data", "refs", "truncated", "size"} with empty fields dropped and repeated
+            subtrees and long strings sent once under "refs" as {"$ref": id}
+        max_string_length: With compact, cut longer strings; fetch the rest with fetch_truncated
+    
+    Returns:
+        {"composer_id": ..., "total": ..., "start": ..., "messages": [...], "next_cursor": ...}
+    """
+    global db_manager
+    try:
+        result = await run_blocking(db_manager.read_composer_messages, composer_id, start, limit, max_bytes, cursor)
+        if compact:
+            return await run_blocking(compact_response, result, max_string_length)
+        return result
+    except ValueError as e:
+        return {"error": str(e)}
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {str(e)}"}
+
+@mcp.tool()
+@instrumented("tool:fetch_truncated")
+async def fetch_truncated(handle: str, offset: int = 0, length: int = 20000) -> Dict[str, Any]:
+    """
+    Fetch the full text of a string that a compact response cut short
+    
+    Args:
+        handle: Handle named at the end of the truncated string (also listed under "truncated")
+        offset: Character offset to start from
+        length: Maximum number of characters to return
+    
+    Returns:
+        {"handle": ..., "offset": ..., "text": ..., "total_length": ..., "remaining": ...}
+    """
+    found, value = truncated_strings.get(handle, None)
+    if not found:
+        return {"error": f"Unknown or expired handle '{handle}'; repeat the compact request to get a new one"}
+    if offset < 0 or length < 1:
+        return {"error": "offset must be >= 0 and length >= 1"}
+    text = value[offset:offset + length]
+    return {
+        "handle": handle,
+        "offset": offset,
+        "text": text,
+        "total_length": len(value),
+        "remaining": max(len(value) - offset - len(text), 0),
+    }
+
+@mcp.tool()
+async def set_profiling(enabled: bool, sample_rate: Optional[float] = None, threshold_ms: Optional[float] = None,
+                        operations: Optional[List[str]] = None, memory: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Turn per-request profiling on or off; results are listed by the cursor://profiles resource
+    
+    Args:
+        enabled: Whether to profile requests
+        sample_rate: Share of requests to profile, 0 to 1
+        threshold_ms: Record only requests that take at least this many milliseconds
+        operations: Tools or resources to profile, e.g. ["query_table", "resource:cursor://composers/{composer_id}"]; [] for all
+        memory: Whether to trace allocations with tracemalloc
+    
+    Returns:
+        The profiling settings now in effect
+    """
+    try:
+        return profiler.configure(enabled, sample_rate, None if threshold_ms is None else threshold_ms / 1000,
+                                  operations, memory)
+    except ValueError as e:
+        return {"error": str(e)}
+
+@mcp.tool()
+@instrumented("tool:export_conversations")
+async def export_conversations(output_path: str, format: str = "jsonl", compression: Optional[str] = None,
+                               resume: bool = True, snapshot: bool = False, overwrite: bool = False) -> Dict[str, Any]:
+    """
+    Export every project's chat tabs and every composer and bubble from global storage to a file
+    
+    Args:
+        output_path: Path of the JSONL file (or of the directory of part files for Parquet) to write,
+            relative to the server's export directory (--export-dir)
+        format: 'jsonl' (one record per line) or 'parquet' (requires pyarrow)
+        compression: 'zstd' to compress JSONL output (requires zstandard)
+        resume: Continue an interrupted export from its checkpoint instead of starting over
+        snapshot: Export from consistent point-in-time copies of the databases, taken with the SQLite backup API
+        overwrite: Replace an existing file that isn't an interrupted export
+    
+    Returns:
+        Summary with the number of records written
+    """
+    global db_manager
+    try:
+        output_path = resolve_export_path(output_path)
+        return await run_blocking(db_manager.export_conversations, output_path, format, compression, resume,
+                                  snapshot=snapshot, overwrite=overwrite)
+    except ValueError as e:
+        return {"error": str(e)}
+    except (sqlite3.Error, OSError) as e:
+        return {"error": f"Export error: {str(e)}"}
+
+@mcp.tool()
+@instrumented("tool:refresh_databases")
+async def refresh_databases() -> Dict[str, Any]:
     """Refresh the list of database paths"""
     global db_manager
-    db_manager.refresh_db_paths()
+    await run_blocking(db_manager.refresh_db_paths)
     return {
         "message": "Database paths refreshed",
         "projects": db_manager.list_projects()
@@ -515,4 +5121,27 @@ def analyze_chat_data(project_name: str) -> str:
     - Common themes or questions
     
     Would you like me to focus on any specific aspect of the chat data?
-    """
\ No newline at end of file
+    """
+
+def main():
+    args = parse_args()
+    if args.export:
+        manager = CursorDBManager(cursor_path=args.cursor_path, project_dirs=args.project_dirs,
+                                  cache_max_bytes=args.cache_mb * 1024 * 1024, busy_timeout=args.busy_timeout)
+        try:
+            summary = manager.export_conversations(args.export, args.export_format, args.export_compression,
+                                                   resume=not args.no_resume, workers=args.export_workers,
+                                                   snapshot=args.export_snapshot, overwrite=args.export_overwrite)
+        except ValueError as e:
+            sys.exit(f"Export failed: {e}")
+        finally:
+            manager.close()
+        print(json.dumps(summary, indent=2))
+        return
+    if args.transport != "stdio":
+        asyncio.run(serve_http(args))
+        return
+    mcp.run()
+
+if __name__ == "__main__":
+    main()
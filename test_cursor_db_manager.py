@@ -0,0 +1,1236 @@
+#!/usr/bin/env python3
+"""
+Unit tests for CursorDBManager.
+These tests build small fake Cursor user directories in a temporary folder and
+exercise the manager directly, without starting the MCP server.
+"""
+
+import importlib.util
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+SERVER_PATH = Path(__file__).parent / "cursor-db-mcp-server.py"
+sys.path.insert(0, str(Path(__file__).parent / "benchmarks"))
+
+
+def load_server_module():
+    """Import cursor-db-mcp-server.py as a module (its file name isn't importable directly)"""
+    spec = importlib.util.spec_from_file_location("cursor_db_mcp_server", SERVER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+server = load_server_module()
+
+
+def write_state_db(db_path, item_table=None, disk_kv=None):
+    """Create a state.vscdb with the given ItemTable and cursorDiskKV contents"""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS ItemTable (key TEXT UNIQUE ON CONFLICT REPLACE, value BLOB)")
+    conn.execute("CREATE TABLE IF NOT EXISTS cursorDiskKV (key TEXT UNIQUE ON CONFLICT REPLACE, value BLOB)")
+    for table, values in (("ItemTable", item_table), ("cursorDiskKV", disk_kv)):
+        for key, value in (values or {}).items():
+            if not isinstance(value, str):
+                value = json.dumps(value)
+            conn.execute(f"INSERT INTO {table} (key, value) VALUES (?, ?)", (key, value))
+    conn.commit()
+    conn.close()
+
+
+def make_cursor_dir(root, projects=None, composers=None):
+    """
+    Build a fake Cursor User directory.
+
+    Args:
+        root (Path): Directory to create the layout in
+        projects (dict): Workspace ID -> (folder name, ItemTable contents)
+        composers (dict): Composer ID -> composer data stored in the global cursorDiskKV
+    """
+    for workspace_id, (folder, items) in (projects or {}).items():
+        workspace_dir = root / "workspaceStorage" / workspace_id
+        write_state_db(workspace_dir / "state.vscdb", item_table=items)
+        (workspace_dir / "workspace.json").write_text(json.dumps({"folder": f"file:///code/{folder}"}))
+    write_state_db(
+        root / "globalStorage" / "state.vscdb",
+        disk_kv={f"composerData:{cid}": data for cid, data in (composers or {}).items()},
+    )
+    return root
+
+
+CHAT_KEY = "workbench.panel.aichat.view.aichat.chatdata"
+
+
+@pytest.fixture
+def cursor_dir(tmp_path):
+    return make_cursor_dir(
+        tmp_path / "User",
+        projects={
+            "ws1": ("alpha", {
+                CHAT_KEY: {"tabs": [{"tabId": "t1", "chatTitle": "Hello", "bubbles": [{"type": "user", "text": "hi"}]}]},
+                "composer.composerData": {"allComposers": [{"composerId": "c1"}, {"composerId": "c2"}]},
+                "other.setting": "plain text",
+            }),
+        },
+        composers={
+            "c1": {"composerId": "c1", "name": "First", "conversation": [{"type": 1, "text": "question"}]},
+            "c2": {"composerId": "c2", "name": "Second", "conversation": []},
+        },
+    )
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def manager(cursor_dir, cache_dir):
+    manager = server.CursorDBManager(cursor_path=cursor_dir, cache_dir=cache_dir)
+    yield manager
+    manager.close()
+
+
+def test_detects_projects_and_global_db(manager, cursor_dir):
+    assert list(manager.list_projects()) == ["alpha"]
+    assert manager.global_db_path == str(cursor_dir / "globalStorage" / "state.vscdb")
+
+
+def test_connections_are_pooled_and_read_only(manager):
+    db_path = manager.db_paths["alpha"]
+    with manager.connect(db_path) as first:
+        pass
+    with manager.connect(db_path) as second:
+        assert second is first
+        with pytest.raises(sqlite3.OperationalError):
+            second.execute("DELETE FROM ItemTable")
+
+
+def test_pool_recycles_connections_when_file_is_replaced(manager, tmp_path):
+    db_path = Path(manager.db_paths["alpha"])
+    assert manager.get_chat_data("alpha")["tabs"][0]["chatTitle"] == "Hello"
+
+    replacement = tmp_path / "replacement.vscdb"
+    write_state_db(replacement, item_table={CHAT_KEY: {"tabs": [{"tabId": "t2", "chatTitle": "Replaced"}]}})
+    os.replace(replacement, db_path)
+
+    assert manager.get_chat_data("alpha")["tabs"][0]["chatTitle"] == "Replaced"
+
+
+def test_pool_is_shared_across_threads(manager):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: manager.get_composer_data("c1"), range(50)))
+    assert all(r["data"]["name"] == "First" for r in results)
+
+
+def test_query_types(manager, monkeypatch):
+    import asyncio
+
+    assert manager.execute_query("alpha", "ItemTable", "get_by_key", "other.setting") == [
+        {"key": "other.setting", "value": "plain text"}
+    ]
+    assert {r["key"] for r in manager.execute_query("alpha", "ItemTable", "search_keys", "composer")} == {
+        "composer.composerData"
+    }
+    with pytest.raises(ValueError):
+        manager.execute_query("missing", "ItemTable", "get_all")
+
+    monkeypatch.setattr(server, "db_manager", manager)
+    for kwargs in ({"paginate": True}, {"query_type": "search_keys", "key": "*", "match": "glob"}):
+        kwargs = {"query_type": "get_all", **kwargs}
+        assert asyncio.run(server.query_table("alpha", "ItemTable", limit=0, **kwargs)) == [{"error": "limit must be >= 1"}]
+
+
+def test_decoded_values_are_cached_until_the_database_changes(manager):
+    first = manager.get_composer_data("c1")
+    second = manager.get_composer_data("c1")
+    assert second["data"] is first["data"]
+    assert manager.value_cache.hits == 1
+
+    conn = sqlite3.connect(manager.global_db_path)
+    conn.execute(
+        "UPDATE cursorDiskKV SET value = ? WHERE key = 'composerData:c1'",
+        (json.dumps({"composerId": "c1", "name": "Renamed", "conversation": []}),),
+    )
+    conn.commit()
+    conn.close()
+
+    assert manager.get_composer_data("c1")["data"]["name"] == "Renamed"
+
+
+def test_decoded_value_cache_respects_memory_budget():
+    cache = server.DecodedValueCache(max_bytes=100)
+    cache.put(("db", "ItemTable", "a"), "sig", "A", 60)
+    cache.put(("db", "ItemTable", "b"), "sig", "B", 60)
+    assert cache.get(("db", "ItemTable", "a"), "sig") == (False, None)
+    assert cache.get(("db", "ItemTable", "b"), "sig") == (True, "B")
+    assert cache.get(("db", "ItemTable", "b"), "other-sig") == (False, None)
+    assert cache.stats()["bytes"] == 0
+
+
+def test_duplicate_folder_names_are_keyed_by_workspace_id(tmp_path, cache_dir):
+    root = make_cursor_dir(tmp_path / "User", projects={
+        "ws1": ("alpha", {}),
+        "ws2": ("alpha", {}),
+        "ws3": ("beta", {}),
+    })
+    manager = server.CursorDBManager(cursor_path=root, cache_dir=cache_dir)
+    assert sorted(manager.list_projects()) == ["alpha@ws1", "alpha@ws2", "beta"]
+    assert manager.resolve_project("ws2") == "alpha@ws2"
+    with pytest.raises(ValueError, match="ambiguous"):
+        manager.resolve_project("alpha")
+    manager.close()
+
+
+def test_discovery_manifest_only_rereads_changed_workspaces(manager, cursor_dir, monkeypatch):
+    scanned = []
+    original_scan = manager._scan_workspace
+    monkeypatch.setattr(manager, "_scan_workspace", lambda d: scanned.append(d.name) or original_scan(d))
+
+    manager.refresh_db_paths()
+    assert scanned == []
+    assert list(manager.list_projects()) == ["alpha"]
+
+    make_cursor_dir(cursor_dir, projects={"ws2": ("beta", {})})
+    manager.refresh_db_paths()
+    assert scanned == ["ws2"]
+    assert sorted(manager.list_projects()) == ["alpha", "beta"]
+
+
+def test_search_conversations_indexes_chats_and_composers(manager):
+    results = manager.search_conversations("question")
+    assert [(r["kind"], r["composer_id"], r["project"]) for r in results] == [("composer", "c1", "alpha")]
+    assert "[question]" in results[0]["snippet"]
+
+    assert [r["tab_id"] for r in manager.search_conversations("hi", project_name="alpha")] == ["t1"]
+    assert manager.search_conversations('unbalanced "quote') == []
+    with pytest.raises(ValueError, match="limit"):
+        manager.search_conversations("question", limit=-1)
+
+
+def test_searches_do_not_wait_for_an_index_update(manager, monkeypatch):
+    import asyncio
+
+    monkeypatch.setattr(server, "db_manager", manager)
+    assert asyncio.run(server.search_conversations("hi", limit=0)) == {"error": "limit must be >= 1"}
+
+    # A search arriving while another thread rebuilds the index answers from what is committed
+    index = manager.get_search_index()
+    index_composers = index._index_composers
+    started, release = threading.Event(), threading.Event()
+
+    def blocked_index_composers(*args):
+        started.set()
+        release.wait(5)
+        return index_composers(*args)
+
+    monkeypatch.setattr(index, "_index_composers", blocked_index_composers)
+    updater = threading.Thread(target=manager.search_conversations, args=("question",))
+    updater.start()
+    try:
+        assert started.wait(5)
+        start = time.monotonic()
+        assert [r["tab_id"] for r in manager.search_conversations("hi")] == ["t1"]
+        assert manager.search_conversations("question") == []
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+        updater.join()
+    assert [r["composer_id"] for r in manager.search_conversations("question")] == ["c1"]
+
+
+def test_search_index_updates_incrementally(manager, monkeypatch):
+    index = manager.get_search_index()
+    manager.search_conversations("question")
+
+    calls = []
+    monkeypatch.setattr(index, "_index_composers", lambda m: calls.append("composers"))
+    manager.search_conversations("question")
+    assert calls == []
+
+    conn = sqlite3.connect(manager.global_db_path)
+    conn.execute(
+        "INSERT INTO cursorDiskKV VALUES (?, ?)",
+        ("composerData:c3", json.dumps({"composerId": "c3", "conversation": [{"type": 1, "text": "zebra"}]})),
+    )
+    conn.commit()
+    conn.close()
+    monkeypatch.undo()
+
+    assert [r["composer_id"] for r in manager.search_conversations("zebra")] == ["c3"]
+
+
+def test_search_index_retries_failed_chats_and_only_rechecks_ownership(manager, cursor_dir, monkeypatch):
+    manager.search_conversations("question")
+    scans = []
+    fingerprints = server.composer_fingerprints
+    monkeypatch.setattr(server, "composer_fingerprints", lambda conn: scans.append(1) or fingerprints(conn))
+
+    # A chat that fails to index is retried on the next update, even though its database didn't change again
+    conn = sqlite3.connect(manager.db_paths["alpha"])
+    conn.execute("UPDATE ItemTable SET value = ? WHERE key = ?", (json.dumps({"tabs": [
+        {"tabId": "t2", "chatTitle": "Zoo", "bubbles": [{"type": "user", "text": "walrus"}]}]}), CHAT_KEY))
+    conn.execute("UPDATE ItemTable SET value = ? WHERE key = 'composer.composerData'",
+                 (json.dumps({"allComposers": [{"composerId": "c2"}]}),))
+    conn.commit()
+    conn.close()
+    get_value = manager.get_value
+    failures = []
+
+    def flaky_get_value(db_path, table, key):
+        if key == CHAT_KEY and not failures:
+            failures.append(key)
+            raise sqlite3.OperationalError("disk I/O error")
+        return get_value(db_path, table, key)
+
+    monkeypatch.setattr(manager, "get_value", flaky_get_value)
+    assert manager.search_conversations("walrus") == []
+    assert [r["tab_id"] for r in manager.search_conversations("walrus")] == ["t2"]
+
+    # Moving a composer to another workspace re-indexes just its owner, without fingerprinting global storage
+    make_cursor_dir(cursor_dir, projects={"ws2": ("beta", {"composer.composerData": {"allComposers": [{"composerId": "c1"}]}})})
+    manager.refresh_db_paths()
+    assert [r["project"] for r in manager.search_conversations("question")] == ["beta"]
+    assert scans == []
+
+
+def test_search_index_build_outlives_deadlines_and_keeps_partial_progress(tmp_path, cache_dir, monkeypatch):
+    import asyncio
+    from synthetic_cursor import generate_cursor_dir
+
+    summary = generate_cursor_dir(tmp_path / "User", projects=2, composers=12, composer_kb=1, seed=5)
+    manager = server.CursorDBManager(cursor_path=summary["root"], cache_dir=cache_dir)
+    monkeypatch.setattr(server.ConversationSearchIndex, "COMMIT_BATCH", 5)
+    from_json = server.ComposerConversation.from_json
+    decoded = []
+
+    def slow_from_json(raw):
+        decoded.append(1)
+        if len(decoded) == 8:
+            raise server.QueryCancelled("Request was cancelled")
+        time.sleep(0.03)
+        return from_json(raw)
+
+    monkeypatch.setattr(server.ComposerConversation, "from_json", staticmethod(slow_from_json))
+
+    async def search(**limits):
+        pool = server.WorkerPool(max_workers=1)
+        try:
+            return await pool.run_with_token(server.CancelToken(**limits), manager.search_conversations, "function")
+        finally:
+            pool.shutdown()
+
+    # A cancelled build keeps the batches it committed, and the next one picks up from there
+    with pytest.raises(server.QueryCancelled):
+        asyncio.run(search())
+    composer_docs = "SELECT count(*) FROM documents WHERE doc_key LIKE 'composer:%'"
+    assert manager.get_search_index()._conn.execute(composer_docs).fetchone()[0] == 5
+
+    # Building takes longer than the request's deadline, which doesn't apply to it
+    decoded.clear()
+    assert asyncio.run(search(timeout=0.1))
+    assert len(decoded) == 7
+    assert manager.get_search_index()._conn.execute(composer_docs).fetchone()[0] == 12
+    manager.close()
+
+
+def test_keyset_pagination_walks_all_rows(tmp_path, cache_dir):
+    items = {f"key.{i:03d}": {"i": i} for i in range(25)}
+    root = make_cursor_dir(tmp_path / "User", projects={"ws1": ("alpha", items)})
+    manager = server.CursorDBManager(cursor_path=root, cache_dir=cache_dir)
+
+    seen = []
+    token = None
+    while True:
+        page = manager.execute_query_page("alpha", "ItemTable", "search_keys", "key.", limit=10, page_token=token)
+        assert len(page["results"]) <= 10
+        seen.extend(r["key"] for r in page["results"])
+        token = page["next_page_token"]
+        if token is None:
+            break
+    assert seen == sorted(items)
+
+    with pytest.raises(ValueError, match="different query"):
+        first = manager.execute_query_page("alpha", "ItemTable", "get_all", limit=5)
+        manager.execute_query_page("alpha", "ItemTable", "search_keys", "key.", page_token=first["next_page_token"])
+    with pytest.raises(ValueError, match="limit"):
+        manager.execute_query_page("alpha", "ItemTable", "search_keys", "key.*", limit=0, match="glob")
+    manager.close()
+
+
+def test_json_path_projection(manager):
+    results = manager.execute_query(
+        "alpha", "ItemTable", "get_all", fields=["allComposers[*].composerId", "$.tabs[0].chatTitle"]
+    )
+    values = {r["key"]: r["value"] for r in results}
+    assert values["composer.composerData"] == {"allComposers[*].composerId": ["c1", "c2"], "$.tabs[0].chatTitle": None}
+    assert values[CHAT_KEY]["$.tabs[0].chatTitle"] == "Hello"
+    assert values["other.setting"] == {"allComposers[*].composerId": None, "$.tabs[0].chatTitle": None}
+
+    assert manager.get_composer_data("c1", fields=["name", "conversation[*].text"]) == {
+        "composer_id": "c1", "data": {"name": "First", "conversation[*].text": ["question"]}
+    }
+    assert manager.get_composer_ids("alpha", fields=["allComposers[0]"]) == {
+        "composer_ids": ["c1", "c2"], "fields": {"allComposers[0]": {"composerId": "c1"}}
+    }
+    with pytest.raises(ValueError):
+        server.JSONProjection(["a[*].b[*].c"])
+
+
+def test_worker_pool_cancellation_interrupts_sqlite(manager):
+    import asyncio
+    import threading
+
+    started = threading.Event()
+    outcome = []
+
+    def slow_query():
+        try:
+            with manager.connect(manager.global_db_path) as conn:
+                started.set()
+                conn.execute(
+                    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+                ).fetchone()
+        except server.QueryCancelled:
+            outcome.append("cancelled")
+            raise
+
+    async def run():
+        pool = server.WorkerPool(max_workers=2)
+        task = asyncio.ensure_future(pool.run(slow_query))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        # Other requests still get served while the slow one is running
+        assert (await pool.run(manager.get_composer_data, "c1"))["data"]["name"] == "First"
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        pool.shutdown()
+
+    asyncio.run(run())
+    deadline = time.monotonic() + 5
+    while not outcome and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert outcome == ["cancelled"]
+
+
+def test_search_all_databases_merges_top_k(tmp_path, cache_dir):
+    root = make_cursor_dir(
+        tmp_path / "User",
+        projects={
+            "ws1": ("alpha", {"theme": "dark", "theme.color": "blue blue", "other": "x"}),
+            "ws2": ("beta", {"my.theme": "blue"}),
+        },
+    )
+    manager = server.CursorDBManager(cursor_path=root, cache_dir=cache_dir)
+
+    found = manager.search_all_databases("theme", mode="keys", table_name="ItemTable", limit=2)
+    assert [(r["project"], r["key"], r["score"]) for r in found["results"]] == [
+        ("alpha", "theme", 3), ("alpha", "theme.color", 2)
+    ]
+    assert set(found["timings_ms"]) == {"alpha", "beta", server.GLOBAL_DB_NAME}
+
+    found = manager.search_all_databases("blue", mode="content", table_name="ItemTable", limit=5)
+    assert [(r["project"], r["key"]) for r in found["results"]] == [("alpha", "theme.color"), ("beta", "my.theme")]
+
+    os.remove(manager.db_paths["beta"])
+    found = manager.search_all_databases("blue", mode="content", table_name="ItemTable")
+    assert list(found["errors"]) == ["beta"]
+    assert [r["project"] for r in found["results"]] == ["alpha"]
+    for limit in (0, -1):
+        with pytest.raises(ValueError, match="limit"):
+            manager.search_all_databases("blue", limit=limit)
+    manager.close()
+
+
+def test_batched_composer_retrieval(manager):
+    results = manager.get_composers_batch(["c2", "missing", "c1", "c2"])
+    assert [r["composer_id"] for r in results] == ["c2", "missing", "c1"]
+    assert results[0]["data"]["name"] == "Second"
+    assert "error" in results[1]
+
+    # Decoded composers go into the value cache and are served from it next time
+    hits = manager.value_cache.hits
+    assert manager.get_composer_data("c1")["data"]["name"] == "First"
+    assert manager.value_cache.hits == hits + 1
+
+    assert manager.get_composers_batch(["c1"], fields=["name"]) == [{"composer_id": "c1", "data": {"name": "First"}}]
+
+
+def test_get_composers_tool_streams_from_worker_pool(manager):
+    import asyncio
+
+    server.db_manager = manager
+    try:
+        results = asyncio.run(server.get_composers(["c1", "c2"], fields=["name"]))
+    finally:
+        server.db_manager = None
+    assert [r["data"]["name"] for r in results] == ["First", "Second"]
+
+
+def test_database_watcher_reports_only_changed_resources(manager, cursor_dir):
+    watcher = server.DatabaseWatcher(manager, on_change=None)
+    assert watcher.check() == set()
+    assert watcher.check() == set()
+
+    conn = sqlite3.connect(manager.global_db_path)
+    conn.execute("UPDATE cursorDiskKV SET value = ? WHERE key = 'composerData:c2'",
+                 (json.dumps({"composerId": "c2", "name": "Second", "lastUpdatedAt": 2}),))
+    conn.commit()
+    conn.close()
+    conn = sqlite3.connect(manager.db_paths["alpha"])
+    conn.execute("UPDATE ItemTable SET value = '{\"tabs\": []}' WHERE key = ?", (CHAT_KEY,))
+    conn.execute("UPDATE ItemTable SET value = 'changed' WHERE key = 'other.setting'")
+    conn.commit()
+    conn.close()
+
+    assert watcher.check() == {"cursor://composers/c2", "cursor://projects/alpha/chat"}
+
+    # A change that couldn't be read (e.g. while Cursor holds a lock) is reported by the next check
+    conn = sqlite3.connect(manager.db_paths["alpha"])
+    conn.execute("UPDATE ItemTable SET value = '{\"tabs\": [{}]}' WHERE key = ?", (CHAT_KEY,))
+    conn.commit()
+    conn.close()
+    project_fingerprints = watcher._project_fingerprints
+
+    def busy(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    watcher._project_fingerprints = busy
+    assert watcher.check() == set()
+    watcher._project_fingerprints = project_fingerprints
+    assert watcher.check() == {"cursor://projects/alpha/chat"}
+
+    make_cursor_dir(cursor_dir, projects={"ws2": ("beta", {})})
+    assert watcher.check() == {"cursor://projects", "cursor://projects/detailed"}
+
+
+def test_subscription_registry_notifies_matching_sessions():
+    import asyncio
+
+    class FakeSession:
+        def __init__(self):
+            self.sent = []
+
+        async def send_resource_updated(self, uri):
+            self.sent.append(uri)
+
+    registry = server.SubscriptionRegistry()
+    first, second = FakeSession(), FakeSession()
+    registry.subscribe(first, "cursor://composers/c1")
+    registry.subscribe(first, "cursor://composers/c1/fields/name")
+    registry.subscribe(second, "cursor://composers/c2")
+    asyncio.run(registry.notify({"cursor://composers/c1"}))
+    assert sorted(first.sent) == ["cursor://composers/c1", "cursor://composers/c1/fields/name"]
+    assert second.sent == []
+
+
+def test_manager_reads_synthetic_cursor_dir(tmp_path, cache_dir):
+    from synthetic_cursor import generate_cursor_dir
+
+    summary = generate_cursor_dir(tmp_path / "User", projects=6, composers=12, composer_kb=4,
+                                  settings_per_project=5, bubble_key_share=0.5, seed=3)
+    manager = server.CursorDBManager(cursor_path=summary["root"], cache_dir=cache_dir)
+    assert len(manager.list_projects()) == 6
+
+    composer_ids = [cid for project in summary["projects"].values() for cid in project["composer_ids"]]
+    assert sorted(composer_ids) == sorted(summary["composer_ids"])
+    for workspace_id, project in summary["projects"].items():
+        assert manager.get_composer_ids(workspace_id)["composer_ids"] == project["composer_ids"]
+
+    # Composers in both storage layouts end up in the search index
+    indexed = {r["composer_id"] for r in manager.search_conversations("function OR class OR import", limit=100)}
+    assert indexed >= set(summary["composer_ids"])
+    manager.close()
+
+
+def test_metrics_record_handler_and_manager_calls(manager):
+    import asyncio
+
+    server.metrics.reset()
+    server.db_manager = manager
+    try:
+        asyncio.run(server.get_project_chat_data("alpha"))
+        asyncio.run(server.get_project_chat_data("alpha"))
+        asyncio.run(server.query_table("alpha", "ItemTable", "get_all"))
+        snapshot = asyncio.run(server.get_metrics())
+    finally:
+        server.db_manager = None
+
+    operations = snapshot["operations"]
+    handler = operations["resource:cursor://projects/{project_name}/chat"]
+    assert handler["calls"] == 2
+    assert handler["latency_histogram"]["+Inf"] == 2
+    # The first read misses the cache and decodes the value, the second is a hit
+    assert (handler["cache_hits"], handler["cache_misses"]) == (1, 1)
+    assert handler["rows_scanned"] == 1 and handler["bytes_read"] > 0
+    assert handler["bytes_decoded"] == handler["bytes_read"]
+    assert operations["get_chat_data"]["calls"] == 2
+
+    assert operations["execute_query"]["rows_scanned"] == 3
+    assert operations["tool:query_table"]["bytes_read"] == operations["execute_query"]["bytes_read"]
+    assert snapshot["value_cache"]["hits"] >= 1
+
+
+def test_metrics_prometheus_text(manager, tmp_path):
+    metrics = server.Metrics()
+    with metrics.operation("execute_query"):
+        metrics.count("rows_scanned", 5)
+    with pytest.raises(RuntimeError):
+        with metrics.operation("execute_query"):
+            raise RuntimeError("boom")
+    metrics.count("rows_scanned", 7)  # Outside any operation: ignored
+
+    text = metrics.prometheus_text(manager.value_cache)
+    assert 'cursor_mcp_calls_total{operation="execute_query"} 2' in text
+    assert 'cursor_mcp_errors_total{operation="execute_query"} 1' in text
+    assert 'cursor_mcp_rows_scanned_total{operation="execute_query"} 5' in text
+    assert 'cursor_mcp_duration_seconds_bucket{operation="execute_query",le="+Inf"} 2' in text
+    assert "cursor_mcp_value_cache_hit_ratio" in text
+
+    metrics.write_prometheus_file(tmp_path / "metrics" / "cursor.prom", manager.value_cache)
+    assert 'cursor_mcp_calls_total{operation="execute_query"} 2' in (tmp_path / "metrics" / "cursor.prom").read_text()
+
+
+def test_paginated_conversation_reader(tmp_path, cache_dir):
+    conversation = [{"type": 1, "text": f"message {i} " + "x" * 100} for i in range(7)]
+    headers = [{"bubbleId": f"b{i}", "type": 1} for i in range(5)]
+    root = make_cursor_dir(
+        tmp_path / "User",
+        projects={"ws1": ("alpha", {CHAT_KEY: {"tabs": [
+            {"tabId": "t1", "chatTitle": "One", "bubbles": [{"text": "a"}, {"text": "b"}, {"text": "c"}]},
+            {"tabId": "t2", "chatTitle": "Two", "bubbles": []},
+        ]}})},
+        composers={
+            "old": {"composerId": "old", "conversation": conversation},
+            "new": {"composerId": "new", "conversation": [], "fullConversationHeadersOnly": headers},
+        },
+    )
+    write_state_db(root / "globalStorage" / "state.vscdb",
+                   disk_kv={f"bubbleId:new:b{i}": {"bubbleId": f"b{i}", "text": f"bubble {i}"} for i in range(5)})
+    manager = server.CursorDBManager(cursor_path=root, cache_dir=cache_dir)
+
+    tabs = manager.read_chat_messages("alpha", limit=1)
+    assert (tabs["total"], tabs["tabs"][0]["tabId"], tabs["tabs"][0]["bubble_count"]) == (2, "t1", 3)
+    tabs = manager.read_chat_messages("alpha", cursor=tabs["next_cursor"])
+    assert [t["tabId"] for t in tabs["tabs"]] == ["t2"] and tabs["next_cursor"] is None
+    bubbles = manager.read_chat_messages("alpha", tab_id="t1", start=1)
+    assert [m["message"]["text"] for m in bubbles["messages"]] == ["b", "c"]
+
+    # The byte budget cuts pages short; the cursor walks the whole conversation
+    page = manager.read_composer_messages("old", limit=5, max_bytes=250)
+    seen = []
+    while True:
+        assert len(page["messages"]) <= 2
+        seen.extend(m["index"] for m in page["messages"])
+        if page["next_cursor"] is None:
+            break
+        page = manager.read_composer_messages("old", limit=5, max_bytes=250, cursor=page["next_cursor"])
+    assert seen == list(range(7))
+
+    page = manager.read_composer_messages("new", start=3)
+    assert page["total"] == 5
+    assert [m["message"]["text"] for m in page["messages"]] == ["bubble 3", "bubble 4"]
+
+    assert "error" in manager.read_composer_messages("missing")
+    other_cursor = manager.read_composer_messages("old", limit=1)["next_cursor"]
+    with pytest.raises(ValueError):
+        manager.read_composer_messages("new", cursor=other_cursor)
+    manager.close()
+
+
+def test_typed_composer_decoders(manager):
+    raw = json.dumps({
+        "composerId": "c9", "name": "Typed", "createdAt": 1, "lastUpdatedAt": 2, "richText": "dropped",
+        "conversation": [{"bubbleId": "b1", "type": 1, "text": "hi", "codeBlocks": [{"content": "x" * 100}]}],
+    })
+    conversation = server.ComposerConversation.from_json(raw)
+    assert (conversation.composer_id, conversation.name, conversation.last_updated_at) == ("c9", "Typed", 2)
+    assert [m.to_dict() for m in conversation.messages] == [
+        {"bubbleId": "b1", "type": 1, "text": "hi", "model": None, "codeBlocks": 1, "timestamp": None}
+    ]
+    assert not hasattr(conversation, "__dict__")
+
+    headers_only = server.ComposerConversation.from_json(json.dumps(
+        {"composerId": "c8", "conversation": [], "fullConversationHeadersOnly": [{"bubbleId": "b1"}, {"bubbleId": "b2"}]}
+    ))
+    assert (headers_only.messages, headers_only.bubble_ids) == ([], ["b1", "b2"])
+    assert server.ComposerConversation.from_json("not json") is None
+    # Input the fast backend rejects still decodes like the stdlib would
+    assert server.decode_value('{"x": NaN}')["x"] != 0
+
+    index = manager.get_typed_value(manager.db_paths["alpha"], "ItemTable", "composer.composerData", server.ComposerIndex)
+    assert index.composer_ids == ["c1", "c2"]
+    assert manager.composer_workspace_map() == {"c1": "ws1", "c2": "ws1"}
+    hits = manager.value_cache.hits
+    manager.composer_workspace_map()
+    assert manager.value_cache.hits == hits + 1
+
+
+def test_startup_parses_args_first_and_discovers_once_in_background(cursor_dir, tmp_path, monkeypatch):
+    import asyncio
+    import threading
+
+    extra = tmp_path / "extra"
+    write_state_db(extra / "state.vscdb", item_table={"some.key": {"x": 1}})
+    monkeypatch.setenv("CURSOR_DB_MCP_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(sys, "argv", ["cursor-db-mcp-server.py", "--cursor-path", str(cursor_dir),
+                                      "--project-dirs", str(extra), "--watch-interval", "0"])
+    for name in ("db_manager", "worker_pool", "discovery", "client_limiter", "request_limits", "profiler"):
+        monkeypatch.setattr(server, name, None)
+
+    scans = []
+    release = threading.Event()
+    detect = server.CursorDBManager.detect_cursor_projects
+
+    def slow_detect(self):
+        scans.append(self.cursor_path)
+        release.wait(5)
+        return detect(self)
+
+    monkeypatch.setattr(server.CursorDBManager, "detect_cursor_projects", slow_detect)
+
+    async def run():
+        async with server.app_lifespan(server.mcp):
+            # The server is up before discovery finishes; requests wait for it
+            assert not server.discovery.done()
+            request = asyncio.ensure_future(server.list_all_projects())
+            await asyncio.sleep(0.05)
+            assert not request.done()
+            release.set()
+            return await request
+
+    projects = asyncio.run(run())
+    assert set(projects) == {"alpha", "extra"}
+    assert scans == [Path(cursor_dir).resolve()]
+
+
+def test_stats_are_maintained_incrementally(manager, cursor_dir, monkeypatch):
+    stats = manager.get_stats()
+    alpha = stats["projects"]["alpha"]
+    assert (alpha["composers"], alpha["chat_tabs"], alpha["messages"], alpha["user_messages"]) == (2, 1, 2, 2)
+    assert stats["totals"]["projects"] == 1 and stats["totals"]["messages"] == 2
+
+    decoded = []
+    from_json = server.ComposerConversation.from_json
+    monkeypatch.setattr(server.ComposerConversation, "from_json",
+                        classmethod(lambda cls, raw: decoded.append(raw) or from_json(raw)))
+    assert manager.get_stats() == stats
+    assert decoded == []
+
+    conn = sqlite3.connect(manager.global_db_path)
+    conn.execute("UPDATE cursorDiskKV SET value = ? WHERE key = 'composerData:c2'", (json.dumps({
+        "composerId": "c2", "name": "Second", "lastUpdatedAt": 5,
+        "conversation": [
+            {"type": 1, "text": "q", "timingInfo": {"clientStartTime": 4}},
+            {"type": 2, "text": "a", "modelType": "gpt-4", "codeBlocks": [{}, {}]},
+        ],
+    }),))
+    conn.commit()
+    conn.close()
+
+    alpha = manager.get_stats()["projects"]["alpha"]
+    assert len(decoded) == 1
+    assert (alpha["messages"], alpha["assistant_messages"], alpha["code_blocks"]) == (4, 1, 2)
+    assert alpha["models"] == {"gpt-4": 1} and alpha["last_activity_at"] == 5
+
+    project = manager.get_stats("alpha")
+    assert [c["composer_id"] for c in project["composers"]][0] == "c2"
+    assert project["chat_tabs"][0]["tab_id"] == "t1"
+
+    # A project change moves composers between projects without fingerprinting or decoding global storage
+    scans = []
+    fingerprints = server.composer_fingerprints
+    monkeypatch.setattr(server, "composer_fingerprints", lambda conn: scans.append(1) or fingerprints(conn))
+    conn = sqlite3.connect(manager.db_paths["alpha"])
+    conn.execute("UPDATE ItemTable SET value = ? WHERE key = 'composer.composerData'",
+                 (json.dumps({"allComposers": [{"composerId": "c2"}]}),))
+    conn.commit()
+    conn.close()
+    make_cursor_dir(cursor_dir, projects={"ws2": ("beta", {"composer.composerData": {"allComposers": [{"composerId": "c1"}]}})})
+    manager.refresh_db_paths()
+    stats = manager.get_stats()
+    assert (stats["projects"]["alpha"]["composers"], stats["projects"]["beta"]["composers"]) == (1, 1)
+    assert stats["projects"]["beta"]["messages"] == 1
+    assert scans == [] and len(decoded) == 1
+
+
+def read_export(path):
+    return [json.loads(line) for line in Path(path).read_text().splitlines()]
+
+
+def test_export_streams_everything_and_resumes(tmp_path, cache_dir):
+    from synthetic_cursor import generate_cursor_dir
+
+    summary = generate_cursor_dir(tmp_path / "User", projects=3, composers=20, composer_kb=2, tabs_per_project=3,
+                                  bubble_key_share=0.5, seed=5)
+    manager = server.CursorDBManager(cursor_path=summary["root"], cache_dir=cache_dir)
+    full = manager.export_conversations(tmp_path / "full.jsonl")
+    expected = read_export(tmp_path / "full.jsonl")
+    assert full["records"] == len(expected)
+    assert {r["kind"] for r in expected} == {"chat_tab", "composer", "bubble"}
+    assert {r["composer_id"] for r in expected if r["kind"] == "composer"} == set(summary["composer_ids"])
+
+    # Interrupt an export after a few batches, then resume it
+    def interrupted_export(path):
+        exporter = server.ConversationExporter(manager, path, batch_records=5, workers=2)
+        write_batch = exporter._sink.write_batch
+        calls = []
+
+        def failing_write_batch(records):
+            calls.append(len(records))
+            if len(calls) == 3:
+                raise OSError("disk full")
+            write_batch(records)
+
+        exporter._sink.write_batch = failing_write_batch
+        with pytest.raises(OSError):
+            exporter.run()
+        assert exporter.checkpoint_path.exists()
+        return exporter
+
+    exporter = interrupted_export(tmp_path / "out.jsonl")
+    resumed = server.ConversationExporter(manager, tmp_path / "out.jsonl", batch_records=5, workers=2).run()
+    assert resumed["resumed"] and resumed["records"] == full["records"]
+    assert not exporter.checkpoint_path.exists()
+    key = lambda r: (r["kind"], r.get("workspace_id") or "", r.get("tab_id") or "", r.get("composer_id") or "",
+                     r.get("bubble_id") or "")
+    assert sorted(read_export(tmp_path / "out.jsonl"), key=key) == sorted(expected, key=key)
+
+    # An output that went missing or shrank since its checkpoint is exported again from the start
+    for name, damage in (("missing", lambda path: path.unlink()), ("shrunk", lambda path: path.write_bytes(b""))):
+        path = tmp_path / f"{name}.jsonl"
+        interrupted_export(path)
+        damage(path)
+        restarted = server.ConversationExporter(manager, path).run()
+        assert not restarted["resumed"] and restarted["records"] == full["records"]
+        assert sorted(read_export(path), key=key) == sorted(expected, key=key)
+
+    # A finished export or any other file is only replaced when asked to
+    with pytest.raises(ValueError, match="already exists"):
+        manager.export_conversations(tmp_path / "full.jsonl")
+    assert manager.export_conversations(tmp_path / "full.jsonl", overwrite=True)["records"] == full["records"]
+    manager.close()
+
+
+def test_export_tool_is_confined_to_the_export_directory(manager, tmp_path, monkeypatch):
+    import asyncio
+
+    monkeypatch.setattr(server, "db_manager", manager)
+    monkeypatch.setattr(server, "export_dir", tmp_path / "exports")
+    victim = tmp_path / "important.txt"
+    victim.write_text("keep")
+    (tmp_path / "exports").mkdir()
+    (tmp_path / "exports" / "link.jsonl").symlink_to(victim)
+    for path in (str(victim), "../important.txt", "link.jsonl", "."):
+        assert "export directory" in asyncio.run(server.export_conversations(path))["error"]
+    assert victim.read_text() == "keep"
+
+    result = asyncio.run(server.export_conversations("nested/out.jsonl"))
+    assert result["output"] == str((tmp_path / "exports" / "nested" / "out.jsonl").resolve())
+    assert "already exists" in asyncio.run(server.export_conversations("nested/out.jsonl"))["error"]
+    assert asyncio.run(server.export_conversations("nested/out.jsonl", overwrite=True))["records"] == result["records"]
+
+
+def test_export_compressed_and_parquet(manager, tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    manager.export_conversations(tmp_path / "out.jsonl.zst", compression="zstd")
+    with open(tmp_path / "out.jsonl.zst", "rb") as f:
+        lines = zstandard.ZstdDecompressor().stream_reader(f).read().decode().splitlines()
+    assert {json.loads(line)["kind"] for line in lines} == {"chat_tab", "composer"}
+
+    parquet = pytest.importorskip("pyarrow.parquet")
+    result = manager.export_conversations(tmp_path / "parquet", format="parquet")
+    table = parquet.read_table(tmp_path / "parquet")
+    assert table.num_rows == result["records"] == len(lines)
+
+
+def test_busy_database_is_retried_with_backoff(tmp_path, cache_dir):
+    cursor_dir = make_cursor_dir(tmp_path / "User", projects={"ws1": ("alpha", {"other.setting": "plain text"})})
+    manager = server.CursorDBManager(cursor_path=cursor_dir, cache_dir=cache_dir, busy_timeout=0.05)
+    server.metrics.reset()
+
+    # Cursor holding an exclusive lock on a rollback-journal database blocks every reader
+    writer = sqlite3.connect(cursor_dir / "workspaceStorage" / "ws1" / "state.vscdb", isolation_level=None,
+                             check_same_thread=False)
+    writer.execute("BEGIN EXCLUSIVE")
+    release = threading.Timer(0.2, writer.execute, ("COMMIT",))
+    release.start()
+    try:
+        rows = manager.execute_query("alpha", "ItemTable", "get_by_key", "other.setting")
+    finally:
+        release.join()
+        writer.close()
+    assert rows[0]["value"] == "plain text"
+    assert server.metrics.snapshot()["operations"]["execute_query"]["busy_retries"] >= 1
+    manager.close()
+
+
+def test_snapshot_reads_are_consistent_while_cursor_writes(manager, cursor_dir, tmp_path):
+    db_path = cursor_dir / "globalStorage" / "state.vscdb"
+    writer = sqlite3.connect(db_path)
+    writer.execute("PRAGMA journal_mode=WAL")
+    read = lambda conn, key: conn.execute("SELECT value FROM cursorDiskKV WHERE key = ?", (key,)).fetchone()[0]
+
+    with manager.snapshot(db_path) as conn:
+        first = read(conn, "composerData:c1")
+        writer.execute("UPDATE cursorDiskKV SET value = '{}'")
+        writer.commit()
+        # Committed after the snapshot was taken, so neither row changes inside it
+        assert read(conn, "composerData:c1") == first
+        assert json.loads(read(conn, "composerData:c2"))["name"] == "Second"
+    with manager.snapshot(db_path) as conn:
+        assert read(conn, "composerData:c2") == "{}"
+
+    copy = manager.snapshot_copy(db_path, tmp_path / "copy.vscdb")
+    with sqlite3.connect(copy) as conn:
+        assert read(conn, "composerData:c2") == "{}"
+    writer.close()
+
+
+def test_export_from_snapshot_copies(manager, tmp_path):
+    live = manager.export_conversations(tmp_path / "live.jsonl")
+    copied = manager.export_conversations(tmp_path / "copied.jsonl", snapshot=True)
+    assert copied["records"] == live["records"]
+    key = lambda record: json.dumps(record, sort_keys=True)
+    assert sorted(read_export(tmp_path / "copied.jsonl"), key=key) == sorted(read_export(tmp_path / "live.jsonl"), key=key)
+    # The temporary copies are cleaned up and their pools closed
+    assert all("cursor-db-export-" not in path for path in manager._pools)
+
+
+def test_search_keys_match_modes(manager, cursor_dir, monkeypatch):
+    assert server.literal_key_prefix("bubbleId:c1:*", "glob") == "bubbleId:c1:"
+    assert server.literal_key_prefix("^composerData:c\\d", "regex") == "composerData:c"
+    assert server.literal_key_prefix("^abc?", "regex") == "ab"
+    assert server.literal_key_prefix("Data:c1", "regex") == ""
+
+    search = lambda key, match, **kwargs: [
+        r["key"] for r in manager.execute_query("alpha", "ItemTable", "search_keys", key, match=match, **kwargs)
+    ]
+    assert search("COMPOSER", "substring") == ["composer.composerData"]
+    assert search("COMPOSER", "prefix") == []
+    assert search("workbench.", "prefix") == [CHAT_KEY]
+    assert search("*.[a-c]*", "glob") == ["composer.composerData", CHAT_KEY]
+    assert search("\\.[a-s]", "regex", limit=2) == ["composer.composerData", "other.setting"]
+    with pytest.raises(ValueError):
+        search("(", "regex")
+    with pytest.raises(ValueError):
+        search("x", "fuzzy")
+    # Patterns that could backtrack catastrophically are refused before any key is matched
+    for pattern in ("(a+)+$", "(a|aa)*b", "x*x*x*!", "\\w*\\w*!", "a{0,64}a{0,64}a{0,64}!", "(.)\\1", "a" * 300):
+        with pytest.raises(ValueError):
+            search(pattern, "regex")
+        with pytest.raises(ValueError):
+            manager.search_all_databases(pattern, match="regex")
+    assert search("^composer\\.[A-Za-z]+$", "regex") == ["composer.composerData"]
+    assert search(".*Data$", "regex") == ["composer.composerData"]
+    # Long keys are matched on their first MAX_REGEX_KEY_LENGTH characters only
+    matcher = server.compile_key_matcher("[a-z]*a!", "regex")
+    start = time.monotonic()
+    assert not matcher("a" * 100_000 + "!")
+    assert time.monotonic() - start < 0.5
+    assert matcher("a" * 10 + "!")
+
+    page = manager.execute_query_page("alpha", "ItemTable", "search_keys", "*", limit=2, match="glob")
+    rest = manager.execute_query_page("alpha", "ItemTable", "search_keys", "*", limit=2, match="glob",
+                                      page_token=page["next_page_token"])
+    assert [r["key"] for r in page["results"] + rest["results"]] == ["composer.composerData", "other.setting", CHAT_KEY]
+    assert rest["next_page_token"] is None
+
+    result = manager.search_all_databases("composerData:c?", match="glob")
+    assert [(r["project"], r["key"]) for r in result["results"]] == [
+        ("(global)", "composerData:c1"), ("(global)", "composerData:c2")]
+    assert [r["score"] for r in manager.search_all_databases("composerData:c1", match="prefix")["results"]] == [3]
+
+    # The key index is reused until a database changes, and then only that database is reread
+    manager.search_all_databases("*", match="glob", table_name="ItemTable")
+    write_state_db(cursor_dir / "workspaceStorage" / "ws1" / "state.vscdb", item_table={"other.new": "x"})
+    connect = manager.connect
+    scans = []
+    monkeypatch.setattr(manager, "connect", lambda db: scans.append(db) or connect(db))
+    result = manager.search_all_databases("other.*", match="glob", table_name="ItemTable")
+    assert [r["key"] for r in result["results"]] == ["other.new", "other.setting"]
+    assert scans.count(manager.global_db_path) == 1
+    assert scans.count(manager.db_paths["alpha"]) == 2
+
+
+def test_recent_conversations_timeline(tmp_path, cache_dir):
+    cursor_dir = make_cursor_dir(
+        tmp_path / "User",
+        projects={
+            "ws1": ("alpha", {
+                CHAT_KEY: {"tabs": [{"tabId": "t1", "chatTitle": "Old tab", "lastSendTime": 1000, "bubbles": []},
+                                    {"tabId": "t2", "chatTitle": "New tab", "lastSendTime": 4000, "bubbles": []}]},
+                "composer.composerData": {"allComposers": [{"composerId": "c1"}]},
+            }),
+            "ws2": ("beta", {"composer.composerData": {"allComposers": [{"composerId": "c2"}, {"composerId": "c3"}]}}),
+        },
+        composers={
+            "c1": {"composerId": "c1", "name": "First", "lastUpdatedAt": 2000, "conversation": []},
+            "c2": {"composerId": "c2", "name": "Second", "lastUpdatedAt": 3000, "conversation": []},
+            "c3": {"composerId": "c3", "name": "Undated", "conversation": []},
+        },
+    )
+    manager = server.CursorDBManager(cursor_path=cursor_dir, cache_dir=cache_dir)
+    timeline = lambda **kwargs: [(r["kind"], r["id"], r["project"]) for r in manager.get_recent_conversations(**kwargs)]
+    assert timeline() == [("chat_tab", "t2", "alpha"), ("composer", "c2", "beta"), ("composer", "c1", "alpha"),
+                          ("chat_tab", "t1", "alpha")]
+    assert timeline(limit=2) == [("chat_tab", "t2", "alpha"), ("composer", "c2", "beta")]
+    assert timeline(since=2000, until=4000) == [("composer", "c2", "beta"), ("composer", "c1", "alpha")]
+    assert timeline(kind="chat_tab", until=4000) == [("chat_tab", "t1", "alpha")]
+    assert timeline(project_name="beta") == [("composer", "c2", "beta")]
+    assert timeline(since="1970-01-01T00:00:03") == [("chat_tab", "t2", "alpha"), ("composer", "c2", "beta")]
+    with pytest.raises(ValueError):
+        timeline(kind="bubble")
+    with pytest.raises(ValueError):
+        timeline(since="yesterday")
+    manager.close()
+
+
+def test_http_transport_serves_concurrent_clients_from_shared_state(cursor_dir, tmp_path):
+    import asyncio
+    import socket
+    import subprocess
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamable_http_client
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, str(SERVER_PATH), "--cursor-path", str(cursor_dir), "--watch-interval", "0",
+         "--transport", "streamable-http", "--port", str(port), "--client-concurrency", "1"],
+        env={**os.environ, "CURSOR_DB_MCP_CACHE_DIR": str(tmp_path / "cache")},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    async def client(name):
+        async with streamable_http_client(f"http://127.0.0.1:{port}/mcp") as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                results = await asyncio.gather(*[
+                    session.read_resource("cursor://projects/alpha/chat") for _ in range(3)
+                ])
+                assert all("Hello" in result.contents[0].text for result in results)
+                return json.loads((await session.read_resource("cursor://metrics")).contents[0].text)
+
+    async def run():
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+        return await asyncio.gather(client("a"), client("b"))
+
+    try:
+        snapshots = asyncio.run(run())
+    finally:
+        process.terminate()
+        process.wait(10)
+    # Both clients were served by one process, so all but the first read hit the shared cache
+    value_cache = max(snapshots, key=lambda s: s["value_cache"]["hits"])["value_cache"]
+    assert value_cache["misses"] == 1 and value_cache["hits"] == 5
+
+
+def test_client_concurrency_limiter_is_per_session():
+    import asyncio
+
+    class Session:
+        pass
+
+    limiter = server.ClientConcurrencyLimiter(limit=1)
+    alice, bob = Session(), Session()
+    busy, seen = [], []
+
+    async def request(session):
+        async with limiter.slot(session):
+            busy.append(session)
+            seen.append(list(busy))
+            await asyncio.sleep(0.05)
+            busy.remove(session)
+
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(request(alice), request(alice), request(bob))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    # alice's second request waited for her first; bob's ran alongside them
+    assert all(running.count(alice) <= 1 for running in seen)
+    assert any(alice in running and bob in running for running in seen)
+    assert elapsed >= 0.1
+
+
+def test_request_deadlines_and_result_budgets(manager, monkeypatch):
+    import asyncio
+
+    def endless_query():
+        with manager.connect(manager.global_db_path) as conn:
+            conn.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n").fetchone()
+
+    async def run(fn, *args, **limits):
+        pool = server.WorkerPool(max_workers=1)
+        try:
+            return await pool.run_with_token(server.CancelToken(**limits), fn, *args)
+        finally:
+            pool.shutdown()
+
+    start = time.monotonic()
+    with pytest.raises(server.RequestLimitExceeded, match="deadline"):
+        asyncio.run(run(endless_query, timeout=0.1))
+    assert time.monotonic() - start < 2
+
+    query = lambda: manager.execute_query("alpha", "ItemTable", "get_all")
+    assert len(asyncio.run(run(query, max_rows=3))) == 3
+    with pytest.raises(server.RequestLimitExceeded, match="rows"):
+        asyncio.run(run(query, max_rows=2))
+    with pytest.raises(server.RequestLimitExceeded, match="bytes"):
+        asyncio.run(run(query, max_bytes=20))
+
+    # Handlers report a blown limit as an error, with per-tool deadlines taking precedence
+    limits = server.RequestLimits(timeout=None, max_rows=1, deadlines={"tool:query_table": 0})
+    assert limits.token("tool:query_table").timeout == 0 and limits.token("tool:other").timeout is None
+    assert server.RequestLimits(timeout=5).token("tool:export_conversations").timeout is None
+    monkeypatch.setattr(server, "db_manager", manager)
+    monkeypatch.setattr(server, "request_limits", server.RequestLimits(max_rows=1))
+    result = asyncio.run(server.query_table("alpha", "ItemTable", "get_all"))
+    assert "more than 1 rows" in result[0]["error"]
+    monkeypatch.setattr(server, "request_limits", server.RequestLimits(deadlines={"tool:query_table": 0}))
+    assert "deadline" in asyncio.run(server.query_table("alpha", "ItemTable", "get_all"))[0]["error"]
+    assert server.parse_args(["--tool-timeout", "query_table=10", "--tool-timeout", "resource:cursor://stats=0"]
+                             ).tool_timeout == {"tool:query_table": 10.0, "resource:cursor://stats": None}
+
+
+def test_compact_encoding_round_trips_and_truncates(manager, monkeypatch):
+    import asyncio
+    import random
+    import re
+    from synthetic_cursor import make_composer
+
+    def expand(value, refs):
+        if isinstance(value, dict):
+            if set(value) == {"$ref"}:
+                return expand(refs[value["$ref"]], refs)
+            return {key[1:] if re.fullmatch(r"\$+ref", key) else key: expand(item, refs) for key, item in value.items()}
+        if isinstance(value, list):
+            return [expand(item, refs) for item in value]
+        return value
+
+    def strip_empty(value):
+        if isinstance(value, dict):
+            return {key: strip_empty(item) for key, item in value.items() if item not in (None, "", [], {})}
+        if isinstance(value, list):
+            return [strip_empty(item) for item in value]
+        return value
+
+    context = {"file": "src/app.py", "selection": "def handler(event):\n    return event\n" * 4}
+    composer = make_composer(random.Random(1), "c9", 20_000, 1_700_000_000_000)
+    for message in composer["conversation"]:
+        message.update(context=context, attachments=[], checkpoint=None)
+    result = server.compact_response(composer)
+    assert expand(result["data"], result["refs"]) == strip_empty(composer)
+    # The shared context is sent once; its single-use inner strings are not turned into references
+    assert list(result["refs"].values()) == [context]
+    assert result["size"]["original_bytes"] == server.json_size(composer)
+    assert result["size"]["compact_bytes"] == server.json_size({k: v for k, v in result.items() if k != "size"})
+    assert result["size"]["reduction"] > 0.1
+
+    # Payload keys that look like references are escaped, not confused with real ones
+    shared = {"path": "src/" + "nested/" * 10 + "module.py"}
+    lookalikes = {"a": {"$ref": "#0"}, "b": {"$$ref": "x", "$refs": 1}, "c": [shared, shared, {"$ref": shared}]}
+    result = server.compact_response(lookalikes)
+    assert result["data"]["a"] == {"$$ref": "#0"} and result["data"]["b"] == {"$$$ref": "x", "$refs": 1}
+    assert expand(result["data"], result["refs"]) == lookalikes
+
+    truncated = server.compact_response({"text": "x" * 500, "short": "ok"}, max_string_length=100)
+    (handle, length), = truncated["truncated"].items()
+    assert length == 500 and truncated["data"]["text"].startswith("x" * 100) and handle in truncated["data"]["text"]
+    rest = asyncio.run(server.fetch_truncated(handle, offset=100, length=300))
+    assert rest["text"] == "x" * 300 and rest["remaining"] == 100
+    assert "error" in asyncio.run(server.fetch_truncated("missing"))
+
+    monkeypatch.setattr(server, "db_manager", manager)
+    compact = asyncio.run(server.query_table("alpha", "ItemTable", "get_all", compact=True))
+    assert expand(compact["data"], compact["refs"]) == strip_empty(manager.execute_query("alpha", "ItemTable", "get_all"))
+
+
+def test_profiling_records_slow_calls(manager, monkeypatch, tmp_path):
+    import asyncio
+    import pstats
+
+    monkeypatch.setattr(server, "db_manager", manager)
+    profiler = server.CallProfiler(directory=tmp_path / "profiles", threshold=0, operations=["query_table"], keep=2)
+    monkeypatch.setattr(server, "profiler", profiler)
+    record = profiler.record
+    threads = []
+    monkeypatch.setattr(profiler, "record", lambda *args: threads.append(threading.current_thread().name) or record(*args))
+
+    asyncio.run(server.query_table("alpha", "ItemTable", "get_all"))
+    assert profiler.summary()["profiled_calls"] == 0
+
+    assert asyncio.run(server.set_profiling(True))["enabled"]
+    for _ in range(3):
+        asyncio.run(server.query_table("alpha", "ItemTable", "get_all"))
+    asyncio.run(server.search_conversations("fix"))  # not a selected operation
+    summary = asyncio.run(server.get_profiles())
+    assert summary["profiled_calls"] == 3 and summary["recorded_calls"] == 2
+    # Profiles are summarized on the worker pool, not the event loop
+    assert len(threads) == 3 and all(name.startswith("cursor-db-worker") for name in threads)
+    for call in summary["slowest"]:
+        assert call["operation"] == "tool:query_table" and call["error"] is None
+        assert set(call["breakdown_ms"]) == {"sqlite", "json", "other_python", "serialize", "waiting"}
+        assert call["breakdown_ms"]["sqlite"] > 0
+        assert any("execute_query" in f["function"] for f in call["top_functions"])
+    assert summary["largest_allocators"][0]["bytes"] > 0
+
+    # Only the kept calls' profile files remain, and pstats can read them
+    files = sorted((tmp_path / "profiles").glob("*.prof"))
+    assert {str(f) for f in files} == {call["profile_path"] for call in summary["slowest"]}
+    assert pstats.Stats(str(files[0])).total_calls > 0
+
+    assert "error" in asyncio.run(server.set_profiling(True, sample_rate=2))
+    asyncio.run(server.set_profiling(True, sample_rate=0))
+    asyncio.run(server.query_table("alpha", "ItemTable", "get_all"))
+    assert profiler.summary()["profiled_calls"] == 3
+
+
+def test_overlapping_profiles_fall_back_to_running_unprofiled(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # From Python 3.12 only one cProfile can be enabled in the whole process
+    monkeypatch.setattr(server.CallProfile, "PROCESS_WIDE", True)
+    first, second = server.CallProfile("tool:a"), server.CallProfile("tool:b")
+    entered, release = threading.Event(), threading.Event()
+
+    def slow():
+        entered.set()
+        release.wait(5)
+        return sum(range(1000))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        running = pool.submit(first.run, slow)
+        assert entered.wait(5)
+        assert pool.submit(second.run, lambda: "ok").result(5) == "ok"
+        release.set()
+        assert running.result(5) == sum(range(1000))
+    assert first.worker_seconds > 0 and second.worker_seconds == 0
+
+    # A profiler that can't be enabled (another tool holds it) doesn't fail the work
+    class Busy:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    third = server.CallProfile("tool:c")
+    third.profile = Busy()
+    assert third.run(lambda: "ok") == "ok" and third.worker_seconds == 0